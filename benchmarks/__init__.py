@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Benchmark và bộ sinh dữ liệu smali giả lập (không phải một phần của package)."""
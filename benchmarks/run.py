@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""Đo thời gian từng stage (extract, decode, txt, refresh table, save) trên file smali giả lập.
+
+Chạy từ thư mục gốc repo:
+
+    python -m benchmarks.run --sizes 1000,100000,1000000 --output bench.json
+
+Mỗi kích thước chạy trong một process riêng để peak RSS không bị cộng dồn.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from . import synth
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+# Số dòng một QTableView hiển thị cùng lúc (để đo refresh_table như khi mở file)
+VISIBLE_ROWS = 50
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_kb():
+    """Peak RSS của process hiện tại (KB), None nếu hệ điều hành không hỗ trợ"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS trả về byte, Linux trả về KB
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _time_stage(fn, repeat):
+    """Chạy fn() repeat lần, trả về (thời gian tốt nhất, kết quả lần cuối)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _qt_refresh_stage():
+    """Trả về hàm đo refresh_table, hoặc None nếu không có PyQt6"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PyQt6.QtWidgets import QApplication
+        import main
+    except ImportError:
+        return None
+    app = QApplication.instance() or QApplication([])
+    model = main.ArrayDataModel()
+
+    def refresh(array_data):
+        model.set_array_data(array_data)
+        # View chỉ hỏi data() cho các dòng đang hiển thị
+        for row in range(min(VISIBLE_ROWS, model.rowCount())):
+            for column in range(model.columnCount()):
+                model.data(model.index(row, column))
+        app.processEvents()
+
+    return refresh
+
+
+def run_size(n_elements, n_calls, repeat, workdir, qt):
+    """Đo mọi stage cho một kích thước, trả về list kết quả (dict)"""
+    from smalixor import cache, callsites, core, document
+
+    smali_path = os.path.join(workdir, f'bench_{n_elements}.smali')
+    txt_path = os.path.join(workdir, f'bench_{n_elements}.txt')
+    start = time.perf_counter()
+    strings = synth.write_smali(smali_path, n_elements, n_calls)
+    synth.write_txt(txt_path, n_elements)
+    generate_seconds = time.perf_counter() - start
+
+    results = []
+
+    def record(stage, seconds, elements):
+        results.append({
+            'size': n_elements,
+            'calls': len(strings),
+            'stage': stage,
+            'seconds': seconds,
+            'elements': elements,
+            'elements_per_sec': elements / seconds if seconds else None,
+            'peak_rss_kb': peak_rss_kb(),
+        })
+
+    record('generate', generate_seconds, n_elements)
+
+    # Extract không cache (như lần đầu mở file)
+    cache.set_default_cache(None)
+    seconds, smali_document = _time_stage(
+        lambda: document.SmaliDocument.load(smali_path), repeat)
+    record('extract_cold', seconds, len(smali_document))
+
+    # Extract khi cache đã có file
+    cache.set_default_cache(cache.ArrayCache(os.path.join(workdir, 'cache')))
+    document.SmaliDocument.load(smali_path)
+    seconds, _ = _time_stage(lambda: document.SmaliDocument.load(smali_path), repeat)
+    record('extract_warm', seconds, len(smali_document))
+    cache.set_default_cache(None)
+
+    array_data = smali_document.values
+    seconds, sites = _time_stage(lambda: callsites.find_own_call_sites(smali_path), repeat)
+    record('find_call_sites', seconds, len(sites))
+
+    # Decode từng range như khi bấm Convert / Decode Range
+    seconds, _ = _time_stage(
+        lambda: [core.decode_xor(array_data, s.key, s.start, s.end) for s in strings], repeat)
+    record('decode_memory', seconds, sum(s.end - s.start for s in strings))
+
+    seconds, decoded = _time_stage(
+        lambda: core.decode_xor_ranges(array_data, [(s.start, s.end, s.key) for s in strings]),
+        repeat)
+    record('decode_batch', seconds, sum(s.end - s.start for s in strings))
+    if strings and decoded[0] != strings[0].text:
+        raise AssertionError("Decode sai so với chuỗi gốc")
+
+    # Chế độ TXT: mỗi lần Convert đọc lại file
+    first = strings[0] if strings else synth.SynthString(0, 0, 0, '')
+    seconds, _ = _time_stage(
+        lambda: core.decode_xor_from_file(txt_path, first.key, first.start, first.end), repeat)
+    record('decode_txt', seconds, n_elements)
+
+    if qt:
+        refresh = _qt_refresh_stage()
+        if refresh is not None:
+            seconds, _ = _time_stage(lambda: refresh(array_data), repeat)
+            record('refresh_table', seconds, n_elements)
+
+    # Sửa 1% số chuỗi rồi lưu (mỗi lần lưu ghi lại cùng các range)
+    edited = strings[::100] or strings
+
+    def save():
+        for s in edited:
+            smali_document.apply_range_edit(s.start, s.text.upper(), s.key)
+        smali_document.save(backup=False)
+
+    seconds, _ = _time_stage(save, repeat)
+    record('save', seconds, sum(s.end - s.start for s in edited))
+    return results
+
+
+def _run_size_entry(args):
+    return run_size(*args)
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark các stage của smalixor")
+    parser.add_argument("--sizes", default=','.join(map(str, DEFAULT_SIZES)),
+                        help="Danh sách số phần tử, cách nhau bởi dấu phẩy (tối đa ~10M)")
+    parser.add_argument("--calls", type=int, help="Số call site mỗi class (mặc định: mỗi chuỗi một)")
+    parser.add_argument("--repeat", type=int, default=3, help="Số lần chạy mỗi stage (lấy tốt nhất)")
+    parser.add_argument("--output", help="Ghi kết quả JSON ra file (mặc định: stdout)")
+    parser.add_argument("--workdir", help="Thư mục chứa file sinh ra (mặc định: thư mục tạm)")
+    parser.add_argument("--no-qt", action="store_true", help="Bỏ qua stage refresh_table")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    workdir = args.workdir or tempfile.mkdtemp(prefix='smalixor-bench-')
+    os.makedirs(workdir, exist_ok=True)
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    try:
+        for size in sizes:
+            with context.Pool(1) as pool:
+                size_results = pool.apply(_run_size_entry,
+                                          ((size, args.calls, args.repeat, workdir, not args.no_qt),))
+            for r in size_results:
+                print(f"{r['size']:>9} {r['stage']:<16} {r['seconds'] * 1000:10.2f} ms "
+                      f"rss {r['peak_rss_kb']} KB", file=sys.stderr)
+            results.extend(size_results)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Sinh file smali giả lập class đã bị obfuscate giống example/am.smali.
+
+Mỗi class có field `$:[S` được <clinit> nạp bằng `fill-array-data`, decryptor
+`$(III)Ljava/lang/String;` và N call site `const start / const end / const key`.
+"""
+
+import argparse
+import random
+from collections import namedtuple
+
+import numpy as np
+
+from smalixor import smali_parser
+
+# Một chuỗi đã mã hoá trong array-data (đáp án để kiểm tra decode)
+SynthString = namedtuple('SynthString', 'start end key text')
+
+WORDS = ('android', 'intent', 'action', 'view', 'sans', 'serif', 'medium', 'http', 'https',
+         'content', 'layout', 'button', 'dialog', 'color', 'text', 'size', 'title', 'message',
+         'share', 'settings', 'open', 'close', 'cancel', 'ok', 'image', 'base64', 'png',
+         'user', 'agent', 'version', 'package', 'name', 'activity', 'service', 'true')
+SEPARATORS = (' ', '.', '/', '-', '_', ':')
+# Số call site trong một method sinh ra
+CALLS_PER_METHOD = 64
+# Số literal ghi ra mỗi lần write
+WRITE_BATCH = 1 << 16
+
+DECRYPTOR_BODY = """\
+.method private static $(III)Ljava/lang/String;
+    .locals 4
+
+    sub-int v2, p1, p0
+
+    new-array v0, v2, [C
+
+    const/4 v1, 0x0
+
+    :goto_0
+    sub-int v2, p1, p0
+
+    if-ge v1, v2, :cond_0
+
+    sget-object v2, {cls}->$:[S
+
+    add-int v3, p0, v1
+
+    aget-short v2, v2, v3
+
+    xor-int/2addr v2, p2
+
+    int-to-char v2, v2
+
+    aput-char v2, v0, v1
+
+    add-int/lit8 v1, v1, 0x1
+
+    goto :goto_0
+
+    :cond_0
+    new-instance v2, Ljava/lang/String;
+
+    invoke-direct {{v2, v0}}, Ljava/lang/String;-><init>([C)V
+
+    return-object v2
+.end method
+
+"""
+
+
+def _random_text(rng, length):
+    """Văn bản ASCII giống chuỗi trong app (từ khoá nối bằng dấu phân cách)"""
+    parts = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        parts.append(word)
+        parts.append(rng.choice(SEPARATORS))
+        size += len(word) + 1
+    return ''.join(parts)[:length]
+
+
+def make_strings(n_elements, seed=0, min_length=4, max_length=40):
+    """Chia n_elements code unit thành các chuỗi có key riêng, trả về (units, list SynthString)"""
+    rng = random.Random(seed)
+    text = _random_text(rng, n_elements)
+    lengths = []
+    total = 0
+    while total < n_elements:
+        length = min(rng.randint(min_length, max_length), n_elements - total)
+        lengths.append(length)
+        total += length
+    keys = [rng.randint(-0x8000, 0x7FFF) for _ in lengths]
+
+    plain = np.frombuffer(text.encode('utf-16-le'), dtype='<u2')
+    key_units = np.repeat(np.array(keys, dtype=np.int64) & 0xFFFF, lengths).astype(np.uint16)
+    units = (plain ^ key_units).astype(np.int16)
+
+    strings = []
+    start = 0
+    for length, key in zip(lengths, keys):
+        strings.append(SynthString(start, start + length, key, text[start:start + length]))
+        start += length
+    return units, strings
+
+
+def _const(register, value):
+    sign = '-' if value < 0 else ''
+    return f"    const {register}, {sign}{abs(value):#x}\n\n"
+
+
+def write_smali(path, n_elements, n_calls=None, seed=0, class_name='Lbench/a;'):
+    """Ghi một class smali với n_elements short và n_calls call site, trả về list SynthString"""
+    units, strings = make_strings(n_elements, seed)
+    if n_calls is None:
+        n_calls = len(strings)
+    calls = [strings[i % len(strings)] for i in range(n_calls)] if strings else []
+
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(f".class public {class_name}\n.super Ljava/lang/Object;\n\n\n")
+        f.write("# static fields\n.field private static $:[S\n\n\n# direct methods\n")
+        f.write(DECRYPTOR_BODY.format(cls=class_name))
+
+        f.write(".method static constructor <clinit>()V\n    .locals 3\n\n")
+        f.write(_const('v0', n_elements))
+        f.write("    new-array v0, v0, [S\n\n    fill-array-data v0, :array_0\n\n")
+        f.write(f"    sput-object v0, {class_name}->$:[S\n\n    nop\n\n    return-void\n\n")
+        f.write("    :array_0\n    .array-data 2\n")
+        values = units.tolist()
+        for i in range(0, len(values), WRITE_BATCH):
+            f.write(''.join(f"        {smali_parser.format_literal(v, 2).decode('ascii')}\n"
+                            for v in values[i:i + WRITE_BATCH]))
+        f.write("    .end array-data\n.end method\n\n")
+
+        # Mỗi method chứa tối đa CALLS_PER_METHOD call site, thanh ghi giống am.smali
+        for m in range(0, len(calls), CALLS_PER_METHOD):
+            f.write(f".method public static s{m // CALLS_PER_METHOD}()V\n    .locals 4\n\n")
+            for site in calls[m:m + CALLS_PER_METHOD]:
+                f.write(_const('v0', site.start))
+                f.write(_const('v1', site.end))
+                f.write(_const('v2', site.key))
+                f.write(f"    invoke-static {{v0, v1, v2}}, {class_name}->$(III)Ljava/lang/String;\n\n")
+                f.write("    move-result-object v3\n\n")
+            f.write("    return-void\n.end method\n\n")
+    return calls
+
+
+def write_txt(path, n_elements, seed=0):
+    """Ghi array-data dạng txt (mỗi dòng một literal) như Export Modified"""
+    units, strings = make_strings(n_elements, seed)
+    values = units.tolist()
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        for i in range(0, len(values), WRITE_BATCH):
+            f.write(''.join(f"{smali_parser.format_literal(v, 2).decode('ascii')}\n"
+                            for v in values[i:i + WRITE_BATCH]))
+    return strings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sinh file smali/txt array-data giả lập")
+    parser.add_argument("output")
+    parser.add_argument("--elements", type=int, default=100000)
+    parser.add_argument("--calls", type=int, help="Số call site (mặc định: mỗi chuỗi một call)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--txt", action="store_true", help="Ghi dạng txt thay vì smali")
+    args = parser.parse_args(argv)
+    if args.txt:
+        strings = write_txt(args.output, args.elements, args.seed)
+    else:
+        strings = write_smali(args.output, args.elements, args.calls, args.seed)
+    print(f"{args.output}: {args.elements} giá trị, {len(strings)} chuỗi")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""Dựng tay example/classes.dex và example/app.apk (classes.dex + classes2.dex) từ am.smali.
+
+Chạy từ thư mục gốc repo (chỉ cần khi đổi fixture, file đã được commit):
+
+    python example/build_dex.py
+
+classes.dex có hai class:
+- `Landroidx/activity/am;`: array-data và call site lấy từ example/am.smali, decryptor XOR
+  thuần, call site nạp start/end/key bằng nhiều dạng lệnh (const/16, const, move, /range,
+  nhảy qua payload) và hai lời gọi có thanh ghi bị ghi đè (không được coi là call site).
+- `Lx/B;`: block int[] và block short[] thứ hai mà decryptor của B đọc, cùng một lời gọi
+  sang decryptor của am (không thuộc B nên không được giải mã).
+"""
+
+import hashlib
+import os
+import struct
+import sys
+import zipfile
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from smalixor import callsites, core  # noqa: E402
+
+AM_SMALI = os.path.join(ROOT, 'example', 'am.smali')
+DEX_PATH = os.path.join(ROOT, 'example', 'classes.dex')
+APK_PATH = os.path.join(ROOT, 'example', 'app.apk')
+
+AM = 'Landroidx/activity/am;'
+B = 'Lx/B;'
+STRING = 'Ljava/lang/String;'
+DECRYPTOR = (STRING, ('I', 'I', 'I'))
+
+# Chuỗi của B: mã hoá XOR với B_KEY, call site thứ hai dùng key có 16 bit cao khác 0
+B_TEXT = 'Hello from Lx/B; in classes.dex'
+B_KEY = 0x1234
+B_CALLS = ((0, 5, B_KEY), (6, len(B_TEXT), 0x7f010000 | B_KEY))
+B_INTS = [(i * 0x9E3779B1) % (1 << 32) - (1 << 31) for i in range(50)]
+
+
+def uleb128(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if not value:
+            out.append(byte)
+            return bytes(out)
+        out.append(byte | 0x80)
+
+
+def mutf8(text):
+    """MUTF-8 như string_data_item (đủ cho BMP, không có NUL)"""
+    out = bytearray()
+    for unit in struct.unpack(f'<{len(text)}H', text.encode('utf-16-le')):
+        if unit < 0x80:
+            out.append(unit)
+        elif unit < 0x800:
+            out += bytes((0xC0 | unit >> 6, 0x80 | unit & 0x3F))
+        else:
+            out += bytes((0xE0 | unit >> 12, 0x80 | (unit >> 6) & 0x3F, 0x80 | unit & 0x3F))
+    return bytes(out)
+
+
+def shorty(ret, params):
+    return ''.join('L' if t[0] in 'L[' else t for t in (ret,) + tuple(params))
+
+
+class DexWriter:
+    """Ghi một file DEX 035 tối thiểu: string/type/proto/field/method id, class_def, code_item
+
+    Code của method là hàm nhận writer (đã có bảng chỉ số tidx/fidx/midx) và trả về list
+    code unit, nên có thể tham chiếu field/method theo chỉ số cuối cùng.
+    """
+
+    def __init__(self):
+        self.strings = set()
+        self.types = set()
+        self.protos = set()
+        self.fields = set()
+        self.methods = set()
+        self.classes = []
+
+    def type(self, name):
+        self.types.add(name)
+        self.strings.add(name)
+
+    def field(self, cls, name, type_name):
+        self.type(cls)
+        self.type(type_name)
+        self.strings.add(name)
+        self.fields.add((cls, name, type_name))
+
+    def method(self, cls, name, proto):
+        ret, params = proto
+        self.type(cls)
+        self.strings.add(name)
+        for type_name in (ret,) + params:
+            self.type(type_name)
+        self.strings.add(shorty(ret, params))
+        self.protos.add(proto)
+        self.methods.add((cls, name, proto))
+
+    def add_class(self, name, static_fields, direct, virtual=()):
+        """direct/virtual: list (tên, proto, số thanh ghi, số thanh ghi tham số, hàm code)"""
+        for field_name, type_name in static_fields:
+            self.field(name, field_name, type_name)
+        for method_name, proto, *_ in tuple(direct) + tuple(virtual):
+            self.method(name, method_name, proto)
+        self.type('Ljava/lang/Object;')
+        self.classes.append((name, static_fields, direct, virtual))
+
+    def build(self):
+        strings = sorted(self.strings, key=lambda s: s.encode('utf-16-be'))
+        sidx = {s: i for i, s in enumerate(strings)}
+        types = sorted(self.types, key=sidx.get)
+        tidx = {t: i for i, t in enumerate(types)}
+        protos = sorted(self.protos, key=lambda p: (tidx[p[0]], [tidx[t] for t in p[1]]))
+        pidx = {p: i for i, p in enumerate(protos)}
+        fields = sorted(self.fields, key=lambda f: (tidx[f[0]], sidx[f[1]], tidx[f[2]]))
+        methods = sorted(self.methods, key=lambda m: (tidx[m[0]], sidx[m[1]], pidx[m[2]]))
+        self.tidx = tidx
+        self.fidx = {f: i for i, f in enumerate(fields)}
+        self.midx = {m: i for i, m in enumerate(methods)}
+
+        data_off = (0x70 + 4 * len(strings) + 4 * len(types) + 12 * len(protos) +
+                    8 * len(fields) + 8 * len(methods) + 32 * len(self.classes))
+        data = bytearray()
+
+        def here():
+            return data_off + len(data)
+
+        def align(n):
+            data.extend(b'\0' * (-here() % n))
+
+        string_offs = []
+        for s in strings:
+            string_offs.append(here())
+            data += uleb128(len(s)) + mutf8(s) + b'\0'
+        param_offs = []
+        for _, params in protos:
+            param_offs.append(0)
+            if params:
+                align(4)
+                param_offs[-1] = here()
+                data += struct.pack(f'<I{len(params)}H', len(params), *(tidx[t] for t in params))
+        class_data_offs = []
+        for name, static_fields, direct, virtual in self.classes:
+            code_offs = {}
+            for method_name, proto, registers, ins, code in tuple(direct) + tuple(virtual):
+                units = code(self)
+                align(4)
+                code_offs[method_name, proto] = here()
+                data += struct.pack('<4HII', registers, ins, 0, 0, 0, len(units))
+                data += struct.pack(f'<{len(units)}H', *units)
+            class_data_offs.append(here())
+            field_ids = sorted(self.fidx[name, n, t] for n, t in static_fields)
+            data += (uleb128(len(field_ids)) + uleb128(0) + uleb128(len(direct)) +
+                     uleb128(len(virtual)))
+            previous = 0
+            for field_idx in field_ids:
+                data += uleb128(field_idx - previous) + uleb128(0x8)   # ACC_STATIC
+                previous = field_idx
+            for entries in (direct, virtual):
+                previous = 0
+                for method_idx, code_off in sorted((self.midx[name, m, p], code_offs[m, p])
+                                                   for m, p, *_ in entries):
+                    data += uleb128(method_idx - previous) + uleb128(0x9) + uleb128(code_off)
+                    previous = method_idx
+
+        head = bytearray()
+        head += struct.pack(f'<{len(strings)}I', *string_offs)
+        head += struct.pack(f'<{len(types)}I', *(sidx[t] for t in types))
+        for (ret, params), param_off in zip(protos, param_offs):
+            head += struct.pack('<III', sidx[shorty(ret, params)], tidx[ret], param_off)
+        for cls, name, type_name in fields:
+            head += struct.pack('<HHI', tidx[cls], tidx[type_name], sidx[name])
+        for cls, name, proto in methods:
+            head += struct.pack('<HHI', tidx[cls], pidx[proto], sidx[name])
+        for (name, *_), class_data_off in zip(self.classes, class_data_offs):
+            head += struct.pack('<8I', tidx[name], 0x1, tidx['Ljava/lang/Object;'], 0, 0xFFFFFFFF,
+                                0, class_data_off, 0)
+        body = bytes(head) + bytes(data)
+        # Các bảng id nối tiếp nhau ngay sau header
+        offsets = []
+        off = 0x70
+        for count, size in ((len(strings), 4), (len(types), 4), (len(protos), 12),
+                            (len(fields), 8), (len(methods), 8), (len(self.classes), 32)):
+            offsets += [count, off]
+            off += count * size
+        header = struct.pack('<8sI20s20I', b'dex\n035\0', 0, b'\0' * 20, 0x70 + len(body), 0x70,
+                             0x12345678, 0, 0, 0, *offsets, len(data), data_off)
+        dex = bytearray(header + body)
+        dex[12:32] = hashlib.sha1(dex[32:]).digest()
+        dex[8:12] = struct.pack('<I', zlib.adler32(bytes(dex[12:])))
+        return bytes(dex)
+
+
+def const(reg, value):
+    """Lệnh const ngắn nhất nạp value vào thanh ghi"""
+    if reg < 16 and -8 <= value < 8:
+        return [0x12 | reg << 8 | (value & 0xF) << 12]                 # const/4
+    if -0x8000 <= value < 0x8000:
+        return [0x13 | reg << 8, value & 0xFFFF]                        # const/16
+    if value & 0xFFFF == 0:
+        return [0x15 | reg << 8, (value >> 16) & 0xFFFF]                # const/high16
+    return const32(reg, value)
+
+
+def const32(reg, value):
+    value &= 0xFFFFFFFF
+    return [0x14 | reg << 8, value & 0xFFFF, value >> 16]               # const
+
+
+def payload(width, values):
+    """fill-array-data-payload (số code unit chẵn)"""
+    raw = struct.pack(f'<{len(values)}{ {1: "b", 2: "h", 4: "i", 8: "q"}[width] }', *values)
+    raw += b'\0' * (len(raw) % 2)
+    return [0x0300, width, len(values) & 0xFFFF, len(values) >> 16,
+            *struct.unpack(f'<{len(raw) // 2}H', raw)]
+
+
+def fill_array_data(code, reg, field, width, values, writer):
+    """<clinit>: new-array đã có trong reg, thêm fill-array-data + sput-object, trả về hàm vá offset"""
+    at = len(code)
+    code += [0x26 | reg << 8, 0, 0, 0x69 | reg << 8, writer.fidx[field]]
+
+    def place(code):
+        if len(code) % 2:
+            code.append(0)                                               # nop căn payload
+        offset = len(code) - at
+        code[at + 1:at + 3] = [offset & 0xFFFF, offset >> 16]
+        code += payload(width, values)
+    return place
+
+
+def xor_decryptor(field):
+    """Decryptor XOR thuần: out[i] = char(a[p0 + i] ^ p2), độ dài p1 - p0 (p0..p2 = v6..v8)
+
+    Trả thẳng char[] thay vì new String(char[]): emulator chỉ cần vòng lặp aput-char.
+    """
+    def code(writer):
+        return [0x0291, 0x0607,                                     # sub-int v2, p1, p0
+                0x23 | 0 << 8 | 2 << 12, writer.tidx['[C'],         # new-array v0, v2, [C
+                0x12 | 1 << 8,                                      # const/4 v1, 0
+                0x0291, 0x0607,                                     # :loop sub-int v2, p1, p0
+                0x35 | 1 << 8 | 2 << 12, 15,                        # if-ge v1, v2, :end
+                0x62 | 2 << 8, writer.fidx[field],                  # sget-object v2, field
+                0x90 | 3 << 8, 6 | 1 << 8,                          # add-int v3, p0, v1
+                0x4a | 2 << 8, 2 | 3 << 8,                          # aget-short v2, v2, v3
+                0xb7 | 2 << 8 | 8 << 12,                            # xor-int/2addr v2, p2
+                0x8e | 2 << 8 | 2 << 12,                            # int-to-char v2, v2
+                0x50 | 2 << 8, 0 | 1 << 8,                          # aput-char v2, v0, v1
+                0xd8 | 1 << 8, 1 | 1 << 8,                          # add-int/lit8 v1, v1, 1
+                0x28 | (-16 & 0xFF) << 8,                           # goto :loop
+                0x11]                                               # :end return-object v0
+    return code
+
+
+def build(values, sites):
+    """Ảnh classes.dex từ array-data và call site của am.smali"""
+    writer = DexWriter()
+    am_field = (AM, '$', '[S')
+    b_field = (B, 'other', '[S')
+    b_ints = (B, 'k', '[I')
+    for type_name in ('[C', '[S', '[I'):
+        writer.type(type_name)
+    writer.field(AM, 'x', 'I')
+
+    def am_clinit(writer):
+        code = const32(0, len(values)) + [0x23, writer.tidx['[S']]        # new-array v0, v0, [S
+        place = fill_array_data(code, 0, am_field, 2, values, writer)
+        code.append(0x0e)                                                # return-void
+        place(code)
+        return code
+
+    def am_calls(writer):
+        decryptor = writer.midx[AM, '$', DECRYPTOR]
+        code = []
+        for i, site in enumerate(sites):
+            mode = i % 4
+            if mode == 0:
+                # invoke-static/range {v16 .. v18}
+                code += const(16, site.start) + const(17, site.end) + const(18, site.key)
+                code += [0x77 | 3 << 8, decryptor, 16]
+            elif mode == 1:
+                code += const(0, site.start) + const(1, site.end) + const(2, site.key)
+                code += [0x71 | 3 << 12, decryptor, 0 | 1 << 4 | 2 << 8]
+            elif mode == 2:
+                # Tham số đi qua move, move/from16, move/16; const-wide vào thanh ghi khác
+                code += const32(5, site.start) + [0x01 | 0 << 8 | 5 << 12]
+                code += const(6, site.end) + [0x02 | 1 << 8, 6]
+                code += const(7, site.key) + [0x03, 2, 7]
+                code += [0x18 | 9 << 8, 1, 2, 3, 4]
+                code += [0x71 | 3 << 12, decryptor, 0 | 1 << 4 | 2 << 8]
+            else:
+                # goto nhảy qua một đoạn dữ liệu giống payload
+                code += const(3, site.start) + const(4, site.end) + const(5, site.key)
+                code += [0x28 | 8 << 8, 0x0100, 1, 0, 0, 0, 0, 0, 0]
+                code += [0x71 | 3 << 12, decryptor, 3 | 4 << 4 | 5 << 8]
+            # Ghi đè thanh ghi giữa các call site
+            code += [0xd8 | 1 << 8, 1 | 1 << 8, 0xd8 | 17 << 8, 17 | 1 << 8]
+        # Không phải call site: v1 bị ghi bởi sget, rồi v1/v2 bị ghi bởi const-wide/16 v1
+        code += const(0, 1) + const(1, 5) + const(2, 7) + [0x52 | 1 << 8, writer.fidx[AM, 'x', 'I']]
+        code += [0x71 | 3 << 12, decryptor, 0 | 1 << 4 | 2 << 8]
+        code += const(0, 1) + const(1, 5) + const(2, 7) + [0x16 | 1 << 8, 5]
+        code += [0x71 | 3 << 12, decryptor, 0 | 1 << 4 | 2 << 8]
+        return code + [0x0e]
+
+    def b_clinit(writer):
+        code = [0x12, 0x23, writer.tidx['[I']]                           # new-array v0, v0, [I
+        place_ints = fill_array_data(code, 0, b_ints, 4, B_INTS, writer)
+        code += [0x12 | 1 << 8, 0x23 | 1 << 8 | 1 << 12, writer.tidx['[S']]
+        place_shorts = fill_array_data(code, 1, b_field, 2,
+                                       [ord(c) ^ B_KEY for c in B_TEXT], writer)
+        code.append(0x0e)
+        place_ints(code)
+        place_shorts(code)
+        return code
+
+    def b_run(writer):
+        own = writer.midx[B, '$', DECRYPTOR]
+        foreign = writer.midx[AM, '$', DECRYPTOR]
+        code = []
+        for start, end, key in B_CALLS:
+            code += const(0, start) + const(1, end) + const(2, key)
+            code += [0x71 | 3 << 12, own, 0x210]
+        # Gọi decryptor của class khác: không thuộc B nên không giải mã
+        code += [0x71 | 3 << 12, foreign, 0x210]
+        return code + [0x0e]
+
+    void = ('V', ())
+    writer.add_class(AM, [('$', '[S'), ('x', 'I')],
+                     [('$', DECRYPTOR, 9, 3, xor_decryptor(am_field)),
+                      ('<clinit>', void, 1, 0, am_clinit)],
+                     [('onCreateDialog', ('Landroid/app/Dialog;', ('Landroid/os/Bundle;',)),
+                       20, 2, am_calls)])
+    writer.add_class(B, [('k', '[I'), ('other', '[S')],
+                     [('$', DECRYPTOR, 9, 3, xor_decryptor(b_field)),
+                      ('<clinit>', void, 2, 0, b_clinit),
+                      ('run', void, 3, 0, b_run)])
+    return writer.build()
+
+
+def main():
+    values = core.extract_array_data_from_file(AM_SMALI).tolist()
+    data = build(values, callsites.find_own_call_sites(AM_SMALI))
+    with open(DEX_PATH, 'wb') as f:
+        f.write(data)
+    # APK chứa cùng một file DEX hai lần: call site giống nhau, khác member
+    with zipfile.ZipFile(APK_PATH, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name in ('classes.dex', 'AndroidManifest.xml', 'classes2.dex'):
+            info = zipfile.ZipInfo(name, date_time=(2020, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, b'' if name.endswith('.xml') else data)
+    print(f"Đã ghi {DEX_PATH} ({len(data)} byte) và {APK_PATH}")
+
+
+if __name__ == '__main__':
+    main()
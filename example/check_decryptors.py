@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Kiểm tra emulator trên các biến thể decryptor trong example/decryptors.
+
+Chạy từ thư mục gốc repo:
+
+    python example/check_decryptors.py
+
+Mỗi `<tên>.smali` có `<tên>.expected.txt` (một chuỗi mỗi dòng) phải được `calls` và
+`decode --range` giải mã đúng các chuỗi đó. File không có expected (rolling.smali) có key
+phụ thuộc lần lặp trước: `calls` phải báo decryptor không dịch được và thoát với mã 1.
+"""
+
+import ast
+import glob
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UNSUPPORTED = "Không dịch được decryptor"
+
+
+def run(*args):
+    """(mã thoát, stdout, stderr) của `python -m smalixor --no-cache ...`"""
+    result = subprocess.run([sys.executable, '-m', 'smalixor', '--no-cache', *args], cwd=ROOT,
+                            capture_output=True, text=True, encoding='utf-8')
+    return result.returncode, result.stdout, result.stderr
+
+
+def check_supported(path, expected):
+    code, out, err = run('calls', path)
+    if code:
+        return f"calls lỗi ({code}): {err.strip()}"
+    rows = [line.split('\t') for line in out.splitlines()]
+    got = [ast.literal_eval(row[-1]) for row in rows]
+    if got != expected:
+        return f"calls: {got!r}"
+    # decode dùng cùng decryptor với calls khi nhận start:end:key của call site
+    ranges = [row[2] for row in rows]
+    code, out, err = run('decode', path, *(f'--range={spec}' for spec in ranges))
+    if code:
+        return f"decode lỗi ({code}): {err.strip()}"
+    got = [line.split('\t', 1)[1] for line in out.splitlines()]
+    if got != expected:
+        return f"decode: {got!r}"
+    return None
+
+
+def check_unsupported(path):
+    code, out, err = run('calls', path)
+    if code != 1 or out or UNSUPPORTED not in err:
+        return f"calls phải báo lỗi decryptor (mã {code}): {out.strip()} {err.strip()}"
+    return None
+
+
+def main():
+    failed = 0
+    paths = sorted(glob.glob(os.path.join(ROOT, 'example', 'decryptors', '*.smali')))
+    for path in paths:
+        name = os.path.relpath(path, ROOT)
+        expected_path = path[:-len('.smali')] + '.expected.txt'
+        if os.path.exists(expected_path):
+            with open(expected_path, encoding='utf-8') as f:
+                error = check_supported(name, f.read().splitlines())
+        else:
+            error = check_unsupported(name)
+        print(f"{name}\t{'FAIL: ' + error if error else 'ok'}")
+        failed += error is not None
+    return 1 if failed or not paths else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
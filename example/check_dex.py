@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Chạy `calls` và `strings` trên example/classes.dex, example/app.apk và kiểm tra kết quả.
+
+Chạy từ thư mục gốc repo (fixture dựng bằng example/build_dex.py):
+
+    python example/check_dex.py
+
+Chuỗi của class am trong DEX phải trùng với `calls example/am.smali` (cùng array-data và
+call site), tiếp theo là hai chuỗi của Lx/B;. Trong APK, mỗi call site xuất hiện một lần với
+`app.apk!classes.dex` và một lần với `app.apk!classes2.dex`, cùng offset lệnh invoke.
+"""
+
+import ast
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+B_STRINGS = ['Hello', 'from Lx/B; in classes.dex']
+
+
+def run(*args):
+    """stdout của `python -m smalixor --no-cache ...`, raise nếu lệnh lỗi"""
+    result = subprocess.run([sys.executable, '-m', 'smalixor', '--no-cache', *args], cwd=ROOT,
+                            capture_output=True, text=True, encoding='utf-8')
+    if result.returncode:
+        raise SystemExit(f"{' '.join(args)} lỗi ({result.returncode}):\n{result.stderr}")
+    return result.stdout
+
+
+def calls(path):
+    """List (vị trí, string) từ output của `calls`"""
+    rows = []
+    for line in run('calls', path).splitlines():
+        location, _, _, text = line.split('\t')
+        rows.append((location, ast.literal_eval(text)))
+    return rows
+
+
+def check(condition, message):
+    if not condition:
+        raise SystemExit(f"FAIL: {message}")
+
+
+def main():
+    expected = [text for _, text in calls('example/am.smali')] + B_STRINGS
+
+    dex_rows = calls('example/classes.dex')
+    check([text for _, text in dex_rows] == expected,
+          f"calls classes.dex: {[text for _, text in dex_rows]!r}")
+    check(all(location.startswith('example/classes.dex:') for location, _ in dex_rows),
+          "calls classes.dex: vị trí không phải file .dex")
+
+    apk_rows = calls('example/app.apk')
+    for member in ('classes.dex', 'classes2.dex'):
+        prefix = f'example/app.apk!{member}:'
+        rows = [(location[len(prefix):], text) for location, text in apk_rows
+                if location.startswith(prefix)]
+        check(rows == [(location.split(':')[1], text) for location, text in dex_rows],
+              f"calls app.apk: call site của {member} không khớp classes.dex")
+    check(len(apk_rows) == 2 * len(dex_rows), f"calls app.apk: {len(apk_rows)} dòng")
+
+    records = [json.loads(line) for line in run('strings', 'example/app.apk').splitlines()]
+    check([record['string'] for record in records] == expected * 2,
+          "strings app.apk: chuỗi không khớp")
+    check([record['file'] for record in records] ==
+          [f'example/app.apk!{member}' for member in ('classes.dex', 'classes2.dex')
+           for _ in expected], "strings app.apk: file không mang tên member DEX")
+    check([f"{record['file']}:{record['line']}" for record in records] ==
+          [location for location, _ in apk_rows], "strings app.apk: line khác calls")
+    check({record['class'] for record in records} == {'Landroidx/activity/am;', 'Lx/B;'},
+          "strings app.apk: class không khớp")
+
+    print(f"ok: {len(dex_rows)} call site mỗi file DEX, {len(records)} chuỗi trong app.apk")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,17 +3,121 @@
 
 import sys
 import os
-import base64
-import re
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Có tham số dòng lệnh => chạy CLI, không import Qt
+    from smalixor.cli import main as cli_main
+    sys.exit(cli_main())
+
+import json
+from array import array
+from importlib.util import find_spec
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QLineEdit, QPushButton, 
                              QTextEdit, QFileDialog, QCheckBox, QMessageBox,
-                             QComboBox, QGroupBox, QTableWidget, QTableWidgetItem,
+                             QComboBox, QGroupBox, QTableView, QProgressBar,
                              QHeaderView, QTabWidget, QSpinBox, QDialog, QFormLayout,
                              QGridLayout, QTextEdit)
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QFont, QIcon
-from qt_material import apply_stylesheet
+from PyQt6.QtCore import (Qt, QAbstractTableModel, QModelIndex, QObject, QRunnable,
+                          QThreadPool, QDir, QFileSystemWatcher, QTimer, pyqtSignal)
+from PyQt6.QtGui import (QFont, QIcon, QColor, QFontDatabase, QGuiApplication, QKeySequence,
+                         QPalette, QShortcut)
+
+import numpy as np
+
+from smalixor import (cache, callsites, core, export, keyfinder, plaintext, profiling, search,
+                      smali_parser, watch)
+from smalixor.document import SmaliDocument
+
+THEME = 'dark_teal.xml'
+# Watch mode: gom các sự kiện file system trong khoảng này thành một lần scan
+WATCH_DEBOUNCE_MS = 300
+# Nhiều file hơn mức này thì chỉ đăng ký thư mục, nội dung file được kiểm tra stat định kỳ
+WATCH_FILE_LIMIT = 4096
+WATCH_POLL_MS = 2000
+# Số kết quả tìm kiếm tối đa hiển thị trong Range Result
+SEARCH_RESULT_LIMIT = 1000
+# Chế độ của ô Search: chuỗi đã giải mã (chỉ mục), plaintext đã biết trong array/project
+SEARCH_MODES = ["Decoded strings", "Plaintext (array)", "Plaintext (project)"]
+# Process pool được tạo từ thread của QThreadPool: không fork process đang chạy Qt
+WORKER_MP_CONTEXT = 'spawn'
+
+def _theme_source_stamp():
+    """(đường dẫn, mtime) của qt_material đã cài, để bỏ stylesheet cache khi nâng cấp"""
+    spec = find_spec('qt_material')
+    if spec is None or not spec.origin:
+        return None
+    return [spec.origin, os.stat(spec.origin).st_mtime_ns]
+
+def _icons_stamp(icons_dir):
+    try:
+        return os.stat(icons_dir).st_mtime_ns
+    except OSError:
+        return None
+
+def build_theme_cache(theme):
+    """Compile theme qt-material (render template + sinh icon) và trả về dữ liệu để cache"""
+    import qt_material
+    
+    stylesheet = qt_material.build_stylesheet(theme)
+    if stylesheet is None:
+        return None
+    package_dir = os.path.dirname(os.path.abspath(qt_material.__file__))
+    fonts_dir = os.path.join(package_dir, 'fonts', 'roboto')
+    icons_dir = os.path.join(qt_material.RESOURCES_PATH, 'theme')
+    return {
+        'theme': theme,
+        'source': _theme_source_stamp(),
+        'stylesheet': stylesheet,
+        'text_color': qt_material.get_theme(theme)['primaryColor'],
+        'fonts': [os.path.join(fonts_dir, name) for name in sorted(os.listdir(fonts_dir))
+                  if name.endswith('.ttf')],
+        'icons_dir': icons_dir,
+        'icons_stamp': _icons_stamp(icons_dir),
+        'resources_dir': os.path.join(package_dir, 'resources'),
+    }
+
+def apply_theme(app, theme=THEME):
+    """Áp dụng theme qt-material, dùng stylesheet đã compile sẵn trên đĩa nếu còn hợp lệ
+    
+    apply_stylesheet của qt_material render template Jinja và ghi lại toàn bộ icon
+    mỗi lần chạy; cache bỏ qua cả việc import qt_material khi khởi động.
+    """
+    app.setStyle('Fusion')
+    cache_file = os.path.join(cache.default_cache_dir(),
+                              f"stylesheet-{os.path.splitext(theme)[0]}.json")
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if (cached.get('theme') != theme or cached.get('source') != _theme_source_stamp()
+                or cached.get('icons_stamp') != _icons_stamp(cached.get('icons_dir', ''))):
+            cached = None
+    except (OSError, ValueError):
+        cached = None
+        
+    if cached is None:
+        # build_stylesheet đã tự nạp font, palette và search path cho icon
+        cached = build_theme_cache(theme)
+        if cached is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(cache_file, 'w', encoding='utf-8') as f:
+                json.dump(cached, f)
+        except OSError as e:
+            print(f"Không ghi được cache stylesheet: {e}")
+    else:
+        for font_file in cached['fonts']:
+            QFontDatabase.addApplicationFont(font_file)
+        palette = QGuiApplication.palette()
+        color = QColor(cached['text_color'])
+        color.setAlpha(92)
+        palette.setColor(QPalette.ColorRole.Text, color)
+        QGuiApplication.setPalette(palette)
+        QDir.addSearchPath('icon', cached['icons_dir'])
+        QDir.addSearchPath('qt_material', cached['resources_dir'])
+        
+    app.setStyleSheet(cached['stylesheet'])
 
 class RangeEditDialog(QDialog):
     def __init__(self, start_index, end_index, current_string="", parent=None):
@@ -94,13 +198,7 @@ class RangeEditDialog(QDialog):
             return None
             
         try:
-            if self.key_decimal_cb.isChecked():
-                return int(key_str)
-            else:
-                if key_str.startswith('0x'):
-                    return int(key_str[2:], 16)
-                else:
-                    return int(key_str, 16)
+            return core.parse_hex_or_decimal(key_str, self.key_decimal_cb.isChecked())
         except ValueError:
             return None
             
@@ -123,23 +221,149 @@ class RangeEditDialog(QDialog):
             
         try:
             # Chuyển đổi string thành XOR values
-            xor_values = []
-            for char in unicode_string:
-                char_code = ord(char)
-                xor_value = char_code ^ xor_key
-                xor_values.append(f"0x{xor_value:04x}")
-                
-            preview_text = " ".join(xor_values)
+            preview_text = " ".join(map(core.format_short_literal,
+                                        core.encode_xor(unicode_string, xor_key)))
             self.preview_text.setPlainText(preview_text)
             
         except Exception as e:
             QMessageBox.critical(self, "Lỗi", f"Không thể tạo preview: {e}")
 
+class ArrayDataModel(QAbstractTableModel):
+    """Model cho bảng array-data, chỉ tính giá trị của các ô đang hiển thị"""
+    
+    HEADERS = ["Index", "Hex Value", "Decimal", "Decoded Char"]
+    # Các XOR key phổ biến để thử decode
+    TRIAL_KEYS = (0x174a, 0x5072, 0x0000)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.array_data = array('h')
+        self.width = 2
+        
+    def set_array_data(self, array_data):
+        """Thay toàn bộ array-data của model"""
+        self.beginResetModel()
+        self.array_data = array_data
+        self.width = smali_parser.width_of(array_data)
+        self.endResetModel()
+        
+    def update_array_data(self, array_data):
+        """Đổi sang array mới; cùng kích thước thì chỉ báo cập nhật vùng có giá trị khác"""
+        if len(array_data) != len(self.array_data) or \
+                smali_parser.width_of(array_data) != self.width:
+            self.set_array_data(array_data)
+            return
+        old_data = self.array_data
+        self.array_data = array_data
+        changed = np.flatnonzero(np.frombuffer(array_data, dtype=array_data.typecode)
+                                 != np.frombuffer(old_data, dtype=old_data.typecode))
+        if changed.size:
+            self.update_rows(int(changed[0]), int(changed[-1]) + 1)
+        
+    def update_rows(self, start_row, end_row):
+        """Báo cho view cập nhật các dòng [start_row, end_row)"""
+        end_row = min(end_row, len(self.array_data))
+        if start_row < end_row:
+            self.dataChanged.emit(self.index(start_row, 0),
+                                  self.index(end_row - 1, len(self.HEADERS) - 1))
+        
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.array_data)
+        
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+        
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+        
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+            
+        row = index.row()
+        column = index.column()
+        hex_val = self.array_data[row]
+        
+        if column == 0:
+            return str(row)
+        if column == 1:
+            return core.format_literal(hex_val, self.width)
+        if column == 2:
+            return str(hex_val)
+            
+        # Decoded char (với XOR key mặc định)
+        decoded_chars = []
+        for test_key in self.TRIAL_KEYS:
+            decoded_val = hex_val ^ test_key
+            if 32 <= decoded_val <= 126:  # Printable ASCII
+                decoded_chars.append(chr(decoded_val))
+            else:
+                decoded_chars.append('?')
+        return ' | '.join(decoded_chars)
+
+class WorkerSignals(QObject):
+    """Signal của Worker (QRunnable không kế thừa QObject)"""
+    
+    progress = pyqtSignal(int, int)
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()
+
+class Worker(QRunnable):
+    """Chạy fn(progress) trong QThreadPool, báo tiến độ và hỗ trợ huỷ"""
+    
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+        self.signals = WorkerSignals()
+        self.is_cancelled = False
+        self._last_percent = -1
+        
+    def cancel(self):
+        """Yêu cầu huỷ, có hiệu lực ở lần báo tiến độ kế tiếp"""
+        self.is_cancelled = True
+        
+    def report_progress(self, done, total):
+        """Callback progress truyền vào core"""
+        if self.is_cancelled:
+            raise core.TaskCancelled()
+        # Chỉ emit khi phần trăm thay đổi để không làm ngập event loop
+        percent = done * 100 // total if total else 0
+        if percent != self._last_percent:
+            self._last_percent = percent
+            self.signals.progress.emit(done, total)
+            
+    def run(self):
+        try:
+            result = self.fn(self.report_progress)
+        except core.TaskCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            if self.is_cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
 class XORConverterApp(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.current_array_data = []  # Lưu array-data hiện tại
+        self.current_array_data = array('h')  # Lưu array-data hiện tại (đã parse)
         self.current_smali_file = ""  # Lưu đường dẫn file smali
+        self.current_document = None  # SmaliDocument của file smali (offset + range đã sửa)
+        self.thread_pool = QThreadPool.globalInstance()
+        self.active_tasks = {}  # Tên tác vụ -> Worker đang chạy
+        self.project_watcher = None  # watch.ProjectWatcher của thư mục đang theo dõi
+        self.fs_watcher = None
+        self.watch_scan_running = False
+        self.watch_scan_pending = False
+        self.call_site_text = None  # Nội dung Range Result lần cuối hiển thị call site
         self.initUI()
         
     def initUI(self):
@@ -168,12 +392,33 @@ class XORConverterApp(QMainWindow):
         # Tab 1: Basic Converter
         self.create_basic_tab()
         
-        # Tab 2: Advanced Array Editor
-        self.create_advanced_tab()
+        # Tab 2: Advanced Array Editor (chỉ dựng widget khi mở tab lần đầu)
+        self.array_model = ArrayDataModel(self)
+        self.mutating_buttons = []
+        self.advanced_widget = None
+        self.tab_widget.addTab(QWidget(), "Advanced Editor")
+        self.tab_widget.currentChanged.connect(self.on_tab_changed)
         
         # Status bar
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(200)
+        self.progress_bar.setVisible(False)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.cancel_tasks)
+        self.cancel_btn.setVisible(False)
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        self.statusBar().addPermanentWidget(self.cancel_btn)
         self.statusBar().showMessage("Sẵn sàng")
         
+        # Watch mode: debounce sự kiện file system, poll khi cây quá lớn
+        self.watch_debounce = QTimer(self)
+        self.watch_debounce.setSingleShot(True)
+        self.watch_debounce.setInterval(WATCH_DEBOUNCE_MS)
+        self.watch_debounce.timeout.connect(self.run_watch_scan)
+        self.watch_poll = QTimer(self)
+        self.watch_poll.setInterval(WATCH_POLL_MS)
+        self.watch_poll.timeout.connect(self.run_watch_scan)
+        
     def create_basic_tab(self):
         """Tạo tab cơ bản"""
         basic_widget = QWidget()
@@ -215,6 +460,12 @@ class XORConverterApp(QMainWindow):
         self.extract_btn.setVisible(False)
         file_layout.addWidget(self.extract_btn)
         
+        # Theo dõi cả thư mục smali, tự load lại khi file đổi nội dung
+        self.watch_btn = QPushButton("Watch Folder...")
+        self.watch_btn.clicked.connect(self.toggle_watch)
+        self.watch_btn.setVisible(False)
+        file_layout.addWidget(self.watch_btn)
+        
         layout.addWidget(file_group)
         
         # Group cho parameters
@@ -282,6 +533,16 @@ class XORConverterApp(QMainWindow):
         
         self.tab_widget.addTab(basic_widget, "Basic Converter")
         
+    def on_tab_changed(self, index):
+        """Dựng tab nâng cao khi được chọn lần đầu"""
+        if index == 1:
+            self.ensure_advanced_tab()
+            
+    def ensure_advanced_tab(self):
+        """Tạo tab nâng cao nếu chưa có"""
+        if self.advanced_widget is None:
+            self.create_advanced_tab()
+            
     def create_advanced_tab(self):
         """Tạo tab nâng cao"""
         advanced_widget = QWidget()
@@ -326,6 +587,42 @@ class XORConverterApp(QMainWindow):
         self.edit_range_btn.clicked.connect(self.edit_range)
         range_layout.addWidget(self.edit_range_btn, 1, 4)
         
+        self.decode_calls_btn = QPushButton("Decode Call Sites")
+        self.decode_calls_btn.clicked.connect(self.decode_call_sites)
+        range_layout.addWidget(self.decode_calls_btn, 1, 5)
+        
+        self.find_key_btn = QPushButton("Find Key")
+        self.find_key_btn.clicked.connect(self.find_key)
+        range_layout.addWidget(self.find_key_btn, 2, 3)
+        
+        self.export_strings_btn = QPushButton("Export All Strings")
+        self.export_strings_btn.clicked.connect(self.export_all_strings)
+        range_layout.addWidget(self.export_strings_btn, 2, 5)
+        
+        # Block array-data đang làm việc (label, field, độ rộng)
+        range_layout.addWidget(QLabel("Block:"), 2, 0)
+        self.block_combo = QComboBox()
+        self.block_combo.currentIndexChanged.connect(self.on_block_changed)
+        range_layout.addWidget(self.block_combo, 2, 1, 1, 2)
+        
+        # Tìm trong mọi chuỗi đã giải mã của thư mục (đang theo dõi hoặc chứa file đang mở)
+        range_layout.addWidget(QLabel("Search:"), 3, 0)
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Chuỗi cần tìm trong cả project")
+        self.search_input.returnPressed.connect(self.search_strings)
+        range_layout.addWidget(self.search_input, 3, 1, 1, 2)
+        # Plaintext đã biết: tìm range + key qua chuỗi hiệu XOR, không cần decode trước
+        self.search_mode_combo = QComboBox()
+        self.search_mode_combo.addItems(SEARCH_MODES)
+        self.search_mode_combo.currentIndexChanged.connect(
+            lambda index: self.search_regex_cb.setEnabled(index == 0))
+        range_layout.addWidget(self.search_mode_combo, 3, 3)
+        self.search_regex_cb = QCheckBox("Regex")
+        range_layout.addWidget(self.search_regex_cb, 3, 4)
+        self.search_btn = QPushButton("Search")
+        self.search_btn.clicked.connect(self.search_strings)
+        range_layout.addWidget(self.search_btn, 3, 5)
+        
         layout.addWidget(range_group)
         
         # Range Result
@@ -357,30 +654,148 @@ class XORConverterApp(QMainWindow):
         self.export_btn = QPushButton("Export Modified")
         self.export_btn.clicked.connect(self.export_modified)
         
+        self.undo_btn = QPushButton("Undo")
+        self.undo_btn.clicked.connect(self.undo_edit)
+        
+        self.redo_btn = QPushButton("Redo")
+        self.redo_btn.clicked.connect(self.redo_edit)
+        
+        # Ghi lịch sử undo ra file .journal cạnh file smali mỗi lần lưu
+        self.keep_journal_cb = QCheckBox("Lưu lịch sử undo")
+        self.keep_journal_cb.toggled.connect(self.on_keep_journal_toggled)
+        
         controls_layout.addWidget(self.refresh_btn)
         controls_layout.addWidget(self.save_changes_btn)
         controls_layout.addWidget(self.export_btn)
+        controls_layout.addWidget(self.undo_btn)
+        controls_layout.addWidget(self.redo_btn)
+        controls_layout.addWidget(self.keep_journal_cb)
         table_layout.addLayout(controls_layout)
         
+        # Ctrl+Z / Ctrl+Shift+Z trong tab (ô nhập liệu đang focus vẫn dùng undo riêng của nó)
+        for key, slot in ((QKeySequence.StandardKey.Undo, self.undo_edit),
+                          (QKeySequence.StandardKey.Redo, self.redo_edit)):
+            shortcut = QShortcut(QKeySequence(key), advanced_widget)
+            shortcut.setContext(Qt.ShortcutContext.WidgetWithChildrenShortcut)
+            shortcut.activated.connect(slot)
+        
         # Table
-        self.array_table = QTableWidget()
-        self.array_table.setColumnCount(4)
-        self.array_table.setHorizontalHeaderLabels(["Index", "Hex Value", "Decimal", "Decoded Char"])
-        self.array_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.array_table = QTableView()
+        self.array_table.setModel(self.array_model)
+        # Không dùng ResizeToContents vì phải đo toàn bộ các dòng
+        self.array_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.array_table.horizontalHeader().setStretchLastSection(True)
+        self.array_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.array_table.verticalHeader().setVisible(False)
         table_layout.addWidget(self.array_table)
         
         layout.addWidget(table_group)
         
-        self.tab_widget.addTab(advanced_widget, "Advanced Editor")
+        # Thay widget giữ chỗ bằng tab thật
+        self.advanced_widget = advanced_widget
+        current_index = self.tab_widget.currentIndex()
+        self.tab_widget.blockSignals(True)
+        self.tab_widget.removeTab(1)
+        self.tab_widget.insertTab(1, advanced_widget, "Advanced Editor")
+        self.tab_widget.setCurrentIndex(current_index)
+        self.tab_widget.blockSignals(False)
+        
+        self.mutating_buttons += [self.edit_range_btn, self.save_changes_btn, self.undo_btn,
+                                  self.redo_btn]
+        self.update_task_ui()
+        self.update_block_selector()
+        
+    def start_task(self, name, fn, on_result, message, exclusive=False):
+        """Chạy fn(progress) ở background; tác vụ cùng tên đang chạy sẽ bị huỷ
+        
+        Chỉ kết quả của lần gọi mới nhất với mỗi tên được áp dụng lên UI.
+        exclusive=True khoá các nút sửa/lưu file trong lúc chạy.
+        """
+        previous = self.active_tasks.get(name)
+        if previous is not None:
+            previous.cancel()
+            
+        worker = Worker(fn)
+        worker.exclusive = exclusive
+        worker.profile_mark = profiling.mark()
+        self.active_tasks[name] = worker
+        
+        def is_current():
+            return self.active_tasks.get(name) is worker
+            
+        def handle_result(result):
+            if is_current():
+                on_result(result)
+                
+        def handle_error(error):
+            if is_current():
+                QMessageBox.critical(self, "Lỗi", error)
+                self.statusBar().showMessage("Lỗi!")
+                
+        def handle_cancelled():
+            if is_current():
+                self.statusBar().showMessage("Đã huỷ")
+                
+        def handle_finished():
+            if is_current():
+                del self.active_tasks[name]
+                if profiling.is_enabled():
+                    self.report_profile(worker.profile_mark)
+            self.update_task_ui()
+            
+        worker.signals.progress.connect(self.on_task_progress)
+        worker.signals.result.connect(handle_result)
+        worker.signals.error.connect(handle_error)
+        worker.signals.cancelled.connect(handle_cancelled)
+        worker.signals.finished.connect(handle_finished)
+        
+        self.statusBar().showMessage(message)
+        self.progress_bar.setValue(0)
+        self.update_task_ui()
+        self.thread_pool.start(worker)
+        return worker
+        
+    def on_task_progress(self, done, total):
+        """Cập nhật thanh tiến độ"""
+        self.progress_bar.setValue(done * 100 // total if total else 0)
+        
+    def update_task_ui(self):
+        """Hiện/ẩn progress + Cancel, khoá các nút sửa file khi có tác vụ exclusive"""
+        running = bool(self.active_tasks)
+        self.progress_bar.setVisible(running)
+        self.cancel_btn.setVisible(running)
+        busy = any(worker.exclusive for worker in self.active_tasks.values())
+        for button in [self.extract_btn] + self.mutating_buttons:
+            button.setEnabled(not busy)
+            
+    def report_profile(self, since):
+        """Hiện thời gian từng stage lên status bar và ghi Chrome trace (khi bật SMALIXOR_PROFILE)"""
+        stages = profiling.format_summary(since)
+        if stages:
+            self.statusBar().showMessage(f"{self.statusBar().currentMessage()} — {stages}")
+        trace_path = profiling.trace_path_from_env()
+        if trace_path:
+            try:
+                profiling.write_chrome_trace(trace_path)
+            except OSError as e:
+                print(f"Không ghi được trace {trace_path}: {e}")
+            
+    def cancel_tasks(self):
+        """Huỷ mọi tác vụ đang chạy"""
+        for worker in self.active_tasks.values():
+            worker.cancel()
+        self.statusBar().showMessage("Đang huỷ...")
         
     def on_file_type_changed(self, text):
         """Xử lý khi thay đổi loại file"""
         if text == "Smali File":
             self.file_input.setPlaceholderText("Chọn file smali...")
             self.extract_btn.setVisible(True)
+            self.watch_btn.setVisible(True)
         else:
             self.file_input.setPlaceholderText("Chọn file txt chứa array-data...")
             self.extract_btn.setVisible(False)
+            self.watch_btn.setVisible(self.project_watcher is not None)
             
     def browse_file(self):
         """Chọn file"""
@@ -398,54 +813,83 @@ class XORConverterApp(QMainWindow):
         if file_path:
             self.file_input.setText(file_path)
             
-    def extract_array_data_from_smali(self, smali_file_path):
+    def load_smali_document(self, smali_file_path, progress=None):
         """Trích xuất array-data từ file smali"""
-        try:
-            with open(smali_file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Tìm và trích xuất array-data (bao gồm cả giá trị âm)
-            pattern = r'-?0x[0-9a-fA-F]+s'
-            hex_values = re.findall(pattern, content)
-            
-            if not hex_values:
-                raise ValueError(f"Không tìm thấy array-data trong file: {smali_file_path}")
-            
-            print(f"Tìm thấy {len(hex_values)} giá trị hex trong {smali_file_path}")
-            return hex_values
-            
-        except Exception as e:
-            raise Exception(f"Lỗi khi đọc file {smali_file_path}: {e}")
+        smali_document = SmaliDocument.load(smali_file_path, progress)
+        print(f"Tìm thấy {len(smali_document)} giá trị hex trong {smali_file_path}")
+        return smali_document
             
     def extract_array_data(self):
         """Trích xuất array-data và lưu vào memory"""
-        try:
-            file_path = self.file_input.text().strip()
-            if not file_path or not os.path.exists(file_path):
-                QMessageBox.warning(self, "Lỗi", "Vui lòng chọn file smali hợp lệ!")
-                return
-                
-            self.statusBar().showMessage("Đang trích xuất array-data...")
-            hex_values = self.extract_array_data_from_smali(file_path)
-            
-            # Lưu vào memory
-            self.current_array_data = hex_values
-            self.current_smali_file = file_path
-            
-            # Refresh table
-            self.refresh_table()
-            
-            # Hiển thị thông tin
-            QMessageBox.information(self, "Thành công", 
-                                  f"Đã trích xuất {len(hex_values)} giá trị array-data!\n"
-                                  f"10 giá trị đầu: {hex_values[:10]}\n"
-                                  f"10 giá trị cuối: {hex_values[-10:]}")
+        file_path = self.file_input.text().strip()
+        if not file_path or not os.path.exists(file_path):
+            QMessageBox.warning(self, "Lỗi", "Vui lòng chọn file smali hợp lệ!")
+            return
             
-            self.statusBar().showMessage(f"Đã load {len(hex_values)} giá trị array-data")
+        self.start_task("extract",
+                        lambda progress: self.load_smali_document(file_path, progress),
+                        self.on_extract_finished,
+                        "Đang trích xuất array-data...", exclusive=True)
+            
+    def on_extract_finished(self, smali_document):
+        """Áp dụng kết quả extract lên UI (main thread)"""
+        hex_values = smali_document.values
+        
+        # Lưu vào memory
+        self.current_document = smali_document
+        if self.advanced_widget is not None and self.keep_journal_cb.isChecked():
+            smali_document.enable_journal_file()
+        self.current_array_data = hex_values
+        self.current_smali_file = smali_document.file_path
+        
+        # Refresh table
+        self.refresh_table()
+        self.update_block_selector()
+        
+        # Hiển thị thông tin
+        QMessageBox.information(self, "Thành công", 
+                              f"Đã trích xuất {len(hex_values)} giá trị array-data!\n"
+                              f"10 giá trị đầu: {self.format_values(hex_values[:10])}\n"
+                              f"10 giá trị cuối: {self.format_values(hex_values[-10:])}")
+        
+        self.statusBar().showMessage(f"Đã load {len(hex_values)} giá trị array-data")
+            
+    def update_block_selector(self):
+        """Liệt kê các block array-data của file đang load"""
+        if self.advanced_widget is None:
+            return
+        self.block_combo.blockSignals(True)
+        self.block_combo.clear()
+        if self.current_document is not None:
+            for block in self.current_document.blocks:
+                self.block_combo.addItem(f"{block.label} {block.field or ''} "
+                                         f"[{block.width} byte] ({len(block)})")
+            self.block_combo.setCurrentIndex(self.current_document.active)
+        self.block_combo.blockSignals(False)
+        
+    def on_block_changed(self, index):
+        """Chuyển sang block khác: bảng, decode và edit đều theo block này"""
+        if self.current_document is None or index < 0:
+            return
+        self.current_document.select(index)
+        self.current_array_data = self.current_document.values
+        self.refresh_table()
+        block = self.current_document.block
+        self.statusBar().showMessage(f"Block {block.label}: {len(block)} giá trị")
+        
+    def get_range_params(self):
+        """Đọc Start, End và XOR Key từ Range Editor"""
+        start_str = self.range_start_input.text().strip()
+        end_str = self.range_end_input.text().strip()
+        key_str = self.range_key_input.text().strip()
+        
+        if not start_str or not end_str or not key_str:
+            return None
             
-        except Exception as e:
-            QMessageBox.critical(self, "Lỗi", str(e))
-            self.statusBar().showMessage("Lỗi!")
+        start_index = self.parse_hex_or_decimal(start_str, self.range_start_decimal_cb.isChecked())
+        end_index = self.parse_hex_or_decimal(end_str, self.range_end_decimal_cb.isChecked())
+        xor_key = self.parse_hex_or_decimal(key_str, self.range_key_decimal_cb.isChecked())
+        return start_index, end_index, xor_key
             
     def decode_range(self):
         """Decode range với XOR key"""
@@ -455,68 +899,39 @@ class XORConverterApp(QMainWindow):
                 return
                 
             # Parse range
-            start_str = self.range_start_input.text().strip()
-            end_str = self.range_end_input.text().strip()
-            key_str = self.range_key_input.text().strip()
-            
-            if not start_str or not end_str or not key_str:
+            params = self.get_range_params()
+            if params is None:
                 QMessageBox.warning(self, "Lỗi", "Vui lòng nhập đầy đủ Start, End và XOR Key!")
                 return
-                
-            # Parse start index
-            if self.range_start_decimal_cb.isChecked():
-                start_index = int(start_str)
-            else:
-                if start_str.startswith('0x'):
-                    start_index = int(start_str[2:], 16)
-                else:
-                    start_index = int(start_str, 16)
-                    
-            # Parse end index
-            if self.range_end_decimal_cb.isChecked():
-                end_index = int(end_str)
-            else:
-                if end_str.startswith('0x'):
-                    end_index = int(end_str[2:], 16)
-                else:
-                    end_index = int(end_str, 16)
+            start_index, end_index, xor_key = params
             
-            # Parse XOR key
-            if self.range_key_decimal_cb.isChecked():
-                xor_key = int(key_str)
-            else:
-                if key_str.startswith('0x'):
-                    xor_key = int(key_str[2:], 16)
-                else:
-                    xor_key = int(key_str, 16)
-                
-            # Decode range
-            result = ""
-            hex_ints = []
-            
-            for i in range(start_index, min(end_index, len(self.current_array_data))):
-                hex_str = self.current_array_data[i]
-                if hex_str.startswith('-'):
-                    hex_val = -int(hex_str[3:-1], 16)
-                else:
-                    hex_val = int(hex_str[:-1], 16)
-                    
-                decoded_val = hex_val ^ xor_key
-                char = chr(decoded_val)
-                result += char
-                hex_ints.append(hex_val)
-                
-            # Hiển thị kết quả
-            range_info = f"Range {start_index}-{end_index} với XOR key 0x{xor_key:04x}:\n"
+        except Exception as e:
+            QMessageBox.critical(self, "Lỗi", str(e))
+            return
+            
+        smali_file = self.current_smali_file
+        blocks = self.current_document.blocks
+        index = self.current_document.active
+        # Copy để worker không đọc array đang bị sửa; decryptor có thể đọc cả block khác
+        block_values = [block.values[:] for block in blocks]
+        hex_ints = block_values[index][start_index:end_index]
+        
+        def task(progress):
+            # Giải mã theo thân decryptor đọc block (XOR thuần hoặc biến thể khác)
+            result = core.decode_block_ranges(smali_file, blocks, index,
+                                              [(start_index, end_index, xor_key)],
+                                              values=block_values)[0]
+            range_info = f"Range {start_index}-{end_index} với key 0x{xor_key:04x}:\n"
             range_info += f"Decoded string: {result}\n"
             range_info += f"Hex values: {' '.join([f'0x{x:04x}' for x in hex_ints])}\n"
             range_info += f"Length: {len(result)} characters"
+            return range_info
             
+        def on_result(range_info):
             self.range_result_text.setPlainText(range_info)
             self.statusBar().showMessage(f"Đã decode range {start_index}-{end_index}")
             
-        except Exception as e:
-            QMessageBox.critical(self, "Lỗi", str(e))
+        self.start_task("decode_range", task, on_result, "Đang decode range...")
             
     def edit_range(self):
         """Edit range với string mới"""
@@ -526,53 +941,20 @@ class XORConverterApp(QMainWindow):
                 return
                 
             # Parse range
-            start_str = self.range_start_input.text().strip()
-            end_str = self.range_end_input.text().strip()
-            key_str = self.range_key_input.text().strip()
-            
-            if not start_str or not end_str or not key_str:
+            params = self.get_range_params()
+            if params is None:
                 QMessageBox.warning(self, "Lỗi", "Vui lòng nhập Start, End Index và XOR Key!")
                 return
-                
-            # Parse start index
-            if self.range_start_decimal_cb.isChecked():
-                start_index = int(start_str)
-            else:
-                if start_str.startswith('0x'):
-                    start_index = int(start_str[2:], 16)
-                else:
-                    start_index = int(start_str, 16)
-                    
-            # Parse end index
-            if self.range_end_decimal_cb.isChecked():
-                end_index = int(end_str)
-            else:
-                if end_str.startswith('0x'):
-                    end_index = int(end_str[2:], 16)
-                else:
-                    end_index = int(end_str, 16)
+            start_index, end_index, xor_key = params
             
-            # Parse XOR key
-            if self.range_key_decimal_cb.isChecked():
-                xor_key = int(key_str)
-            else:
-                if key_str.startswith('0x'):
-                    xor_key = int(key_str[2:], 16)
-                else:
-                    xor_key = int(key_str, 16)
+            # Chuỗi mới được mã hoá XOR: block của decryptor khác XOR sẽ bị ghi sai
+            core.require_xor_block(self.current_smali_file, self.current_document.blocks,
+                                   self.current_document.active)
             
             # Decode current range để hiển thị
             current_string = ""
             if start_index < len(self.current_array_data) and end_index <= len(self.current_array_data):
-                for i in range(start_index, end_index):
-                    hex_str = self.current_array_data[i]
-                    if hex_str.startswith('-'):
-                        hex_val = -int(hex_str[3:-1], 16)
-                    else:
-                        hex_val = int(hex_str[:-1], 16)
-                    # Decode với XOR key
-                    decoded_val = hex_val ^ xor_key
-                    current_string += chr(decoded_val)
+                current_string = core.decode_xor(self.current_array_data, xor_key, start_index, end_index)
             
             # Mở dialog edit
             dialog = RangeEditDialog(start_index, end_index, current_string, self)
@@ -584,106 +966,345 @@ class XORConverterApp(QMainWindow):
                     QMessageBox.warning(self, "Lỗi", "Vui lòng nhập XOR key và string hợp lệ!")
                     return
                     
-                # Chuyển đổi string thành XOR values
-                xor_values = []
-                for char in new_string:
-                    char_code = ord(char)
-                    xor_value = char_code ^ new_xor_key
-                    xor_values.append(f"0x{xor_value:04x}s")
+                # Thay đúng range, chuỗi dài/ngắn hơn thì relocate size và call site
+                old_length = len(self.current_array_data)
+                written = self.current_document.replace_range(start_index, end_index, new_string,
+                                                              new_xor_key)
                 
-                # Update array data
-                for i, xor_val in enumerate(xor_values):
-                    if start_index + i < len(self.current_array_data):
-                        self.current_array_data[start_index + i] = xor_val
-                
-                # Refresh table
-                self.refresh_table()
+                if len(self.current_array_data) == old_length:
+                    # Chỉ cập nhật các dòng đã thay đổi
+                    self.array_model.update_rows(start_index, start_index + written)
+                else:
+                    self.refresh_table()
+                    self.update_block_selector()
                 
                 QMessageBox.information(self, "Thành công", 
-                                      f"Đã update range {start_index}-{end_index} với {len(new_string)} ký tự!")
+                                      f"Đã update range {start_index}-{end_index} với {written} giá trị "
+                                      f"(array-data: {old_length} -> {len(self.current_array_data)})!")
                 
         except Exception as e:
             QMessageBox.critical(self, "Lỗi", str(e))
             
-    def refresh_table(self):
-        """Refresh bảng array data"""
-        if not self.current_array_data:
+    def undo_edit(self):
+        """Hoàn tác bước sửa array-data gần nhất"""
+        self.apply_history(undo=True)
+        
+    def redo_edit(self):
+        """Làm lại bước vừa hoàn tác"""
+        self.apply_history(undo=False)
+        
+    def apply_history(self, undo):
+        """Undo/redo trên document và cập nhật các dòng bị ảnh hưởng"""
+        if self.current_document is None:
+            return
+        if any(worker.exclusive for worker in self.active_tasks.values()):
+            return
+        try:
+            old_length = len(self.current_array_data)
+            changes = self.current_document.undo() if undo else self.current_document.redo()
+        except Exception as e:
+            QMessageBox.critical(self, "Lỗi", str(e))
+            return
+        if changes is None:
+            self.statusBar().showMessage("Không còn gì để " + ("undo" if undo else "redo"))
+            return
+            
+        if len(self.current_array_data) != old_length:
+            self.refresh_table()
+            self.update_block_selector()
+        else:
+            for block, start, end in changes:
+                if block == self.current_document.active:
+                    self.array_model.update_rows(start, end)
+        journal = self.current_document.journal
+        self.statusBar().showMessage(f"{'Undo' if undo else 'Redo'}: bước {journal.cursor}/{len(journal)}")
+        
+    def on_keep_journal_toggled(self, checked):
+        """Bật/tắt ghi journal cạnh file cho document đang mở"""
+        if self.current_document is not None:
+            self.current_document.enable_journal_file(checked)
+            
+    def find_key(self):
+        """Brute-force 65536 XOR key cho range, hiển thị các key có điểm cao nhất"""
+        try:
+            if not self.current_array_data:
+                QMessageBox.warning(self, "Lỗi", "Chưa có array-data! Vui lòng extract trước.")
+                return
+                
+            start_str = self.range_start_input.text().strip()
+            end_str = self.range_end_input.text().strip()
+            if not start_str or not end_str:
+                QMessageBox.warning(self, "Lỗi", "Vui lòng nhập Start và End Index!")
+                return
+            start_index = self.parse_hex_or_decimal(start_str, self.range_start_decimal_cb.isChecked())
+            end_index = self.parse_hex_or_decimal(end_str, self.range_end_decimal_cb.isChecked())
+            
+            if start_index >= min(end_index, len(self.current_array_data)):
+                QMessageBox.warning(self, "Lỗi", "Range rỗng!")
+                return
+            
+            # Brute-force chỉ có nghĩa với decryptor XOR thuần
+            core.require_xor_block(self.current_smali_file, self.current_document.blocks,
+                                   self.current_document.active)
+                
+        except Exception as e:
+            QMessageBox.critical(self, "Lỗi", str(e))
             return
             
-        self.array_table.setRowCount(len(self.current_array_data))
+        hex_ints = self.current_array_data[start_index:end_index]
         
-        for i, hex_str in enumerate(self.current_array_data):
-            # Index
-            index_item = QTableWidgetItem(str(i))
-            self.array_table.setItem(i, 0, index_item)
+        def on_result(candidates):
+            # Điền key tốt nhất vào ô XOR Key
+            best_key = candidates[0][0]
+            self.range_key_decimal_cb.setChecked(False)
+            self.range_key_input.setText(f"0x{best_key:04x}")
             
-            # Hex value
-            hex_item = QTableWidgetItem(hex_str)
-            self.array_table.setItem(i, 1, hex_item)
+            lines = [f"Top key cho range {start_index}-{end_index}:"]
+            lines += [f"0x{key:04x}  score {score:.3f}  {result!r}"
+                      for key, score, result in candidates]
+            self.range_result_text.setPlainText("\n".join(lines))
+            self.statusBar().showMessage(f"Key tốt nhất: 0x{best_key:04x}")
             
-            # Decimal value
-            try:
-                if hex_str.startswith('-'):
-                    # Xử lý giá trị âm
-                    decimal_val = -int(hex_str[3:-1], 16)  # Bỏ qua '-0x' và 's'
-                else:
-                    decimal_val = int(hex_str[:-1], 16)  # Bỏ qua 's'
-                decimal_item = QTableWidgetItem(str(decimal_val))
-            except:
-                decimal_item = QTableWidgetItem("Error")
-            self.array_table.setItem(i, 2, decimal_item)
+        self.start_task("find_key",
+                        lambda progress: keyfinder.find_keys(hex_ints, 0, len(hex_ints)),
+                        on_result, "Đang thử 65536 XOR key...")
             
-            # Decoded char (với XOR key mặc định)
-            try:
-                if hex_str.startswith('-'):
-                    hex_val = -int(hex_str[3:-1], 16)
-                else:
-                    hex_val = int(hex_str[:-1], 16)
-                
-                # Thử với một số XOR key phổ biến
-                decoded_chars = []
-                for test_key in [0x174a, 0x5072, 0x0000]:
-                    decoded_val = hex_val ^ test_key
-                    if 32 <= decoded_val <= 126:  # Printable ASCII
-                        decoded_chars.append(chr(decoded_val))
-                    else:
-                        decoded_chars.append('?')
+    def decode_call_sites(self):
+        """Tự động decode mọi lời gọi $(III) trong file smali đang load"""
+        if not self.current_array_data or not self.current_smali_file:
+            QMessageBox.warning(self, "Lỗi", "Chưa có array-data! Vui lòng extract trước.")
+            return
+            
+        smali_file = self.current_smali_file
+        # Decryptor đọc block của field nó sget, không nhất thiết là block đang chọn
+        blocks = self.current_document.blocks
+        block_values = [block.values[:] for block in blocks]
+        # Sau khi sửa đổi độ dài (chưa lưu), call site trong file đã lệch: dùng bản đã relocate
+        relocated_sites = self.current_document.call_sites()
+        
+        def task(progress):
+            call_sites = relocated_sites
+            if call_sites is None:
+                call_sites = callsites.find_own_call_sites(smali_file)
+            # Giải mã theo thân decryptor trong file (XOR thuần hoặc biến thể khác)
+            return callsites.decode_file_call_sites(smali_file, blocks, call_sites,
+                                                    values=block_values)
+            
+        def on_result(results):
+            self.show_call_site_results(results)
+            self.statusBar().showMessage(f"Đã decode {len(results)} call site")
+            
+        self.start_task("decode_calls", task, on_result, "Đang decode call site...")
+            
+    def show_call_site_results(self, results):
+        """Hiển thị list (CallSite, string) trong Range Result"""
+        lines = [f"{site.method} (line {site.line}): "
+                 f"{site.start:#x}-{site.end:#x} key {site.key:#x} => {result!r}"
+                 for site, result in results]
+        self.call_site_text = "\n".join(lines)
+        self.range_result_text.setPlainText(self.call_site_text)
+        
+    def search_strings(self):
+        """Tìm chuỗi trong mọi file smali của project bằng chỉ mục trigram (cập nhật trước khi tìm)"""
+        query = self.search_input.text()
+        if not query:
+            return
+        mode = self.search_mode_combo.currentIndex()
+        if mode == 1:
+            self.locate_plaintext(query)
+            return
+        if self.project_watcher is not None:
+            root = self.project_watcher.paths[0]
+        else:
+            root = os.path.dirname(self.current_smali_file or self.file_input.text().strip())
+        if not root or not os.path.isdir(root):
+            QMessageBox.warning(self, "Lỗi", "Chưa có thư mục smali! Mở một file smali hoặc Watch Folder.")
+            return
+        if mode == 2:
+            self.locate_plaintext(query, root)
+            return
+        regex = self.search_regex_cb.isChecked()
+        
+        def task(progress):
+            # Kết nối SQLite chỉ dùng được trong thread tạo ra nó
+            with search.StringIndex(search.default_index_path(root)) as index:
+                index.update([root], progress=progress, mp_context=WORKER_MP_CONTEXT)
+                return index.search(query, regex, limit=SEARCH_RESULT_LIMIT)
                 
-                char_item = QTableWidgetItem(' | '.join(decoded_chars))
-            except:
-                char_item = QTableWidgetItem("Error")
-            self.array_table.setItem(i, 3, char_item)
+        def on_result(hits):
+            lines = [f"{os.path.relpath(hit.file, root)}:{hit.line} {hit.method} [{hit.block or '-'}] "
+                     f"{hit.start:#x}-{hit.end:#x} key {hit.key:#x} => {hit.string!r}"
+                     for hit in hits]
+            self.range_result_text.setPlainText("\n".join(lines) or "Không tìm thấy")
+            more = "+" if len(hits) >= SEARCH_RESULT_LIMIT else ""
+            self.statusBar().showMessage(f"Tìm thấy {len(hits)}{more} chuỗi trong {root}")
+            
+        self.start_task("search", task, on_result, "Đang cập nhật chỉ mục và tìm kiếm...")
+        
+    def locate_plaintext(self, text, root=None):
+        """Tìm range và key của plaintext đã biết trong block đang chọn (hoặc mọi file dưới root)"""
+        if root is None and not self.current_array_data:
+            QMessageBox.warning(self, "Lỗi", "Chưa có array-data! Vui lòng extract trước.")
+            return
+        try:
+            locator = plaintext.PlaintextLocator([text])
+        except ValueError as e:
+            QMessageBox.warning(self, "Lỗi", str(e))
+            return
+        values = self.current_array_data[:] if root is None else None
+        
+        def task(progress):
+            if root is None:
+                return [(None, None, hit, plaintext.context(values, hit))
+                        for hit in locator.locate(values, SEARCH_RESULT_LIMIT)]
+            return list(locator.locate_in_files([root], progress, limit=SEARCH_RESULT_LIMIT))
+            
+        def on_result(found):
+            lines = []
+            for path, block, hit, context in found:
+                where = f"{os.path.relpath(path, root)} [{block or '-'}] " if path else ""
+                lines.append(f"{where}{hit.start:#x}-{hit.end:#x} key {hit.key:#x} => {context!r}")
+            self.range_result_text.setPlainText("\n".join(lines) or "Không tìm thấy")
+            if root is None and found:
+                # Điền sẵn range/key của lần khớp đầu để Decode/Edit Range ngay
+                _, _, hit, _ = found[0]
+                self.range_start_input.setText(hex(hit.start))
+                self.range_end_input.setText(hex(hit.end))
+                self.range_key_input.setText(hex(hit.key))
+                for cb in (self.range_start_decimal_cb, self.range_end_decimal_cb,
+                           self.range_key_decimal_cb):
+                    cb.setChecked(False)
+            more = "+" if len(found) >= SEARCH_RESULT_LIMIT else ""
+            self.statusBar().showMessage(f"Tìm thấy {len(found)}{more} vị trí khớp {text!r}")
+            
+        self.start_task("search", task, on_result, "Đang tìm plaintext...")
+        
+    def toggle_watch(self):
+        """Bật/tắt theo dõi thư mục smali"""
+        if self.project_watcher is not None:
+            self.stop_watch()
+            return
+        start_dir = os.path.dirname(self.file_input.text().strip())
+        directory = QFileDialog.getExistingDirectory(self, "Chọn thư mục smali để theo dõi",
+                                                     start_dir)
+        if directory:
+            self.start_watch(directory)
+            
+    def start_watch(self, directory):
+        """Theo dõi cả cây smali: file đổi nội dung được parse/decode lại ở background"""
+        self.project_watcher = watch.ProjectWatcher([directory], mp_context=WORKER_MP_CONTEXT)
+        self.fs_watcher = QFileSystemWatcher(self)
+        self.fs_watcher.directoryChanged.connect(self.watch_debounce.start)
+        self.fs_watcher.fileChanged.connect(self.watch_debounce.start)
+        self.watch_btn.setText(f"Stop Watching {os.path.basename(directory)}")
+        self.run_watch_scan()
+        
+    def stop_watch(self):
+        """Dừng theo dõi thư mục"""
+        self.project_watcher = None
+        if self.fs_watcher is not None:
+            self.fs_watcher.deleteLater()
+            self.fs_watcher = None
+        self.watch_debounce.stop()
+        self.watch_poll.stop()
+        self.watch_btn.setText("Watch Folder...")
+        self.statusBar().showMessage("Đã dừng theo dõi thư mục")
+        
+    def run_watch_scan(self):
+        """Quét lại cây đang theo dõi (mỗi lúc chỉ một lần, sự kiện tới trong lúc quét thì quét tiếp)"""
+        if self.project_watcher is None:
+            return
+        if self.watch_scan_running:
+            self.watch_scan_pending = True
+            return
+        self.watch_scan_running = True
+        watcher = self.project_watcher
+        current = self.current_smali_file if self.current_document is not None else None
+        
+        def task(progress):
+            changes = watcher.scan(progress)
+            reloaded = None
+            if current and os.path.abspath(current) in changes.modified:
+                reloaded = SmaliDocument.load(current)
+            return watcher, changes, watcher.directories(), reloaded
+            
+        worker = self.start_task("watch", task, self.on_watch_scanned,
+                                 "Đang quét thư mục theo dõi...")
+        worker.signals.finished.connect(self.on_watch_scan_finished)
+        
+    def on_watch_scan_finished(self):
+        self.watch_scan_running = False
+        if self.watch_scan_pending:
+            self.watch_scan_pending = False
+            self.run_watch_scan()
+            
+    def on_watch_scanned(self, result):
+        """Áp dụng kết quả scan: đăng ký path mới với watcher, refresh file đang mở nếu nó đổi"""
+        watcher, changes, directories, reloaded = result
+        if watcher is not self.project_watcher:
+            return
+        watched = set(self.fs_watcher.directories()) | set(self.fs_watcher.files())
+        per_file = len(watcher) <= WATCH_FILE_LIMIT
+        paths = directories + (list(watcher.files) if per_file else [])
+        new_paths = [path for path in paths if path not in watched]
+        if new_paths:
+            self.fs_watcher.addPaths(new_paths)
+        # Quá nhiều file cho watcher của hệ điều hành: kiểm tra stat định kỳ
+        if per_file:
+            self.watch_poll.stop()
+        elif not self.watch_poll.isActive():
+            self.watch_poll.start()
+            
+        if reloaded is not None:
+            self.apply_reloaded_document(reloaded, watcher.get(reloaded.file_path))
+        self.statusBar().showMessage(
+            f"Watch: {len(watcher)} file smali, +{len(changes.added)} "
+            f"~{len(changes.modified)} -{len(changes.removed)}")
+        
+    def apply_reloaded_document(self, smali_document, state):
+        """Thay document đang mở bằng bản vừa đọc lại từ đĩa, chỉ vẽ lại các dòng khác"""
+        if self.current_document.modified:
+            QMessageBox.warning(self, "Cảnh báo",
+                                f"{smali_document.file_path} đã đổi trên đĩa nhưng đang có thay đổi "
+                                f"chưa lưu, không tự load lại.")
+            return
+        if self.current_document.active < len(smali_document.blocks):
+            smali_document.select(self.current_document.active)
+        if self.current_document.journal_path is not None:
+            smali_document.enable_journal_file()
+        self.current_document = smali_document
+        self.current_array_data = smali_document.values
+        with profiling.stage('render', elements=len(self.current_array_data)):
+            self.array_model.update_array_data(self.current_array_data)
+        self.update_block_selector()
+        # Range Result đang hiện call site của file này thì cập nhật luôn
+        if self.advanced_widget is not None and state is not None and \
+                self.range_result_text.toPlainText() == self.call_site_text:
+            self.show_call_site_results(state.strings)
+            
+    def refresh_table(self):
+        """Refresh bảng array data"""
+        # Model chỉ tính các ô đang hiển thị nên reset chạy ngay trên main thread
+        with profiling.stage('render', elements=len(self.current_array_data)):
+            self.array_model.set_array_data(self.current_array_data)
             
     def save_changes(self):
         """Lưu thay đổi vào file smali"""
-        if not self.current_smali_file:
+        if self.current_document is None:
             QMessageBox.warning(self, "Lỗi", "Chưa có file smali được load!")
             return
             
-        try:
-            # Đọc file gốc
-            with open(self.current_smali_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Tạo backup
-            backup_file = self.current_smali_file + '.backup'
-            with open(backup_file, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            # Thay thế array-data
-            pattern = r'-?0x[0-9a-fA-F]+s'
-            new_content = re.sub(pattern, lambda m: self.current_array_data.pop(0), content)
-            
-            # Lưu file mới
-            with open(self.current_smali_file, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            
+        smali_document = self.current_document
+        
+        def on_result(backup_file):
             QMessageBox.information(self, "Thành công", 
-                                  f"Đã lưu thay đổi vào {self.current_smali_file}\n"
+                                  f"Đã lưu thay đổi vào {smali_document.file_path}\n"
                                   f"Backup được lưu tại: {backup_file}")
+            self.statusBar().showMessage("Đã lưu thay đổi")
             
-        except Exception as e:
-            QMessageBox.critical(self, "Lỗi", f"Không thể lưu thay đổi: {e}")
+        self.start_task("save",
+                        lambda progress: smali_document.save(progress=progress),
+                        on_result, "Đang lưu thay đổi...", exclusive=True)
             
     def export_modified(self):
         """Export array-data đã modify"""
@@ -697,96 +1318,64 @@ class XORConverterApp(QMainWindow):
         
         if file_path:
             try:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    for hex_val in self.current_array_data:
-                        f.write(hex_val + '\n')
+                core.export_array_data(file_path, self.current_array_data)
                 
                 QMessageBox.information(self, "Thành công", f"Đã export đến: {file_path}")
                 
             except Exception as e:
                 QMessageBox.critical(self, "Lỗi", f"Không thể export: {e}")
             
-    def parse_hex_or_decimal(self, value_str, is_decimal=False):
-        """Parse giá trị hex hoặc decimal"""
-        try:
-            if is_decimal:
-                return int(value_str)
-            else:
-                # Xử lý hex format
-                if value_str.startswith('0x'):
-                    return int(value_str[2:], 16)
-                else:
-                    return int(value_str, 16)
-        except ValueError:
-            raise ValueError(f"Giá trị không hợp lệ: {value_str}")
-            
-    def decode_xor_from_txt(self, file_path, xor_key, start_index, end_index):
-        """Giải mã XOR từ file txt"""
-        try:
-            # Đọc file txt
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Trích xuất các giá trị hex
-            pattern = r'-?0x[0-9a-fA-F]+s'
-            hex_values = re.findall(pattern, content)
-            
-            if not hex_values:
-                raise ValueError("Không tìm thấy array-data trong file!")
-            
-            # Chuyển đổi từ string sang int
-            hex_ints = []
-            for hex_str in hex_values:
-                if hex_str.startswith('-'):
-                    hex_int = -int(hex_str[3:-1], 16)
-                else:
-                    hex_int = int(hex_str[:-1], 16)
-                hex_ints.append(hex_int)
-            
-            # Chọn range
-            selected_values = hex_ints[start_index:end_index]
-            
-            # Giải mã XOR
-            result = ""
-            for hex_val in selected_values:
-                decoded_val = hex_val ^ xor_key
-                char = chr(decoded_val)
-                result += char
+    def export_all_strings(self):
+        """Export mọi chuỗi đã giải mã theo call site của file đang load ra JSONL/CSV"""
+        if not self.current_array_data or not self.current_smali_file:
+            QMessageBox.warning(self, "Lỗi", "Chưa có array-data! Vui lòng extract trước.")
+            return
             
-            return result
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Export All Strings", "", "JSON Lines (*.jsonl);;CSV files (*.csv)"
+        )
+        if not file_path:
+            return
             
-        except Exception as e:
-            raise Exception(f"Lỗi khi đọc file: {e}")
+        smali_file = self.current_smali_file
+        # Dùng array-data trong memory để chuỗi phản ánh cả các range đã sửa chưa lưu
+        blocks = self.current_document.blocks
+        block_values = [block.values[:] for block in blocks]
+        
+        def task(progress):
+            call_sites = callsites.find_own_call_sites(smali_file)
+            results = callsites.decode_file_call_sites(smali_file, blocks, call_sites,
+                                                       values=block_values)
+            return export.write_records_to_file(
+                export.iter_site_records(smali_file, results), file_path)
             
-    def decode_xor_from_memory(self, xor_key, start_index, end_index):
-        """Giải mã XOR từ array-data trong memory"""
-        try:
-            if not self.current_array_data:
-                raise ValueError("Chưa có array-data! Vui lòng extract từ file smali trước.")
+        def on_result(count):
+            QMessageBox.information(self, "Thành công", f"Đã export {count} chuỗi đến: {file_path}")
+            self.statusBar().showMessage(f"Đã export {count} chuỗi")
             
-            # Chuyển đổi từ string sang int
-            hex_ints = []
-            for hex_str in self.current_array_data:
-                if hex_str.startswith('-'):
-                    hex_int = -int(hex_str[3:-1], 16)
-                else:
-                    hex_int = int(hex_str[:-1], 16)
-                hex_ints.append(hex_int)
+        self.start_task("export_strings", task, on_result, "Đang export chuỗi...")
             
-            # Chọn range
-            selected_values = hex_ints[start_index:end_index]
+    def format_values(self, values):
+        """Định dạng các giá trị thành literal smali để hiển thị"""
+        width = smali_parser.width_of(values)
+        return [core.format_literal(value, width) for value in values]
             
-            # Giải mã XOR
-            result = ""
-            for hex_val in selected_values:
-                decoded_val = hex_val ^ xor_key
-                char = chr(decoded_val)
-                result += char
+    def parse_hex_or_decimal(self, value_str, is_decimal=False):
+        """Parse giá trị hex hoặc decimal"""
+        return core.parse_hex_or_decimal(value_str, is_decimal)
             
-            return result
+    def decode_xor_from_txt(self, file_path, xor_key, start_index, end_index, progress=None):
+        """Giải mã từ file (txt là XOR, smali theo decryptor của file)"""
+        return core.decode_ranges_from_file(file_path, [(start_index, end_index, xor_key)],
+                                            progress)[0]
             
-        except Exception as e:
-            raise Exception(f"Lỗi khi giải mã: {e}")
+    def decode_xor_from_memory(self, xor_key, start_index, end_index):
+        """Giải mã từ array-data trong memory theo decryptor của file đang load"""
+        if not self.current_array_data:
+            raise ValueError("Chưa có array-data! Vui lòng extract từ file smali trước.")
+        return core.decode_block_ranges(self.current_smali_file, self.current_document.blocks,
+                                        self.current_document.active,
+                                        [(start_index, end_index, xor_key)])[0]
             
     def convert(self):
         """Thực hiện chuyển đổi"""
@@ -812,27 +1401,38 @@ class XORConverterApp(QMainWindow):
                 return
             xor_key = self.parse_hex_or_decimal(key_str, self.key_decimal_cb.isChecked())
             
-            # Thực hiện giải mã
-            self.statusBar().showMessage("Đang giải mã...")
-            
             if file_type == "Smali File":
-                # Sử dụng array-data từ memory
-                result = self.decode_xor_from_memory(xor_key, start_index, end_index)
+                # Sử dụng array-data từ memory (copy để worker không đọc array đang bị sửa)
+                if not self.current_array_data:
+                    raise ValueError("Chưa có array-data! Vui lòng extract từ file smali trước.")
+                smali_file = self.current_smali_file
+                blocks = self.current_document.blocks
+                index = self.current_document.active
+                block_values = [block.values[:] for block in blocks]
+                task = lambda progress: core.decode_block_ranges(
+                    smali_file, blocks, index, [(start_index, end_index, xor_key)],
+                    values=block_values)[0]
             else:
                 # Đọc từ file txt
                 file_path = self.file_input.text().strip()
                 if not file_path or not os.path.exists(file_path):
                     QMessageBox.warning(self, "Lỗi", "Vui lòng chọn file txt hợp lệ!")
                     return
-                result = self.decode_xor_from_txt(file_path, xor_key, start_index, end_index)
+                task = lambda progress: self.decode_xor_from_txt(
+                    file_path, xor_key, start_index, end_index, progress)
+            
+        except Exception as e:
+            QMessageBox.critical(self, "Lỗi", str(e))
+            self.statusBar().showMessage("Lỗi!")
+            return
             
+        def on_result(result):
             # Hiển thị kết quả
             self.result_text.setText(result)
             self.statusBar().showMessage(f"Hoàn thành! Độ dài: {len(result)} ký tự")
             
-        except Exception as e:
-            QMessageBox.critical(self, "Lỗi", str(e))
-            self.statusBar().showMessage("Lỗi!")
+        # Thực hiện giải mã
+        self.start_task("convert", task, on_result, "Đang giải mã...")
             
     def copy_result(self):
         """Copy kết quả vào clipboard"""
@@ -848,8 +1448,8 @@ def main():
     app = QApplication(sys.argv)
     app.setApplicationName("XOR Converter")
     
-    # Áp dụng Material Design theme
-    apply_stylesheet(app, theme='dark_teal.xml')
+    # Áp dụng Material Design theme (stylesheet đã compile được cache trên đĩa)
+    apply_theme(app)
     
     # Tạo và hiển thị window
     window = XORConverterApp()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Thư viện XOR array-data cho smali, dùng chung cho GUI và CLI."""
+
+from .cache import ArrayCache
+from .callsites import (
+    CallSite,
+    decode_call_sites,
+    decode_file_call_sites,
+    find_call_sites,
+    find_own_call_sites,
+    resolve_file,
+)
+from .core import (
+    apply_range_edit,
+    decode_block_ranges,
+    decode_ranges_from_file,
+    decode_xor,
+    decode_xor_from_file,
+    decode_xor_ranges,
+    encode_xor,
+    export_array_data,
+    extract_array_data,
+    extract_array_data_from_file,
+    extract_array_data_from_txt,
+    format_literal,
+    format_short_literal,
+    load_array_blocks,
+    load_array_data,
+    parse_hex_or_decimal,
+    parse_short_literal,
+    save_array_data,
+)
+from .dex import DexFile
+from .document import DirtyRanges, SmaliDocument
+from .emulator import Decryptor, UnsupportedDecryptor
+from .export import export_strings, iter_string_records
+from .journal import EditJournal
+from .plaintext import PlaintextHit, PlaintextLocator
+from .relocation import CallSiteIndex, ConstSlot
+from .rewriter import RewriteResult, rewrite_file, rewrite_tree
+from .scanner import ProjectScan, ScannedFile, scan_project
+from .search import SearchHit, StringIndex
+from .smali_parser import ArrayBlock, iter_array_blocks, parse_array_blocks, select_block
+from .watch import ProjectWatcher, WatchChanges
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""Cache array-data đã parse trên đĩa (SQLite), khoá theo nội dung file, dọn theo LRU."""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from . import profiling, smali_parser
+
+# Tổng dung lượng blob tối đa trước khi dọn entry ít dùng nhất
+DEFAULT_MAX_BYTES = 256 << 20
+# Tăng khi đổi định dạng lưu hoặc cách parse, để bỏ qua entry cũ
+SCHEMA_VERSION = 3
+HASH_CHUNK_SIZE = 1 << 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (path, kind)
+);
+CREATE TABLE IF NOT EXISTS entries (
+    digest TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    nbytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (digest, kind)
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    digest TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    label TEXT,
+    field TEXT,
+    width INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    data_start INTEGER NOT NULL,
+    data_end INTEGER,
+    vals BLOB NOT NULL,
+    offsets BLOB NOT NULL,
+    lengths BLOB NOT NULL,
+    PRIMARY KEY (digest, kind, position)
+);
+"""
+
+
+def default_cache_dir():
+    """Thư mục cache: $SMALIXOR_CACHE_DIR, hoặc $XDG_CACHE_HOME/smalixor, hoặc ~/.cache/smalixor"""
+    path = os.environ.get('SMALIXOR_CACHE_DIR')
+    if path:
+        return path
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'smalixor')
+
+
+def file_digest(file_path):
+    """Hash BLAKE2b nội dung file (đọc theo chunk)"""
+    h = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ArrayCache:
+    """Cache các ArrayBlock đã parse, khoá theo (path, size, mtime) rồi đến hash nội dung
+
+    Lần mở lại file chưa đổi chỉ cần stat; file bị touch/copy nhưng cùng nội dung
+    thì tốn một lần hash thay vì parse lại.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.db_path = os.path.join(self.cache_dir, f'arrays-v{SCHEMA_VERSION}.sqlite')
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        # Mỗi lần gọi một connection riêng: an toàn khi dùng từ worker thread/process
+        if not self._initialized:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._initialized:
+            conn.executescript(SCHEMA)
+            self._initialized = True
+        return conn
+
+    def get_blocks(self, file_path, kind, parse, progress=None):
+        """Trả về list ArrayBlock của file, chỉ gọi parse(file_path, progress) khi cache miss"""
+        path = os.path.abspath(file_path)
+        st = os.stat(path)
+        try:
+            with profiling.stage('cache.lookup'), self._lock:
+                conn = self._connect()
+                try:
+                    with conn:
+                        blocks = self._lookup_stat(conn, path, kind, st)
+                finally:
+                    conn.close()
+        except (sqlite3.Error, OSError):
+            blocks = None
+        if blocks is not None:
+            if progress is not None:
+                progress(st.st_size, st.st_size)
+            return blocks
+
+        with profiling.stage('read', bytes=st.st_size):
+            digest = file_digest(path)
+        try:
+            with profiling.stage('cache.lookup'), self._lock:
+                conn = self._connect()
+                try:
+                    with conn:
+                        blocks = self._lookup_digest(conn, digest, kind)
+                        if blocks is not None:
+                            self._remember_file(conn, path, kind, st, digest)
+                finally:
+                    conn.close()
+        except (sqlite3.Error, OSError):
+            blocks = None
+        if blocks is not None:
+            if progress is not None:
+                progress(st.st_size, st.st_size)
+            return blocks
+
+        blocks = parse(path, progress)
+        # File đổi trong lúc parse thì không lưu (hash không còn khớp nội dung đã parse)
+        after = os.stat(path)
+        if (after.st_size, after.st_mtime_ns) == (st.st_size, st.st_mtime_ns):
+            self._store(path, kind, st, digest, blocks)
+        return blocks
+
+    def _lookup_stat(self, conn, path, kind, st):
+        row = conn.execute(
+            "SELECT digest FROM files WHERE path = ? AND kind = ? AND size = ? AND mtime_ns = ?",
+            (path, kind, st.st_size, st.st_mtime_ns)).fetchone()
+        return None if row is None else self._lookup_digest(conn, row[0], kind)
+
+    def _lookup_digest(self, conn, digest, kind):
+        if conn.execute("UPDATE entries SET last_used = ? WHERE digest = ? AND kind = ?",
+                        (time.time(), digest, kind)).rowcount == 0:
+            return None
+        rows = conn.execute(
+            "SELECT label, field, width, line, data_start, data_end, vals, offsets, lengths "
+            "FROM blocks WHERE digest = ? AND kind = ? ORDER BY position", (digest, kind))
+        blocks = []
+        for label, field, width, line, data_start, data_end, vals, offsets, lengths in rows:
+            block = smali_parser.ArrayBlock(label, width, line, data_start, field)
+            block.data_end = data_end
+            block.values.frombytes(vals)
+            block.offsets.frombytes(offsets)
+            block.lengths.frombytes(lengths)
+            blocks.append(block)
+        return blocks
+
+    def _remember_file(self, conn, path, kind, st, digest):
+        conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                     (path, kind, st.st_size, st.st_mtime_ns, digest))
+
+    def _store(self, path, kind, st, digest, blocks):
+        rows = [(digest, kind, position, block.label, block.field, block.width, block.line,
+                 block.data_start, block.data_end, block.values.tobytes(),
+                 block.offsets.tobytes(), block.lengths.tobytes())
+                for position, block in enumerate(blocks)]
+        nbytes = sum(len(row[9]) + len(row[10]) + len(row[11]) for row in rows)
+        if nbytes > self.max_bytes:
+            return
+        try:
+            with profiling.stage('cache.store', bytes=nbytes), self._lock:
+                conn = self._connect()
+                try:
+                    with conn:
+                        conn.execute("DELETE FROM blocks WHERE digest = ? AND kind = ?",
+                                     (digest, kind))
+                        conn.executemany("INSERT INTO blocks VALUES "
+                                         "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                        conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                                     (digest, kind, nbytes, time.time()))
+                        self._remember_file(conn, path, kind, st, digest)
+                        self._evict(conn)
+                finally:
+                    conn.close()
+        except (sqlite3.Error, OSError):
+            # Cache chỉ để tăng tốc: lỗi ghi cache không làm hỏng việc đọc file
+            pass
+
+    def _evict(self, conn):
+        """Xoá entry dùng lâu nhất cho tới khi tổng dung lượng <= max_bytes"""
+        total = conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for digest, kind, nbytes in conn.execute(
+                "SELECT digest, kind, nbytes FROM entries ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            victims.append((digest, kind))
+            total -= nbytes
+        for table in ('entries', 'blocks', 'files'):
+            conn.executemany(f"DELETE FROM {table} WHERE digest = ? AND kind = ?", victims)
+
+    def clear(self):
+        """Xoá toàn bộ cache"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    for table in ('files', 'entries', 'blocks'):
+                        conn.execute(f"DELETE FROM {table}")
+                conn.execute("VACUUM")
+            finally:
+                conn.close()
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """ArrayCache dùng chung; None nếu đặt SMALIXOR_NO_CACHE hoặc đã tắt bằng set_default_cache"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            if os.environ.get('SMALIXOR_NO_CACHE'):
+                _default_cache = False
+            else:
+                _default_cache = ArrayCache()
+        return _default_cache or None
+
+
+def set_default_cache(array_cache):
+    """Thay cache dùng chung (truyền None để tắt cache)"""
+    global _default_cache
+    with _default_lock:
+        _default_cache = array_cache if array_cache is not None else False
+
+
+def load_blocks(file_path, kind, parse, progress=None):
+    """parse(file_path, progress) -> list ArrayBlock, qua cache dùng chung nếu đang bật"""
+    array_cache = default_cache()
+    if array_cache is None:
+        return parse(file_path, progress)
+    return array_cache.get_blocks(file_path, kind, parse, progress)
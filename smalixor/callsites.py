@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""Tìm và giải mã các lời gọi decryptor `$(III)Ljava/lang/String;` trong smali."""
+
+import re
+from collections import namedtuple
+
+from . import core, dex, emulator, profiling, smali_parser, tokenizer
+
+# Một lời gọi decryptor với bộ (start, end, key) đã resolve được; start_line/end_line là
+# dòng của lệnh const nạp start/end (để relocate khi array-data đổi độ dài). Với DEX, line là
+# offset byte của lệnh invoke trong file DEX và member là tên classes*.dex trong APK/zip.
+CallSite = namedtuple('CallSite',
+                      'class_name method line target start end key start_line end_line member',
+                      defaults=(None, None, None))
+
+CLASS_RE = re.compile(r'^\.class\b.*?(L[^;\s]+;)\s*$')
+METHOD_RE = re.compile(r'^\.method\s+(.*?)(\S+)\((.*?)\)(\S+)\s*$')
+REGISTERS_RE = re.compile(r'^\.(locals|registers)\s+(\d+)')
+REGISTER_RE = re.compile(r'\b([vp])(\d+)\b')
+SGET_OBJECT_RE = re.compile(r'^sget-object\s+[vp]\d+,\s*(L[^;]+;->\S+)')
+INVOKE_RE = re.compile(r'^(invoke-\S+)\s+\{(.*?)\},\s*(L[^;]+;)->([^(]+)(\(.*)$')
+
+# Các lệnh nạp hằng số int vào thanh ghi
+CONST_OPCODES = frozenset(('const', 'const/4', 'const/16', 'const/high16'))
+# Các lệnh chỉ copy giá trị giữa hai thanh ghi
+MOVE_OPCODES = frozenset(('move', 'move/from16', 'move/16'))
+# Các lệnh không ghi vào thanh ghi đầu tiên
+NON_WRITING_PREFIXES = ('invoke-', 'if-', 'iput', 'sput', 'aput', 'return', 'throw', 'goto',
+                        'fill-array-data', 'packed-switch', 'sparse-switch', 'monitor-', 'nop')
+
+DECRYPTOR_DESCRIPTOR = '(III)Ljava/lang/String;'
+
+
+def count_param_registers(params, is_static):
+    """Đếm số thanh ghi tham số của method (long/double chiếm 2)"""
+    count = 0 if is_static else 1
+    i = 0
+    while i < len(params):
+        ch = params[i]
+        if ch == '[':
+            while params[i] == '[':
+                i += 1
+            if params[i] == 'L':
+                i = params.index(';', i)
+            count += 1
+        elif ch == 'L':
+            i = params.index(';', i)
+            count += 1
+        else:
+            count += 2 if ch in 'JD' else 1
+        i += 1
+    return count
+
+
+def parse_invoke_registers(reg_str, locals_count):
+    """Chuyển '{v1, v2}' hoặc '{v5 .. v7}' thành danh sách chỉ số thanh ghi"""
+    regs = [_register_index(kind, int(num), locals_count)
+            for kind, num in REGISTER_RE.findall(reg_str)]
+    if '..' in reg_str and len(regs) == 2:
+        return list(range(regs[0], regs[1] + 1))
+    return regs
+
+
+def _register_index(kind, num, locals_count):
+    """Quy thanh ghi pN về vN (pN = v[locals + N])"""
+    return locals_count + num if kind == 'p' else num
+
+
+def iter_call_sites(lines, method_name='$'):
+    """Quét tuyến tính các dòng smali, yield CallSite cho mỗi lời gọi decryptor"""
+    class_name = ''
+    method = None
+    is_static = False
+    param_regs = 0
+    locals_count = 0
+    values = {}
+    sources = {}  # thanh ghi -> dòng của lệnh const đã nạp giá trị
+
+    for line_no, raw in enumerate(lines, 1):
+        line = raw.strip()
+        if not line or line[0] == '#':
+            continue
+
+        if line[0] == '.':
+            m = CLASS_RE.match(line)
+            if m:
+                class_name = m.group(1)
+                continue
+            m = METHOD_RE.match(line)
+            if m:
+                method = m.group(2) + '(' + m.group(3) + ')' + m.group(4)
+                is_static = ' static ' in ' ' + m.group(1)
+                param_regs = count_param_registers(m.group(3), is_static)
+                locals_count = 0
+                values = {}
+                sources = {}
+                continue
+            m = REGISTERS_RE.match(line)
+            if m and method is not None:
+                n = int(m.group(2))
+                locals_count = n if m.group(1) == 'locals' else n - param_regs
+                continue
+            if line.startswith('.end method'):
+                method = None
+            continue
+
+        if method is None or line[0] == ':':
+            continue
+
+        opcode, _, operands = line.partition(' ')
+        if opcode in CONST_OPCODES:
+            dest, _, literal = operands.partition(',')
+            m = REGISTER_RE.match(dest.strip())
+            if m:
+                reg = _register_index(m.group(1), int(m.group(2)), locals_count)
+                try:
+                    values[reg] = int(literal.strip(), 16)
+                    sources[reg] = line_no
+                except ValueError:
+                    pass
+            continue
+
+        if opcode.startswith('invoke-'):
+            m = INVOKE_RE.match(line)
+            if m and m.group(4) == method_name and m.group(5) == DECRYPTOR_DESCRIPTOR \
+                    and m.group(1).startswith('invoke-static'):
+                regs = parse_invoke_registers(m.group(2), locals_count)
+                if len(regs) == 3 and all(r in values for r in regs):
+                    yield CallSite(class_name, method, line_no, m.group(3),
+                                   values[regs[0]], values[regs[1]], values[regs[2]],
+                                   sources.get(regs[0]), sources.get(regs[1]))
+            continue
+
+        if opcode.startswith(NON_WRITING_PREFIXES):
+            continue
+
+        regs = [_register_index(kind, int(num), locals_count)
+                for kind, num in REGISTER_RE.findall(operands)]
+        if not regs:
+            continue
+        if opcode in MOVE_OPCODES and len(regs) == 2 and regs[1] in values:
+            values[regs[0]] = values[regs[1]]
+            sources[regs[0]] = sources.get(regs[1])
+            continue
+        # Lệnh khác ghi đè thanh ghi đích => không còn là hằng số
+        values.pop(regs[0], None)
+        sources.pop(regs[0], None)
+        if '-wide' in opcode:
+            values.pop(regs[0] + 1, None)
+            sources.pop(regs[0] + 1, None)
+
+
+def find_decryptor_field(lines, method_name='$'):
+    """Field static (ví dụ 'Lcls;->$:[S') mà decryptor `method_name(III)` đọc array-data"""
+    in_decryptor = False
+    for raw in lines:
+        line = raw.strip()
+        if line.startswith('.method'):
+            m = METHOD_RE.match(line)
+            in_decryptor = bool(m) and m.group(2) == method_name and \
+                '(' + m.group(3) + ')' + m.group(4) == DECRYPTOR_DESCRIPTOR
+        elif line.startswith('.end method'):
+            in_decryptor = False
+        elif in_decryptor and line.startswith('sget-object'):
+            m = SGET_OBJECT_RE.match(line)
+            if m:
+                return m.group(1)
+    return None
+
+
+def decryptor_block_index(smali_file_path, blocks, method_name='$'):
+    """Chỉ số block mà decryptor trong file đọc (block mặc định nếu không xác định được)"""
+    with open(smali_file_path, 'r', encoding='utf-8') as f:
+        field = find_decryptor_field(f, method_name)
+    try:
+        return smali_parser.select_block(blocks, field)
+    except ValueError:
+        return smali_parser.select_block(blocks)
+
+
+def load_decryptor_array(smali_file_path, method_name='$'):
+    """Array-data của block mà decryptor trong file đọc"""
+    blocks = core.load_array_blocks(smali_file_path)
+    if not any(blocks):
+        raise ValueError(f"Không tìm thấy array-data trong file: {smali_file_path}")
+    return blocks[decryptor_block_index(smali_file_path, blocks, method_name)].values
+
+
+def find_call_sites(smali_file_path, method_name='$'):
+    """Tìm tất cả call site của decryptor trong một file smali"""
+    with profiling.stage('callsites') as s:
+        with open(smali_file_path, 'r', encoding='utf-8') as f:
+            call_sites = list(iter_call_sites(f, method_name))
+        s.add(sites=len(call_sites))
+    return call_sites
+
+
+def find_own_call_sites(smali_file_path, method_name='$'):
+    """Chỉ giữ các call site gọi decryptor của chính class trong file"""
+    return [site for site in find_call_sites(smali_file_path, method_name)
+            if site.target == site.class_name]
+
+
+def site_location(path, site):
+    """Đường dẫn hiển thị của call site: 'app.apk!classes2.dex' nếu nằm trong một member DEX"""
+    return f"{path}!{site.member}" if site.member else path
+
+
+def decode_call_sites(array_data, call_sites):
+    """Giải mã từng call site bằng array-data, trả về list (CallSite, string)"""
+    call_sites = list(call_sites)
+    results = core.decode_xor_ranges(
+        array_data, [(site.start, site.end, site.key) for site in call_sites])
+    return list(zip(call_sites, results))
+
+
+def load_decryptor(smali_file_path, method_name='$'):
+    """Decryptor của file dịch thành kernel NumPy, None nếu dùng engine XOR (xem emulator.kernel)
+
+    Raise emulator.UnsupportedDecryptor (ValueError) nếu file có decryptor nhưng không dịch
+    được: call site của nó không được giải mã thay vì ra chuỗi XOR sai.
+    """
+    with tokenizer.mapped(smali_file_path) as buffer:
+        method = emulator.find_smali_method(buffer, method_name)
+    try:
+        return emulator.kernel(method)
+    except emulator.UnsupportedDecryptor as e:
+        raise emulator.UnsupportedDecryptor(
+            f"Không dịch được decryptor trong {smali_file_path}: {e}") from None
+
+
+def decode_file_call_sites(smali_file_path, blocks, call_sites, method_name='$', values=None,
+                           index=None):
+    """Giải mã call site theo đúng thân decryptor trong file, trả về list (CallSite, string)
+
+    values (list cùng thứ tự blocks) thay cho block.values, ví dụ bản chưa lưu trong GUI;
+    index là chỉ số block decryptor đọc nếu đã biết (dùng khi decryptor là XOR thuần).
+    Raise emulator.UnsupportedDecryptor nếu decryptor không dịch được (xem load_decryptor).
+    """
+    if values is None:
+        values = [block.values for block in blocks]
+    decryptor = load_decryptor(smali_file_path, method_name)
+    if decryptor is not None:
+        return decryptor.decode_call_sites(emulator.field_arrays(blocks, values), call_sites)
+    if index is None:
+        index = decryptor_block_index(smali_file_path, blocks, method_name)
+    return decode_call_sites(values[index], call_sites)
+
+
+def resolve_file(smali_file_path, method_name='$'):
+    """Trích xuất array-data và giải mã mọi call site tới decryptor của chính class đó
+
+    File DEX/APK thì giải mã cho mọi class trong file (xem dex.resolve_file).
+    """
+    if dex.is_dex_input(smali_file_path):
+        return dex.resolve_file(smali_file_path, method_name)
+    blocks = core.load_array_blocks(smali_file_path)
+    if not any(blocks):
+        raise ValueError(f"Không tìm thấy array-data trong file: {smali_file_path}")
+    return decode_file_call_sites(smali_file_path, blocks,
+                                  find_own_call_sites(smali_file_path, method_name), method_name)
@@ -0,0 +1,482 @@
+# -*- coding: utf-8 -*-
+"""Command-line cho XOR Converter (chạy không cần Qt)."""
+
+import argparse
+import sys
+
+from . import (cache, callsites, core, dex, document, emulator, export, keyfinder, plaintext,
+               profiling, rewriter, scanner, search, smali_parser, tokenizer, watch)
+
+
+BLOCK_HELP = "Label (':array_0') hoặc field ('$') của block array-data (mặc định: block của field)"
+
+
+def _number(value_str):
+    """Parse số cho argparse: '0x..' là hex, còn lại là decimal"""
+    try:
+        return int(value_str, 0)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Giá trị không hợp lệ: {value_str}")
+
+
+def _range_spec(value_str):
+    """Parse range dạng START:END:KEY"""
+    parts = value_str.split(':')
+    if len(parts) != 3:
+        raise argparse.ArgumentTypeError(f"Range phải có dạng START:END:KEY: {value_str}")
+    return tuple(_number(part) for part in parts)
+
+
+def cmd_extract(args):
+    """In số lượng (hoặc toàn bộ) array-data của từng file"""
+    status = 0
+    for path in core.iter_smali_files(args.paths):
+        try:
+            if args.blocks:
+                for block in core.load_array_blocks(path):
+                    print(f"{path}\t{block.label}\t{block.field or '-'}\t"
+                          f"{block.width}\t{len(block)}")
+                continue
+            array_data = core.extract_array_data_from_file(path, block=args.block)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            status = 1
+            continue
+        if args.dump:
+            width = smali_parser.width_of(array_data)
+            for value in array_data:
+                print(core.format_literal(value, width))
+        else:
+            print(f"{path}\t{len(array_data)}")
+    return status
+
+
+def cmd_decode(args):
+    """Giải mã một hoặc nhiều range"""
+    ranges = list(args.range or [])
+    if args.start is not None or args.end is not None or args.key is not None:
+        if args.start is None or args.end is None or args.key is None:
+            print("Cần đủ --start, --end và --key", file=sys.stderr)
+            return 2
+        ranges.append((args.start, args.end, args.key))
+    if not ranges:
+        print("Chưa có range nào để decode", file=sys.stderr)
+        return 2
+
+    results = core.decode_ranges_from_file(args.file, ranges, block=args.block,
+                                           method_name=args.method)
+    for (start_index, end_index, xor_key), result in zip(ranges, results):
+        if len(ranges) == 1:
+            print(result)
+        else:
+            print(f"{start_index}:{end_index}:{xor_key:#x}\t{result}")
+    return 0
+
+
+def cmd_findkey(args):
+    """Thử toàn bộ 65536 XOR key cho một range (hoặc mọi call site), in các key tốt nhất"""
+    if args.calls:
+        return _findkey_calls(args)
+    if args.start is None or args.end is None:
+        raise ValueError("findkey cần --start và --end (hoặc --calls)")
+    array_data = core.load_xor_array_data(args.file, block=args.block, method_name=args.method)
+    for key, score, result in keyfinder.find_keys(array_data, args.start, args.end, args.top):
+        print(f"{key:#06x}\t{score:.3f}\t{result!r}")
+    return 0
+
+
+def _findkey_calls(args):
+    """Tìm key cho range của mọi call site trong file smali (nhiều range chạy trên process pool)
+
+    Cột cuối là '=' nếu key tốt nhất trùng 16 bit thấp của key trong call site.
+    """
+    if dex.is_dex_input(args.file):
+        raise ValueError("findkey --calls chỉ hỗ trợ file smali")
+    blocks = core.load_array_blocks(args.file)
+    if not any(blocks):
+        raise ValueError(f"Không tìm thấy array-data trong file: {args.file}")
+    if args.block:
+        index = smali_parser.select_block(blocks, args.block)
+    else:
+        index = callsites.decryptor_block_index(args.file, blocks, args.method)
+    core.require_xor_block(args.file, blocks, index, args.method)
+    sites = callsites.find_own_call_sites(args.file, args.method)
+    candidates = keyfinder.find_keys_for_ranges(
+        blocks[index].values, [(site.start, site.end) for site in sites], args.top, args.workers)
+    for site, keys in zip(sites, candidates):
+        for key, score, result in keys:
+            match = '=' if key == site.key & 0xFFFF else ''
+            print(f"{args.file}:{site.line}\t{site.start:#x}:{site.end:#x}\t{key:#06x}\t"
+                  f"{score:.3f}\t{result!r}\t{match}")
+    return 0
+
+
+def cmd_encode(args):
+    """Mã hoá chuỗi thành literal array-data"""
+    print(" ".join(map(core.format_short_literal, core.encode_xor(args.string, args.key))))
+    return 0
+
+
+def cmd_edit(args):
+    """Ghi đè range (hoặc thay range START:END, có thể đổi độ dài) bằng chuỗi mới rồi lưu file"""
+    smali_document = document.SmaliDocument.load(args.file, keep_journal=args.journal)
+    # Chuỗi mới được mã hoá XOR: block của decryptor khác XOR sẽ bị ghi sai
+    core.require_xor_block(args.file, smali_document.blocks,
+                           smali_document.block_index(args.block), args.method)
+    if args.end is None:
+        written = smali_document.apply_range_edit(args.start, args.string, args.key, args.block)
+    else:
+        written = smali_document.replace_range(args.start, args.end, args.string, args.key,
+                                               args.block, args.method)
+    backup_file = smali_document.save(backup=not args.no_backup)
+    print(f"Đã ghi {written} giá trị vào {args.file}")
+    if backup_file:
+        print(f"Backup: {backup_file}")
+    return 0
+
+
+def cmd_undo(args):
+    """Undo/redo các lần edit đã ghi journal (edit --journal) rồi lưu file"""
+    smali_document = document.SmaliDocument.load(args.file, keep_journal=True)
+    step = smali_document.redo if args.redo else smali_document.undo
+    done = 0
+    while done < args.steps and step() is not None:
+        done += 1
+    if not done:
+        print(f"Không còn bước nào để {'redo' if args.redo else 'undo'}", file=sys.stderr)
+        return 1
+    backup_file = smali_document.save(backup=not args.no_backup)
+    journal = smali_document.journal
+    print(f"Đã {'redo' if args.redo else 'undo'} {done} bước "
+          f"(đang ở bước {journal.cursor}/{len(journal)})")
+    if backup_file:
+        print(f"Backup: {backup_file}")
+    return 0
+
+
+def cmd_calls(args):
+    """Giải mã mọi call site của decryptor trong các file smali"""
+    status = 0
+    for path in core.iter_smali_files(args.paths):
+        try:
+            results = callsites.resolve_file(path, args.method)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            status = 1
+            continue
+        for site, result in results:
+            print(f"{callsites.site_location(path, site)}:{site.line}\t{site.method}\t"
+                  f"{site.start:#x}:{site.end:#x}:{site.key:#x}\t{result!r}")
+    return status
+
+
+def cmd_decryptor(args):
+    """In cách emulator dịch thân decryptor của từng file smali"""
+    status = 0
+    for path in core.iter_smali_files(args.paths):
+        if dex.is_dex_input(path):
+            print(f"{path}: lệnh decryptor chỉ đọc file smali", file=sys.stderr)
+            status = 1
+            continue
+        with tokenizer.mapped(path) as buffer:
+            method = emulator.find_smali_method(buffer, args.method)
+        if method is None:
+            continue
+        try:
+            decryptor = emulator.compile_method(*method)
+        except emulator.UnsupportedDecryptor as e:
+            print(f"{path}\tkhông dịch được: {e}")
+            status = 1
+            continue
+        mode = 'XOR' if decryptor.xor_field is not None else 'kernel'
+        print(f"{path}\t{mode}\tlen = {emulator.format_expression(decryptor.length)}\t"
+              f"out[{emulator.format_expression(decryptor.position)}] = "
+              f"{emulator.format_expression(decryptor.value)}")
+    return status
+
+
+def cmd_strings(args):
+    """Export mọi chuỗi đã giải mã (theo call site) ra JSONL/CSV"""
+    status = 0
+
+    def report(path, message):
+        nonlocal status
+        print(message, file=sys.stderr)
+        status = 1
+
+    if args.output:
+        count = export.export_strings(args.paths, args.output, args.format, args.method, report)
+        print(f"Đã ghi {count} chuỗi vào {args.output}", file=sys.stderr)
+    else:
+        records = export.iter_string_records(args.paths, args.method, report)
+        if hasattr(sys.stdout, 'reconfigure'):
+            sys.stdout.reconfigure(errors='backslashreplace')
+        export.write_records(records, sys.stdout, args.format or 'jsonl')
+    return status
+
+
+def cmd_rewrite(args):
+    """Thay lời gọi decryptor bằng const-string trong các file smali"""
+    status = 0
+    total = 0
+    for result in rewriter.rewrite_tree(args.paths, args.method, not args.no_backup,
+                                        args.dry_run, args.workers):
+        if result.error:
+            print(f"{result.path}: {result.error}", file=sys.stderr)
+            status = 1
+            continue
+        if result.rewritten or result.skipped:
+            print(f"{result.path}\t{result.rewritten}\t{result.skipped}")
+        total += result.rewritten
+    print(f"Đã thay {total} call site" + (" (dry run)" if args.dry_run else ""), file=sys.stderr)
+    return status
+
+
+def cmd_scan(args):
+    """Quét cả cây apktool bằng process pool, in số block/phần tử/chuỗi của từng file"""
+    project = scanner.scan_project(args.paths, args.method, args.workers)
+    for scanned in project:
+        if scanned.error:
+            print(f"{scanned.path}: {scanned.error}", file=sys.stderr)
+        elif scanned.blocks:
+            print(f"{scanned.path}\t{len(scanned.blocks)}\t"
+                  f"{sum(len(block) for block in scanned.blocks)}\t{len(scanned.strings)}")
+    print(f"{len(project)} file, {project.block_count()} block, {project.element_count()} phần tử, "
+          f"{sum(1 for _ in project.iter_strings())} chuỗi", file=sys.stderr)
+    return 1 if project.errors else 0
+
+
+def cmd_watch(args):
+    """Theo dõi cây smali, parse/decode lại file khi nội dung đổi (Ctrl+C để dừng)"""
+    watcher = watch.ProjectWatcher(args.paths, args.method, args.workers)
+    changes = watcher.scan()
+    print(f"Đang theo dõi {len(watcher)} file smali "
+          f"({sum(len(state.strings) for state in watcher.files.values())} chuỗi)", file=sys.stderr)
+
+    def report(changes):
+        for tag, paths in (('+', changes.added), ('~', changes.modified)):
+            for path in paths:
+                state = watcher.get(path)
+                detail = state.error or f"{len(state.strings)} chuỗi"
+                print(f"{tag} {path}: {detail}", file=sys.stderr)
+                if args.strings:
+                    export.write_records(export.iter_site_records(path, state.strings),
+                                         sys.stdout)
+        for path in changes.removed:
+            print(f"- {path}", file=sys.stderr)
+        sys.stdout.flush()
+
+    if args.strings:
+        report(watch.WatchChanges(changes.added, [], []))
+    try:
+        watcher.poll(report, args.interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_search(args):
+    """Tìm chuỗi (substring hoặc regex) trong mọi chuỗi đã giải mã, dùng chỉ mục trigram"""
+    status = 0
+
+    def report(path, message):
+        nonlocal status
+        print(f"{path}: {message}", file=sys.stderr)
+        status = 1
+
+    index_path = args.index or search.default_index_path(args.paths[0])
+    with search.StringIndex(index_path) as index:
+        if not args.no_update:
+            updated, removed = index.update(args.paths, args.method, errors=report,
+                                            workers=args.workers)
+            if updated or removed:
+                print(f"Chỉ mục: cập nhật {updated} file, xoá {removed} file", file=sys.stderr)
+        hits = index.search(args.query, args.regex, args.ignore_case, args.limit)
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(errors='backslashreplace')
+    for hit in hits:
+        print(f"{hit.file}:{hit.line}\t{hit.method}\t{hit.block or '-'}\t"
+              f"{hit.start:#x}:{hit.end:#x}:{hit.key:#x}\t{hit.string!r}")
+    print(f"{len(hits)} kết quả", file=sys.stderr)
+    return status if hits else max(status, 1)
+
+
+def cmd_locate(args):
+    """Tìm range và key của các plaintext đã biết trong array-data (không cần brute-force key)"""
+    status = 0
+
+    def report(path, message):
+        nonlocal status
+        print(f"{path}: {message}", file=sys.stderr)
+        status = 1
+
+    locator = plaintext.PlaintextLocator(args.text)
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(errors='backslashreplace')
+    count = 0
+    for found in locator.locate_in_files(args.paths, errors=report, limit=args.limit):
+        hit = found.hit
+        print(f"{found.file}\t{found.block or '-'}\t{hit.start:#x}:{hit.end:#x}:{hit.key:#x}\t"
+              f"{hit.text!r}\t{found.context!r}")
+        count += 1
+    print(f"{count} vị trí khớp", file=sys.stderr)
+    return status if count else max(status, 1)
+
+
+def build_parser():
+    """Tạo argument parser"""
+    parser = argparse.ArgumentParser(
+        prog="smalixor", description="XOR Converter cho smali array-data")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Không dùng cache array-data đã parse")
+    parser.add_argument("--profile", metavar="TRACE_JSON",
+                        help="Đo thời gian từng stage, ghi Chrome trace ra file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("extract", help="Trích xuất array-data từ file/thư mục smali, file DEX/APK")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--dump", action="store_true", help="In toàn bộ giá trị")
+    p.add_argument("--blocks", action="store_true",
+                   help="Liệt kê mọi block: label, field, độ rộng, số phần tử")
+    p.add_argument("--block", help=BLOCK_HELP)
+    p.set_defaults(func=cmd_extract)
+
+    p = sub.add_parser("decode", help="Giải mã range từ file smali, DEX/APK hoặc txt")
+    p.add_argument("file")
+    p.add_argument("--start", type=_number)
+    p.add_argument("--end", type=_number)
+    p.add_argument("--key", type=_number)
+    p.add_argument("--range", type=_range_spec, action="append",
+                   help="START:END:KEY, có thể lặp lại")
+    p.add_argument("--block", help=BLOCK_HELP)
+    p.add_argument("--method", default="$",
+                   help="Tên method decryptor (mặc định: $); decryptor không phải XOR thuần "
+                        "thì KEY và range là tham số của call site")
+    p.set_defaults(func=cmd_decode)
+
+    p = sub.add_parser("calls", help="Tự động giải mã mọi lời gọi decryptor $(III) (smali hoặc DEX/APK)")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--method", default="$", help="Tên method decryptor (mặc định: $)")
+    p.set_defaults(func=cmd_calls)
+
+    p = sub.add_parser("decryptor", help="Xem decryptor $(III) được emulator dịch thành biểu thức nào")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--method", default="$", help="Tên method decryptor (mặc định: $)")
+    p.set_defaults(func=cmd_decryptor)
+
+    p = sub.add_parser("strings", help="Export mọi chuỗi đã giải mã ra JSONL/CSV")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("-o", "--output", help="File output (mặc định: stdout)")
+    p.add_argument("--format", choices=export.FORMATS,
+                   help="jsonl hoặc csv (mặc định: theo đuôi file output)")
+    p.add_argument("--method", default="$", help="Tên method decryptor (mặc định: $)")
+    p.set_defaults(func=cmd_strings)
+
+    p = sub.add_parser("rewrite", help="Thay lời gọi decryptor bằng const-string đã giải mã")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--method", default="$", help="Tên method decryptor (mặc định: $)")
+    p.add_argument("--workers", type=int, help="Số process (mặc định: số CPU)")
+    p.add_argument("--dry-run", action="store_true", help="Chỉ đếm, không ghi file")
+    p.add_argument("--no-backup", action="store_true")
+    p.set_defaults(func=cmd_rewrite)
+
+    p = sub.add_parser("search", help="Tìm chuỗi đã giải mã trong cả project (chỉ mục trigram)")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("query")
+    p.add_argument("--regex", action="store_true", help="query là regex (re của Python)")
+    p.add_argument("-i", "--ignore-case", action="store_true")
+    p.add_argument("--limit", type=int, help="Số kết quả tối đa")
+    p.add_argument("--index", help="File chỉ mục SQLite (mặc định: trong thư mục cache)")
+    p.add_argument("--no-update", action="store_true",
+                   help="Không đồng bộ chỉ mục với đĩa trước khi tìm")
+    p.add_argument("--workers", type=int, help="Số process khi cập nhật chỉ mục")
+    p.add_argument("--method", default="$", help="Tên method decryptor (mặc định: $)")
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("locate",
+                       help="Tìm range và XOR key của plaintext đã biết (vd. 'http'); chỉ XOR: "
+                            "bỏ qua và báo lỗi block có decryptor không phải XOR thuần")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--text", action="append", required=True,
+                   help="Plaintext cần tìm (ít nhất 2 ký tự), có thể lặp lại")
+    p.add_argument("--limit", type=int, help="Số vị trí tối đa")
+    p.set_defaults(func=cmd_locate)
+
+    p = sub.add_parser("scan", help="Quét song song cả cây apktool (smali/, smali_classesN/)")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--workers", type=int, help="Số process (mặc định: số CPU)")
+    p.add_argument("--method", default="$", help="Tên method decryptor (mặc định: $)")
+    p.set_defaults(func=cmd_scan)
+
+    p = sub.add_parser("watch", help="Theo dõi thư mục smali, decode lại file khi nội dung đổi")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--workers", type=int, help="Số process khi nhiều file đổi (mặc định: số CPU)")
+    p.add_argument("--interval", type=float, default=1.0, help="Số giây giữa hai lần kiểm tra")
+    p.add_argument("--method", default="$", help="Tên method decryptor (mặc định: $)")
+    p.add_argument("--strings", action="store_true",
+                   help="In chuỗi đã giải mã (JSONL) của các file thay đổi ra stdout")
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser("findkey",
+                       help="Tìm XOR key cho range bằng brute-force 65536 key (chỉ XOR: "
+                            "báo lỗi nếu decryptor không phải XOR thuần)")
+    p.add_argument("file")
+    p.add_argument("--start", type=_number)
+    p.add_argument("--end", type=_number)
+    p.add_argument("--top", type=int, default=10)
+    p.add_argument("--block", help=BLOCK_HELP)
+    p.add_argument("--calls", action="store_true",
+                   help="Tìm key cho range của mọi call site $(III) trong file (smali)")
+    p.add_argument("--method", default="$", help="Tên method decryptor (mặc định: $)")
+    p.add_argument("--workers", type=int, help="Số process khi nhiều range (mặc định: số CPU)")
+    p.set_defaults(func=cmd_findkey)
+
+    p = sub.add_parser("encode", help="Mã hoá chuỗi thành array-data")
+    p.add_argument("string")
+    p.add_argument("--key", type=_number, required=True)
+    p.set_defaults(func=cmd_encode)
+
+    p = sub.add_parser("edit", help="Ghi đè range bằng chuỗi mới rồi lưu file")
+    p.add_argument("file")
+    p.add_argument("--start", type=_number, required=True)
+    p.add_argument("--end", type=_number,
+                   help="Thay đúng range START:END, chuỗi dài/ngắn hơn thì relocate size "
+                        "new-array và start/end các call site")
+    p.add_argument("--method", default="$", help="Tên method decryptor (mặc định: $)")
+    p.add_argument("--key", type=_number, required=True)
+    p.add_argument("--string", required=True)
+    p.add_argument("--block", help=BLOCK_HELP)
+    p.add_argument("--journal", action="store_true",
+                   help="Ghi lịch sử sửa vào FILE.journal để undo/redo sau")
+    p.add_argument("--no-backup", action="store_true")
+    p.set_defaults(func=cmd_edit)
+
+    p = sub.add_parser("undo", help="Hoàn tác các lần edit --journal rồi lưu file")
+    p.add_argument("file")
+    p.add_argument("--steps", type=int, default=1, help="Số bước (mặc định: 1)")
+    p.add_argument("--redo", action="store_true", help="Làm lại thay vì hoàn tác")
+    p.add_argument("--no-backup", action="store_true")
+    p.set_defaults(func=cmd_undo)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.no_cache:
+        cache.set_default_cache(None)
+    if args.profile:
+        profiling.enable()
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if args.profile:
+            print(profiling.format_summary(), file=sys.stderr)
+            profiling.write_chrome_trace(args.profile)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""Lõi xử lý XOR array-data cho smali, không phụ thuộc Qt."""
+
+import os
+import re
+from array import array
+
+from . import cache, callsites, dex, document, emulator, engine, profiling, smali_parser, tokenizer
+
+
+class TaskCancelled(Exception):
+    """Được raise từ callback progress khi người dùng huỷ tác vụ"""
+
+
+# Literal short trong array-data (bao gồm cả giá trị âm)
+HEX_SHORT_PATTERN = re.compile(r'-?0x[0-9a-fA-F]+s')
+
+
+def parse_hex_or_decimal(value_str, is_decimal=False):
+    """Parse giá trị hex hoặc decimal"""
+    value_str = value_str.strip()
+    try:
+        if is_decimal:
+            return int(value_str)
+        # int(..., 16) chấp nhận cả tiền tố '0x' và dấu '-'
+        return int(value_str, 16)
+    except ValueError:
+        raise ValueError(f"Giá trị không hợp lệ: {value_str}")
+
+
+def parse_short_literal(hex_str):
+    """Chuyển literal smali ('0x174as', '-0x2fads') thành int"""
+    return smali_parser.parse_literal(hex_str, 2)
+
+
+def format_short_literal(value):
+    """Chuyển int thành literal short của smali"""
+    return smali_parser.format_literal(value, 2).decode('ascii')
+
+
+def format_literal(value, width=2):
+    """Chuyển int thành literal smali theo độ rộng phần tử (1, 2, 4, 8)"""
+    return smali_parser.format_literal(value, width).decode('ascii')
+
+
+def extract_array_data(content):
+    """Trích xuất các literal short từ nội dung txt thành array('h')"""
+    return array('h', map(parse_short_literal, HEX_SHORT_PATTERN.findall(content)))
+
+
+def load_array_blocks(file_path, progress=None):
+    """Tất cả block `.array-data` của file smali (qua cache), hoặc payload của file DEX/APK"""
+    try:
+        if dex.is_dex_input(file_path):
+            # Block DEX là view trên ảnh file, đọc thẳng nhanh hơn qua cache
+            return dex.load_array_blocks(file_path, progress)
+        return cache.load_blocks(file_path, 'smali', smali_parser.parse_array_blocks, progress)
+    except OSError as e:
+        raise ValueError(f"Lỗi khi đọc file {file_path}: {e}")
+
+
+def extract_array_data_from_file(file_path, progress=None, block=None):
+    """Trích xuất array-data của một block trong file smali
+
+    block là label (':array_0') hoặc field ('$', 'Lcls;->$:[S'); mặc định lấy block
+    short được gán cho field static (xem smali_parser.select_block).
+    """
+    blocks = load_array_blocks(file_path, progress)
+    if not any(blocks):
+        raise ValueError(f"Không tìm thấy array-data trong file: {file_path}")
+    return blocks[smali_parser.select_block(blocks, block)].values
+
+
+def _parse_txt_blocks(file_path, progress=None):
+    """mmap file txt, gom mọi literal short thành một block width 2 (không decode UTF-8)"""
+    block = smali_parser.ArrayBlock(None, 2, 0, 0)
+    total = os.path.getsize(file_path)
+    with profiling.stage('parse', bytes=total) as s:
+        with tokenizer.mapped(file_path) as buffer:
+            # Offset chỉ cần cho file smali (để ghi lại), txt chỉ đọc
+            sink = tokenizer.LiteralSink('h', tokenizer.literal_capacity(buffer, 0, len(buffer)),
+                                         positions=False)
+            tokenizer.read_literals(buffer, 0, len(buffer), sink, b's', progress, total)
+            sink.finish()
+            block.values = sink.values
+        s.add(elements=len(block.values))
+    return [block]
+
+
+def extract_array_data_from_txt(file_path, progress=None):
+    """Trích xuất array-data từ file txt (đọc từng dòng)"""
+    try:
+        hex_values = cache.load_blocks(file_path, 'txt', _parse_txt_blocks, progress)[0].values
+    except OSError as e:
+        raise ValueError(f"Lỗi khi đọc file {file_path}: {e}")
+
+    if not hex_values:
+        raise ValueError(f"Không tìm thấy array-data trong file: {file_path}")
+    return hex_values
+
+
+def load_array_data(file_path, progress=None, block=None):
+    """Đọc array-data từ file smali, DEX/APK hoặc txt (phân biệt theo đuôi file)"""
+    if file_path.endswith('.smali') or dex.is_dex_input(file_path):
+        return extract_array_data_from_file(file_path, progress, block)
+    return extract_array_data_from_txt(file_path, progress)
+
+
+def decode_xor(array_data, xor_key, start_index, end_index):
+    """Giải mã XOR một range của array-data"""
+    # Giống int-to-char của Dalvik: chỉ giữ 16 bit thấp
+    return engine.decode_range(array_data, xor_key, start_index, end_index)
+
+
+def decode_xor_ranges(array_data, ranges):
+    """Giải mã nhiều bộ (start, end, key) cùng lúc"""
+    return engine.decode_ranges(array_data, ranges)
+
+
+def decode_xor_from_file(file_path, xor_key, start_index, end_index, progress=None, block=None):
+    """Giải mã XOR trực tiếp từ file smali hoặc txt"""
+    array_data = load_array_data(file_path, progress, block)
+    return decode_xor(array_data, xor_key, start_index, end_index)
+
+
+def block_decryptor(file_path, blocks, index, method_name='$'):
+    """Decryptor (kernel) đọc block thứ index của file, None nếu giải mã XOR là đúng
+
+    None khi block không có field, không có decryptor nào đọc block hoặc decryptor là XOR
+    thuần. Raise emulator.UnsupportedDecryptor nếu decryptor đọc block không dịch được.
+    """
+    field = blocks[index].field
+    if not field:
+        return None
+    if dex.is_dex_input(file_path):
+        decryptor = dex.load_decryptor(file_path, field, method_name)
+    else:
+        try:
+            decryptor = callsites.load_decryptor(file_path, method_name)
+        except emulator.UnsupportedDecryptor:
+            if callsites.decryptor_block_index(file_path, blocks, method_name) != index:
+                return None
+            raise
+    if decryptor is None or field not in decryptor.fields:
+        return None
+    return decryptor
+
+
+def require_xor_block(file_path, blocks, index, method_name='$'):
+    """Raise ValueError nếu block được giải mã bởi decryptor không phải XOR thuần"""
+    try:
+        decryptor = block_decryptor(file_path, blocks, index, method_name)
+    except emulator.UnsupportedDecryptor as e:
+        raise ValueError(f"Chỉ hỗ trợ decryptor XOR thuần: {e}") from None
+    if decryptor is not None:
+        raise ValueError(f"Chỉ hỗ trợ decryptor XOR thuần, decryptor đọc block "
+                         f"{blocks[index].field} trong {file_path} là {decryptor!r}")
+
+
+def load_xor_array_data(file_path, progress=None, block=None, method_name='$'):
+    """Như load_array_data, nhưng raise ValueError nếu block có decryptor không phải XOR thuần
+
+    Dùng cho các thao tác chỉ đúng với XOR (brute-force key, tìm plaintext).
+    """
+    if file_path.endswith('.smali') or dex.is_dex_input(file_path):
+        blocks = load_array_blocks(file_path, progress)
+        if not any(blocks):
+            raise ValueError(f"Không tìm thấy array-data trong file: {file_path}")
+        index = smali_parser.select_block(blocks, block)
+        require_xor_block(file_path, blocks, index, method_name)
+        return blocks[index].values
+    return extract_array_data_from_txt(file_path, progress)
+
+
+def decode_block_ranges(file_path, blocks, index, ranges, values=None, method_name='$'):
+    """Giải mã nhiều bộ (start, end, key) trên block thứ index theo decryptor của file
+
+    Block do decryptor đã dịch được đọc thì giải mã bằng kernel của nó (ranges là tham số
+    start/end/key của call site), còn lại dùng engine XOR. values (list cùng thứ tự blocks)
+    thay cho block.values, ví dụ bản chưa lưu trong GUI.
+    """
+    if values is None:
+        values = [block.values for block in blocks]
+    decryptor = block_decryptor(file_path, blocks, index, method_name)
+    if decryptor is not None:
+        return decryptor.decode_ranges(emulator.field_arrays(blocks, values), ranges)
+    return decode_xor_ranges(values[index], ranges)
+
+
+def decode_ranges_from_file(file_path, ranges, progress=None, block=None, method_name='$'):
+    """Giải mã nhiều bộ (start, end, key) từ file smali, DEX/APK hoặc txt
+
+    File smali và DEX/APK giải mã theo decryptor đọc block (xem decode_block_ranges);
+    không chỉ rõ block thì file smali lấy block mà decryptor đọc. File txt không có
+    decryptor nên luôn là XOR.
+    """
+    if file_path.endswith('.smali') or dex.is_dex_input(file_path):
+        blocks = load_array_blocks(file_path, progress)
+        if not any(blocks):
+            raise ValueError(f"Không tìm thấy array-data trong file: {file_path}")
+        if block is None and not dex.is_dex_input(file_path):
+            index = callsites.decryptor_block_index(file_path, blocks, method_name)
+        else:
+            index = smali_parser.select_block(blocks, block)
+        return decode_block_ranges(file_path, blocks, index, ranges, method_name=method_name)
+    return decode_xor_ranges(extract_array_data_from_txt(file_path, progress), ranges)
+
+
+def encode_xor(text, xor_key):
+    """Mã hoá chuỗi (theo code unit UTF-16 như java.lang.String) thành array('h')"""
+    return engine.encode_string(text, xor_key)
+
+
+def apply_range_edit(array_data, start_index, text, xor_key):
+    """Ghi đè range bắt đầu từ start_index bằng chuỗi đã mã hoá"""
+    xor_values = encode_xor(text, xor_key)
+    written = max(0, min(len(xor_values), len(array_data) - start_index))
+    array_data[start_index:start_index + written] = xor_values[:written]
+    return written
+
+
+def save_array_data(smali_file_path, array_data, backup=True, block=None):
+    """Lưu array-data của một block vào file smali, trả về đường dẫn backup (nếu có)"""
+    # Chỉ ghi lại các literal có giá trị khác với file
+    smali_document = document.SmaliDocument.load(smali_file_path)
+    smali_document.replace_values(array_data, block)
+    return smali_document.save(backup)
+
+
+def export_array_data(file_path, array_data):
+    """Export array-data ra file txt, mỗi dòng một giá trị"""
+    width = smali_parser.width_of(array_data)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        for value in array_data:
+            f.write(format_literal(value, width) + '\n')
+
+
+def iter_smali_files(paths):
+    """Duyệt các file .smali từ danh sách file/thư mục"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith('.smali'):
+                        yield os.path.join(root, name)
+        else:
+            yield path
@@ -0,0 +1,637 @@
+# -*- coding: utf-8 -*-
+"""Đọc array-data và call site decryptor thẳng từ file DEX hoặc APK, không cần chạy apktool.
+
+Block là các `fill-array-data-payload` mà `<clinit>` của từng class nạp vào field static;
+giá trị là memoryview typed trỏ thẳng vào ảnh DEX (không parse literal, không copy).
+Hằng số start/end/key của call site được resolve bằng cách chạy tuyến tính bytecode, cùng
+quy tắc với callsites.iter_call_sites trên smali.
+"""
+
+import os
+import re
+import struct
+import sys
+import zipfile
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+from . import callsites, emulator, profiling, smali_parser
+
+DEX_MAGIC = b'dex\n'
+ENDIAN_CONSTANT = 0x12345678
+DEX_SUFFIXES = ('.dex',)
+ARCHIVE_SUFFIXES = ('.apk', '.zip', '.jar')
+# classes.dex, classes2.dex, ... ở gốc APK
+DEX_MEMBER_RE = re.compile(r'^classes(\d*)\.dex$')
+
+# magic, checksum, signature, file_size ... data_off (header 0x70 byte)
+HEADER = struct.Struct('<8sI20s20I')
+FIELD_ID = struct.Struct('<HHI')
+METHOD_ID = struct.Struct('<HHI')
+PROTO_ID = struct.Struct('<III')
+CLASS_DEF = struct.Struct('<8I')
+# registers_size, ins_size, outs_size, tries_size, debug_info_off, insns_size
+CODE_ITEM = struct.Struct('<4HII')
+# ident, element_width, size của fill-array-data-payload
+ARRAY_PAYLOAD = struct.Struct('<HHI')
+
+# Code unit đầu của các pseudo-instruction payload (opcode nop với byte cao khác 0)
+PACKED_SWITCH_PAYLOAD = 0x0100
+SPARSE_SWITCH_PAYLOAD = 0x0200
+FILL_ARRAY_DATA_PAYLOAD = 0x0300
+
+MOVE, MOVE_FROM16, MOVE_16 = 0x01, 0x02, 0x03
+MOVE_OBJECT, MOVE_OBJECT_FROM16, MOVE_OBJECT_16 = 0x07, 0x08, 0x09
+CONST_4, CONST_16, CONST, CONST_HIGH16 = 0x12, 0x13, 0x14, 0x15
+FILL_ARRAY_DATA = 0x26
+SGET_OBJECT = 0x62
+SPUT_OBJECT = 0x69
+INVOKE_STATIC, INVOKE_STATIC_RANGE = 0x71, 0x77
+ARRAY_LENGTH, NEW_ARRAY = 0x21, 0x23
+GOTO, GOTO_16, GOTO_32 = 0x28, 0x29, 0x2a
+
+
+def _table(default, entries):
+    """Bảng 256 phần tử theo opcode từ list (giá trị, opcode hoặc (đầu, cuối))"""
+    table = [default] * 256
+    for value, spans in entries:
+        for span in spans:
+            low, high = span if isinstance(span, tuple) else (span, span)
+            for op in range(low, high + 1):
+                table[op] = value
+    return table
+
+
+# Độ dài (code unit) của từng lệnh theo format của opcode
+INSTRUCTION_UNITS = _table(1, [
+    (2, [0x02, 0x05, 0x08, 0x13, (0x15, 0x16), (0x19, 0x1a), 0x1c, (0x1f, 0x20), (0x22, 0x23),
+         0x29, (0x2d, 0x3d), (0x44, 0x6d), (0x90, 0xaf), (0xd0, 0xe2), (0xfe, 0xff)]),
+    (3, [0x03, 0x06, 0x09, 0x14, 0x17, 0x1b, (0x24, 0x26), (0x2a, 0x2c), (0x6e, 0x72),
+         (0x74, 0x78), (0xfc, 0xfd)]),
+    (4, [(0xfa, 0xfb)]),
+    (5, [0x18]),
+])
+# Vị trí thanh ghi đích của các lệnh ghi vào thanh ghi: 1 = A (4 bit), 2 = AA, 3 = AAAA
+# (code unit thứ hai); 0 = lệnh không ghi thanh ghi nào
+DEST_KINDS = _table(0, [
+    (1, [0x01, 0x04, 0x07, 0x12, (0x20, 0x21), 0x23, (0x52, 0x58), (0x7b, 0x8f), (0xb0, 0xd7)]),
+    (2, [0x02, 0x05, 0x08, (0x0a, 0x0d), (0x13, 0x1c), 0x1f, 0x22, (0x2d, 0x31), (0x44, 0x4a),
+         (0x60, 0x66), (0x90, 0xaf), (0xd8, 0xe2), (0xfe, 0xff)]),
+    (3, [0x03, 0x06, 0x09]),
+])
+# Các lệnh ghi cặp thanh ghi (long/double)
+WIDE_DESTS = frozenset(op for op, wide in enumerate(_table(False, [(True, [
+    (0x04, 0x06), 0x0b, (0x16, 0x19), 0x45, 0x53, 0x61, (0x7d, 0x7e), (0x80, 0x81), 0x83, 0x86,
+    (0x88, 0x89), 0x8b, (0x9b, 0xa5), (0xab, 0xaf), (0xbb, 0xc5), (0xcb, 0xcf)])])) if wide)
+
+
+# Tên opcode smali của các lệnh emulator dịch được (emulator.compile_method); lệnh khác
+# chỉ cần biết thanh ghi đích nên mang tên 'op-XX' (thêm '-wide' nếu ghi cặp thanh ghi)
+OPCODE_NAMES = [f'op-{op:02x}' + ('-wide' if op in WIDE_DESTS else '') for op in range(256)]
+for _op, _name in [
+        (0x01, 'move'), (0x02, 'move/from16'), (0x03, 'move/16'), (0x07, 'move-object'),
+        (0x08, 'move-object/from16'), (0x09, 'move-object/16'), (0x12, 'const/4'),
+        (0x13, 'const/16'), (0x14, 'const'), (0x15, 'const/high16'), (0x1f, 'check-cast'),
+        (0x21, 'array-length'), (0x23, 'new-array'), (0x28, 'goto'), (0x29, 'goto/16'),
+        (0x2a, 'goto/32'), (0x2b, 'packed-switch'), (0x2c, 'sparse-switch'),
+        (0x62, 'sget-object'), (0x7b, 'neg-int'), (0x7c, 'not-int'), (0x8d, 'int-to-byte'),
+        (0x8e, 'int-to-char'), (0x8f, 'int-to-short'), (0xd1, 'rsub-int'), (0xd9, 'rsub-int/lit8')]:
+    OPCODE_NAMES[_op] = _name
+for _i, _name in enumerate(('eq', 'ne', 'lt', 'ge', 'gt', 'le')):
+    OPCODE_NAMES[0x32 + _i] = f'if-{_name}'
+    OPCODE_NAMES[0x38 + _i] = f'if-{_name}z'
+for _i, _name in enumerate(('', '-wide', '-object', '-boolean', '-byte', '-char', '-short')):
+    OPCODE_NAMES[0x44 + _i] = f'aget{_name}'
+    OPCODE_NAMES[0x4b + _i] = f'aput{_name}'
+for _i, _name in enumerate(('add', 'sub', 'mul', 'div', 'rem', 'and', 'or', 'xor', 'shl', 'shr',
+                            'ushr')):
+    OPCODE_NAMES[0x90 + _i] = f'{_name}-int'
+    OPCODE_NAMES[0xb0 + _i] = f'{_name}-int/2addr'
+    if _name != 'sub':
+        # lit8/lit16 không có sub (thay bằng rsub-int), lit16 không có phép dịch bit
+        OPCODE_NAMES[0xd8 + _i] = f'{_name}-int/lit8'
+        if _i < 8:
+            OPCODE_NAMES[0xd0 + _i] = f'{_name}-int/lit16'
+del _op, _i, _name
+
+
+def is_dex_input(path):
+    """File .dex hoặc APK/zip chứa classes*.dex (phân biệt theo đuôi file)"""
+    return path.lower().endswith(DEX_SUFFIXES + ARCHIVE_SUFFIXES)
+
+
+def _s16(value):
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def _s32(value):
+    value &= 0xFFFFFFFF
+    return value - 0x100000000 if value & 0x80000000 else value
+
+
+def _uleb128(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _mutf8(raw):
+    """Giải mã MUTF-8 của DEX (NUL là C0 80, ký tự ngoài BMP là hai surrogate 3 byte)"""
+    if raw.isascii():
+        return raw.decode('ascii')
+    text = raw.replace(b'\xc0\x80', b'\x00').decode('utf-8', 'surrogatepass')
+    return text.encode('utf-16-le', 'surrogatepass').decode('utf-16-le', 'surrogatepass')
+
+
+def _typed_view(view, start, count, width):
+    """Giá trị (có dấu như Java) của payload: memoryview trên ảnh DEX, máy big-endian thì copy"""
+    typecode = smali_parser.WIDTH_TYPECODES[width]
+    raw = view[start:start + count * width]
+    if sys.byteorder == 'little':
+        return raw.cast(typecode)
+    values = array(typecode, raw.tobytes())
+    values.byteswap()
+    return values
+
+
+def iter_instructions(units):
+    """Yield (pc, opcode) của từng lệnh trong list code unit, bỏ qua các payload"""
+    pc = 0
+    n = len(units)
+    while pc < n:
+        unit = units[pc]
+        op = unit & 0xFF
+        if op == 0 and unit:
+            if unit == PACKED_SWITCH_PAYLOAD:
+                pc += units[pc + 1] * 2 + 4
+            elif unit == SPARSE_SWITCH_PAYLOAD:
+                pc += units[pc + 1] * 4 + 2
+            elif unit == FILL_ARRAY_DATA_PAYLOAD:
+                size = units[pc + 2] | units[pc + 3] << 16
+                pc += (size * units[pc + 1] + 1) // 2 + 4
+            else:
+                pc += 1
+            continue
+        yield pc, op
+        pc += INSTRUCTION_UNITS[op]
+
+
+class DexFile:
+    """Một file DEX trong bộ nhớ; các bảng id được đọc theo nhu cầu"""
+
+    def __init__(self, data, name='classes.dex', member=None):
+        self.data = data
+        self.name = name
+        self.member = member      # tên entry trong APK/zip (None với file .dex)
+        if len(data) < HEADER.size or data[:4] != DEX_MAGIC:
+            raise ValueError(f"Không phải file DEX: {name}")
+        header = HEADER.unpack_from(data, 0)
+        (_, _, _, _, _, endian_tag, _, _, _,
+         self.string_count, self.string_ids_off, self.type_count, self.type_ids_off,
+         self.proto_count, self.proto_ids_off, self.field_count, self.field_ids_off,
+         self.method_count, self.method_ids_off, self.class_count, self.class_defs_off,
+         _, _) = header
+        if endian_tag != ENDIAN_CONSTANT:
+            raise ValueError(f"DEX big-endian không được hỗ trợ: {name}")
+        self._view = memoryview(data)
+        self._strings = {}
+
+    def string(self, idx):
+        text = self._strings.get(idx)
+        if text is None:
+            offset = struct.unpack_from('<I', self.data, self.string_ids_off + 4 * idx)[0]
+            _, start = _uleb128(self.data, offset)
+            text = self._strings[idx] = _mutf8(self.data[start:self.data.index(b'\0', start)])
+        return text
+
+    def find_string(self, text):
+        """Chỉ số của chuỗi trong bảng string_ids (đã sắp theo code unit UTF-16), None nếu không có"""
+        key = text.encode('utf-16-be', 'surrogatepass')
+        low, high = 0, self.string_count
+        while low < high:
+            mid = (low + high) // 2
+            if self.string(mid).encode('utf-16-be', 'surrogatepass') < key:
+                low = mid + 1
+            else:
+                high = mid
+        return low if low < self.string_count and self.string(low) == text else None
+
+    def type_name(self, idx):
+        return self.string(struct.unpack_from('<I', self.data, self.type_ids_off + 4 * idx)[0])
+
+    def field_name(self, idx):
+        """Field dạng smali: 'Lcls;->name:[S'"""
+        class_idx, type_idx, name_idx = FIELD_ID.unpack_from(self.data, self.field_ids_off + 8 * idx)
+        return f"{self.type_name(class_idx)}->{self.string(name_idx)}:{self.type_name(type_idx)}"
+
+    def method_id(self, idx):
+        """(class_idx, proto_idx, name_idx) của method"""
+        return METHOD_ID.unpack_from(self.data, self.method_ids_off + 8 * idx)
+
+    def proto_descriptor(self, idx):
+        """Descriptor dạng '(III)Ljava/lang/String;'"""
+        _, return_idx, params_off = PROTO_ID.unpack_from(self.data, self.proto_ids_off + 12 * idx)
+        params = []
+        if params_off:
+            size = struct.unpack_from('<I', self.data, params_off)[0]
+            params = [self.type_name(type_idx)
+                      for type_idx in struct.unpack_from(f'<{size}H', self.data, params_off + 4)]
+        return '(' + ''.join(params) + ')' + self.type_name(return_idx)
+
+    def method_signature(self, idx):
+        """Method dạng smali như CallSite.method: 'name(params)return'"""
+        _, proto_idx, name_idx = self.method_id(idx)
+        return self.string(name_idx) + self.proto_descriptor(proto_idx)
+
+    def iter_classes(self):
+        """Yield (descriptor class, list (method_idx, code_off)) theo thứ tự class_defs"""
+        for i in range(self.class_count):
+            class_idx, *_, class_data_off, _ = CLASS_DEF.unpack_from(
+                self.data, self.class_defs_off + CLASS_DEF.size * i)
+            yield self.type_name(class_idx), self._class_methods(class_data_off)
+
+    def _class_methods(self, class_data_off):
+        if not class_data_off:
+            return []
+        data = self.data
+        counts = []
+        pos = class_data_off
+        for _ in range(4):
+            count, pos = _uleb128(data, pos)
+            counts.append(count)
+        static_fields, instance_fields, direct_methods, virtual_methods = counts
+        for _ in range(2 * (static_fields + instance_fields)):
+            _, pos = _uleb128(data, pos)
+        methods = []
+        for count in (direct_methods, virtual_methods):
+            # method_idx được mã hoá dạng hiệu so với method trước, tính lại từ đầu mỗi danh sách
+            method_idx = 0
+            for _ in range(count):
+                diff, pos = _uleb128(data, pos)
+                _, pos = _uleb128(data, pos)
+                code_off, pos = _uleb128(data, pos)
+                method_idx += diff
+                methods.append((method_idx, code_off))
+        return methods
+
+    def code_units(self, code_off):
+        """(offset byte của lệnh đầu tiên, list code unit) của một code_item"""
+        insns_size = CODE_ITEM.unpack_from(self.data, code_off)[5]
+        start = code_off + CODE_ITEM.size
+        if start + 2 * insns_size > len(self.data):
+            raise ValueError(f"code_item vượt quá file DEX: {self.name}")
+        return start, np.frombuffer(self.data, dtype='<u2', count=insns_size,
+                                    offset=start).tolist()
+
+    def clinit_blocks(self, code_off):
+        """ArrayBlock của các fill-array-data trong `<clinit>`, theo thứ tự địa chỉ payload
+
+        Label đánh số tuần tự như apktool (':array_0', ...), field là field static được
+        sput-object ngay sau với cùng thanh ghi (như smali_parser).
+        """
+        start, units = self.code_units(code_off)
+        pending = {}   # thanh ghi -> địa chỉ payload vừa fill-array-data
+        fields = {}    # địa chỉ payload -> field static
+        targets = set()
+        for pc, op in iter_instructions(units):
+            if op == FILL_ARRAY_DATA:
+                target = pc + _s32(units[pc + 1] | units[pc + 2] << 16)
+                pending[units[pc] >> 8] = target
+                targets.add(target)
+            elif op == SPUT_OBJECT and units[pc] >> 8 in pending:
+                fields[pending.pop(units[pc] >> 8)] = self.field_name(units[pc + 1])
+        return [self._payload_block(start + 2 * target, f':array_{number}', fields.get(target))
+                for number, target in enumerate(sorted(targets))]
+
+    def _payload_block(self, offset, label, field):
+        ident, width, size = ARRAY_PAYLOAD.unpack_from(self.data, offset)
+        if ident != FILL_ARRAY_DATA_PAYLOAD or width not in smali_parser.WIDTH_TYPECODES:
+            raise ValueError(f"fill-array-data-payload không hợp lệ tại {offset:#x}: {self.name}")
+        data_start = offset + ARRAY_PAYLOAD.size
+        data_end = data_start + size * width
+        if data_end > len(self.data):
+            raise ValueError(f"fill-array-data-payload vượt quá file DEX: {self.name}")
+        # line = 0: block không nằm trong file văn bản; offsets/lengths để trống (không ghi lại)
+        block = smali_parser.ArrayBlock(label, width, 0, data_start, field)
+        block.data_end = data_end
+        block.values = _typed_view(self._view, data_start, size, width)
+        return block
+
+    def decryptor_methods(self, method_name='$'):
+        """Map method_idx -> descriptor class của mọi method `method_name(III)Ljava/lang/String;`"""
+        name_idx = self.find_string(method_name)
+        if name_idx is None or not self.method_count:
+            return {}
+        method_ids = np.frombuffer(self.data, dtype=[('cls', '<u2'), ('proto', '<u2'),
+                                                     ('name', '<u4')],
+                                   count=self.method_count, offset=self.method_ids_off)
+        result = {}
+        for idx in np.flatnonzero(method_ids['name'] == name_idx).tolist():
+            class_idx, proto_idx, _ = self.method_id(idx)
+            if self.proto_descriptor(proto_idx) == callsites.DECRYPTOR_DESCRIPTOR:
+                result[idx] = self.type_name(class_idx)
+        return result
+
+    def invoke_offsets(self, decryptors):
+        """Offset byte (đã sắp) có thể là lệnh invoke-static tới một decryptor
+
+        Lọc thô trên cả file (lệnh luôn bắt đầu ở offset chẵn) để chỉ phải chạy bytecode của
+        các method có gọi decryptor.
+        """
+        if not decryptors:
+            return []
+        units = np.frombuffer(self.data, dtype='<u2', count=len(self.data) // 2)
+        opcodes = units[:-1] & 0xFF
+        candidates = np.flatnonzero((opcodes == INVOKE_STATIC) | (opcodes == INVOKE_STATIC_RANGE))
+        candidates = candidates[np.isin(units[candidates + 1],
+                                        np.fromiter(decryptors, dtype=np.uint16))]
+        return (candidates * 2).tolist()
+
+    def iter_call_sites(self, code_off, decryptors):
+        """Yield (offset byte, method_idx decryptor, start, end, key) của một method
+
+        Cùng quy tắc với callsites.iter_call_sites: chỉ theo dõi hằng số nạp bằng
+        const/4, const/16, const, const/high16 và move; lệnh khác ghi vào thanh ghi
+        thì thanh ghi đó không còn là hằng số.
+        """
+        start, units = self.code_units(code_off)
+        values = {}
+        for pc, op in iter_instructions(units):
+            unit = units[pc]
+            if op == CONST_4:
+                values[unit >> 8 & 0xF] = ((unit >> 12) ^ 8) - 8
+            elif op == CONST_16:
+                values[unit >> 8] = _s16(units[pc + 1])
+            elif op == CONST:
+                values[unit >> 8] = _s32(units[pc + 1] | units[pc + 2] << 16)
+            elif op == CONST_HIGH16:
+                values[unit >> 8] = _s32(units[pc + 1] << 16)
+            elif op == INVOKE_STATIC or op == INVOKE_STATIC_RANGE:
+                target = units[pc + 1]
+                if target not in decryptors:
+                    continue
+                if op == INVOKE_STATIC:
+                    count, arg = unit >> 12, units[pc + 2]
+                    regs = [arg & 0xF, arg >> 4 & 0xF, arg >> 8 & 0xF]
+                else:
+                    count, first = unit >> 8, units[pc + 2]
+                    regs = [first, first + 1, first + 2]
+                if count == 3 and all(reg in values for reg in regs):
+                    yield (start + 2 * pc, target, values[regs[0]], values[regs[1]],
+                           values[regs[2]])
+            else:
+                kind = DEST_KINDS[op]
+                if not kind:
+                    continue
+                if kind == 1:
+                    dest, source = unit >> 8 & 0xF, unit >> 12
+                elif kind == 2:
+                    dest, source = unit >> 8, units[pc + 1]
+                else:
+                    dest, source = units[pc + 1], units[pc + 2]
+                if op in (MOVE, MOVE_FROM16, MOVE_16) and source in values:
+                    values[dest] = values[source]
+                    continue
+                values.pop(dest, None)
+                if op in WIDE_DESTS:
+                    values.pop(dest + 1, None)
+
+    def method_instructions(self, code_off):
+        """Thân method cho emulator.compile_method: (list Instruction, dict pc -> chỉ số, thanh ghi start)
+
+        Ba tham số int của decryptor là ba thanh ghi cuối cùng của method.
+        """
+        registers_size = CODE_ITEM.unpack_from(self.data, code_off)[0]
+        _, units = self.code_units(code_off)
+        instructions = []
+        labels = {}
+        for pc, op in iter_instructions(units):
+            labels[pc] = len(instructions)
+            instructions.append(self._instruction(units, pc, op))
+        return instructions, labels, registers_size - 3
+
+    def _instruction(self, units, pc, op):
+        unit = units[pc]
+        a, b, aa = unit >> 8 & 0xF, unit >> 12, unit >> 8
+        regs = ()
+        literal = ref = target = None
+        if op == CONST_4:
+            regs, literal = (a,), (b ^ 8) - 8
+        elif op == CONST_16:
+            regs, literal = (aa,), _s16(units[pc + 1])
+        elif op == CONST:
+            regs, literal = (aa,), _s32(units[pc + 1] | units[pc + 2] << 16)
+        elif op == CONST_HIGH16:
+            regs, literal = (aa,), _s32(units[pc + 1] << 16)
+        elif op in (MOVE_FROM16, MOVE_OBJECT_FROM16):
+            regs = (aa, units[pc + 1])
+        elif op in (MOVE_16, MOVE_OBJECT_16):
+            regs = (units[pc + 1], units[pc + 2])
+        elif op in (MOVE, MOVE_OBJECT, ARRAY_LENGTH) or 0x7b <= op <= 0x8f or 0xb0 <= op <= 0xcf:
+            regs = (a, b)
+        elif op == NEW_ARRAY:
+            regs, ref = (a, b), self.type_name(units[pc + 1])
+        elif op == SGET_OBJECT:
+            regs, ref = (aa,), self.field_name(units[pc + 1])
+        elif 0x44 <= op <= 0x51 or 0x90 <= op <= 0xaf:
+            regs = (aa, units[pc + 1] & 0xFF, units[pc + 1] >> 8)
+        elif 0xd0 <= op <= 0xd7:
+            regs, literal = (a, b), _s16(units[pc + 1])
+        elif 0xd8 <= op <= 0xe2:
+            regs, literal = (aa, units[pc + 1] & 0xFF), ((units[pc + 1] >> 8) ^ 0x80) - 0x80
+        elif op == GOTO:
+            target = pc + ((aa ^ 0x80) - 0x80)
+        elif op == GOTO_16:
+            target = pc + _s16(units[pc + 1])
+        elif op in (GOTO_32, 0x2b, 0x2c):
+            target = pc + _s32(units[pc + 1] | units[pc + 2] << 16)
+        elif 0x32 <= op <= 0x37:
+            regs, target = (a, b), pc + _s16(units[pc + 1])
+        elif 0x38 <= op <= 0x3d:
+            regs, target = (aa,), pc + _s16(units[pc + 1])
+        else:
+            kind = DEST_KINDS[op]
+            if kind:
+                regs = ((a if kind == 1 else aa if kind == 2 else units[pc + 1]),)
+        return emulator.Instruction(OPCODE_NAMES[op], regs, literal, ref, target)
+
+    def decryptor(self, code_off):
+        """emulator.Decryptor của thân decryptor nếu cần kernel riêng (xem emulator.kernel)
+
+        Raise emulator.UnsupportedDecryptor nếu thân decryptor không dịch được.
+        """
+        return emulator.kernel(self.method_instructions(code_off))
+
+    def class_decryptor(self, class_name, method_name='$'):
+        """Decryptor (xem decryptor) của method `method_name(III)` thuộc class, None nếu không có"""
+        decryptors = {idx for idx, owner in self.decryptor_methods(method_name).items()
+                      if owner == class_name}
+        if not decryptors:
+            return None
+        for name, methods in self.iter_classes():
+            if name != class_name:
+                continue
+            for method_idx, code_off in methods:
+                if method_idx in decryptors and code_off:
+                    try:
+                        return self.decryptor(code_off)
+                    except emulator.UnsupportedDecryptor as e:
+                        raise emulator.UnsupportedDecryptor(
+                            f"Không dịch được decryptor của {class_name} trong {self.name}: {e}"
+                        ) from None
+        return None
+
+    def first_sget_object(self, code_off):
+        """Field của lệnh sget-object đầu tiên trong method (array decryptor đọc), None nếu không có"""
+        _, units = self.code_units(code_off)
+        for pc, op in iter_instructions(units):
+            if op == SGET_OBJECT:
+                return self.field_name(units[pc + 1])
+        return None
+
+    def scan(self, method_name='$'):
+        """(list ArrayBlock, list (CallSite, string)) của mọi class trong file DEX
+
+        Mỗi class chỉ giải mã call site tới decryptor của chính nó, bằng block mà decryptor
+        đó đọc (sget-object đầu tiên), giống callsites.resolve_file cho một file smali.
+        CallSite.line là offset byte của lệnh invoke trong file DEX, CallSite.member là tên
+        entry của file DEX trong APK/zip.
+        method_name=None thì chỉ đọc block, không tìm call site.
+        """
+        clinit = self.find_string('<clinit>')
+        decryptors = {} if method_name is None else self.decryptor_methods(method_name)
+        hits = self.invoke_offsets(decryptors)
+        blocks = []
+        # (class, block của class, field decryptor đọc, code_off decryptor, list CallSite)
+        classes = []
+        for class_name, methods in self.iter_classes():
+            class_blocks = []
+            field = decryptor_off = None
+            sites = []
+            for method_idx, code_off in methods:
+                if not code_off:
+                    continue
+                if clinit is not None and self.method_id(method_idx)[2] == clinit:
+                    class_blocks = self.clinit_blocks(code_off)
+                if decryptors.get(method_idx) == class_name:
+                    field = self.first_sget_object(code_off)
+                    decryptor_off = code_off
+                if not self._has_hit(hits, code_off):
+                    continue
+                signature = self.method_signature(method_idx)
+                for offset, target, start, end, key in self.iter_call_sites(code_off, decryptors):
+                    if decryptors[target] == class_name:
+                        sites.append(callsites.CallSite(class_name, signature, offset, class_name,
+                                                        start, end, key, member=self.member))
+            blocks.extend(class_blocks)
+            if sites:
+                classes.append((class_name, class_blocks, field, decryptor_off, sites))
+
+        by_field = {block.field: block for block in blocks if block.field}
+        results = []
+        for class_name, class_blocks, field, decryptor_off, sites in classes:
+            # Decryptor không dịch được thì báo lỗi, không giải mã XOR ra chuỗi sai
+            try:
+                decryptor = self.decryptor(decryptor_off) if decryptor_off else None
+                if decryptor is not None:
+                    results.extend(decryptor.decode_call_sites(emulator.field_arrays(blocks),
+                                                               sites))
+                    continue
+            except emulator.UnsupportedDecryptor as e:
+                raise emulator.UnsupportedDecryptor(
+                    f"Không dịch được decryptor của {class_name} trong {self.name}: {e}") from None
+            except ValueError as e:
+                raise ValueError(f"Decryptor của {class_name} trong {self.name}: {e}") from None
+            block = by_field.get(field)
+            if block is None:
+                if not class_blocks:
+                    continue
+                block = class_blocks[smali_parser.select_block(class_blocks)]
+            results.extend(callsites.decode_call_sites(block.values, sites))
+        return blocks, results
+
+    def _has_hit(self, hits, code_off):
+        insns_size = CODE_ITEM.unpack_from(self.data, code_off)[5]
+        start = code_off + CODE_ITEM.size
+        i = bisect_left(hits, start)
+        return i < len(hits) and hits[i] < start + 2 * insns_size
+
+
+def _member_order(name):
+    return int(DEX_MEMBER_RE.match(name).group(1) or 1)
+
+
+def load_dex_files(path):
+    """List DexFile của một file .dex, hoặc của classes.dex, classes2.dex... trong APK/zip"""
+    if path.lower().endswith(DEX_SUFFIXES):
+        with open(path, 'rb') as f:
+            return [DexFile(f.read(), os.path.basename(path))]
+    try:
+        with zipfile.ZipFile(path) as archive:
+            names = sorted((name for name in archive.namelist() if DEX_MEMBER_RE.match(name)),
+                           key=_member_order)
+            if not names:
+                raise ValueError(f"Không có classes*.dex trong file: {path}")
+            return [DexFile(archive.read(name), name, name) for name in names]
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Không đọc được file {path}: {e}")
+
+
+def scan(path, method_name='$', progress=None):
+    """(list ArrayBlock, list (CallSite, string)) của mọi file DEX trong path
+
+    method_name=None thì chỉ đọc block (list chuỗi rỗng).
+
+    progress(done, total) được gọi sau mỗi file DEX với số byte DEX đã xử lý.
+    """
+    with profiling.stage('dex.scan') as s:
+        dex_files = load_dex_files(path)
+        total = sum(len(dex_file.data) for dex_file in dex_files)
+        blocks = []
+        results = []
+        done = 0
+        for dex_file in dex_files:
+            try:
+                dex_blocks, dex_results = dex_file.scan(method_name)
+            except (IndexError, struct.error) as e:
+                raise ValueError(f"File DEX hỏng ({dex_file.name}): {e}")
+            blocks.extend(dex_blocks)
+            results.extend(dex_results)
+            done += len(dex_file.data)
+            if progress is not None:
+                progress(done, total)
+        s.add(bytes=total, blocks=len(blocks), elements=sum(map(len, blocks)), sites=len(results))
+    return blocks, results
+
+
+def load_array_blocks(path, progress=None):
+    """Mọi block array-data (nạp trong `<clinit>`) của file DEX/APK"""
+    return scan(path, None, progress)[0]
+
+
+def load_decryptor(path, field, method_name='$'):
+    """Decryptor của class sở hữu field (vd. 'Lcls;->$:[S') trong file DEX/APK
+
+    None nếu class không có decryptor hoặc decryptor là XOR thuần (xem DexFile.class_decryptor).
+    """
+    class_name = field.split('->', 1)[0]
+    for dex_file in load_dex_files(path):
+        try:
+            decryptor = dex_file.class_decryptor(class_name, method_name)
+        except (IndexError, struct.error) as e:
+            raise ValueError(f"File DEX hỏng ({dex_file.name}): {e}")
+        if decryptor is not None:
+            return decryptor
+    return None
+
+
+def resolve_file(path, method_name='$'):
+    """Giải mã mọi call site tới decryptor của chính class, cho mọi class trong file DEX/APK"""
+    return scan(path, method_name)[1]
@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+"""Array-data của một file smali kèm vị trí literal, để lưu lại chỉ những phần đã sửa."""
+
+import os
+import shutil
+from array import array
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from . import cache, callsites, engine, journal, profiling, relocation, smali_parser, writer
+
+
+class DirtyRanges:
+    """Tập các khoảng chỉ số [start, end) đã sửa, luôn được gộp và sắp xếp"""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def add(self, start, end):
+        """Thêm khoảng [start, end), gộp với các khoảng chồng lấn hoặc liền kề"""
+        if start >= end:
+            return
+        lo = bisect_left(self.ends, start)
+        hi = bisect_right(self.starts, end)
+        if lo < hi:
+            start = min(start, self.starts[lo])
+            end = max(end, self.ends[hi - 1])
+        self.starts[lo:hi] = [start]
+        self.ends[lo:hi] = [end]
+
+    def clear(self):
+        self.starts = []
+        self.ends = []
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __bool__(self):
+        return bool(self.starts)
+
+
+class SmaliDocument:
+    """Các block array-data của một file smali và offset từng literal trong file
+
+    Mỗi block giữ buffer đúng độ rộng của nó; values/offsets/lengths và các thao tác
+    không chỉ rõ block sẽ dùng block đang chọn (active).
+    """
+
+    def __init__(self, file_path, blocks, active=None):
+        self.file_path = file_path
+        self.blocks = blocks        # list ArrayBlock theo thứ tự trong file
+        self.dirty = [DirtyRanges() for _ in blocks]
+        self.active = smali_parser.select_block(blocks) if active is None else active
+        self.resized = set()        # block đã đổi số phần tử, khi lưu ghi lại cả block
+        self.call_index = None      # relocation.CallSiteIndex, tạo ở lần sửa đổi độ dài đầu tiên
+        self.call_block = None      # block mà decryptor đọc (call site trỏ vào block này)
+        self.size_slots = {}        # chỉ số block -> ConstSlot kích thước `new-array`
+        self.method_name = None
+        self.journal = journal.EditJournal()
+        self.journal_path = None    # ghi journal cạnh file mỗi lần save (None: không ghi)
+        self._stat = self._file_stat()
+
+    @classmethod
+    def load(cls, file_path, progress=None, keep_journal=False):
+        """Parse file smali, giữ riêng từng block `.array-data`
+
+        keep_journal=True: khôi phục lịch sử undo đã ghi cạnh file (nếu khớp với file hiện tại)
+        và ghi lại journal sau mỗi lần save.
+        """
+        try:
+            blocks = cache.load_blocks(file_path, 'smali', smali_parser.parse_array_blocks,
+                                      progress)
+        except OSError as e:
+            raise ValueError(f"Lỗi khi đọc file {file_path}: {e}")
+
+        if not any(blocks):
+            raise ValueError(f"Không tìm thấy array-data trong file: {file_path}")
+        smali_document = cls(file_path, blocks)
+        if keep_journal:
+            smali_document.enable_journal_file()
+        return smali_document
+
+    def enable_journal_file(self, enabled=True):
+        """Bật/tắt ghi journal cạnh file; khi bật, nạp journal cũ nếu nó khớp với file"""
+        if not enabled:
+            self.journal_path = None
+            return
+        self.journal_path = journal.journal_path(self.file_path)
+        if not self.journal and not self.modified:
+            restored = journal.EditJournal.read(self.journal_path, self._stat)
+            if restored is not None:
+                self.journal = restored
+
+    def __len__(self):
+        return len(self.block)
+
+    @property
+    def block(self):
+        """Block đang chọn"""
+        return self.blocks[self.active]
+
+    @property
+    def values(self):
+        return self.block.values
+
+    @property
+    def offsets(self):
+        return self.block.offsets
+
+    @property
+    def lengths(self):
+        return self.block.lengths
+
+    @property
+    def width(self):
+        return self.block.width
+
+    @property
+    def modified(self):
+        return any(self.dirty) or bool(self.resized)
+
+    def block_index(self, block=None):
+        """Chỉ số block: None => block đang chọn, int => giữ nguyên, str => tìm theo label/field"""
+        if block is None:
+            return self.active
+        if isinstance(block, int):
+            if not 0 <= block < len(self.blocks):
+                raise ValueError(f"Không có block array-data số {block}")
+            return block
+        return smali_parser.select_block(self.blocks, block)
+
+    def select(self, block):
+        """Chọn block làm việc theo chỉ số, label hoặc field"""
+        self.active = self.block_index(block)
+        return self.block
+
+    def mark_dirty(self, start_index, end_index, block=None):
+        """Đánh dấu range [start_index, end_index) của block cần ghi lại"""
+        index = self.block_index(block)
+        self.dirty[index].add(max(0, start_index), min(end_index, len(self.blocks[index])))
+
+    def apply_range_edit(self, start_index, text, xor_key, block=None):
+        """Ghi đè range của block bằng chuỗi đã mã hoá, trả về số giá trị đã ghi"""
+        index = self.block_index(block)
+        target = self.blocks[index]
+        xor_values = engine.encode_string(text, xor_key, target.width)
+        written = max(0, min(len(xor_values), len(target) - start_index))
+        self._write_values(index, start_index, start_index + written, xor_values[:written])
+        return written
+
+    def load_relocations(self, method_name='$'):
+        """Quét file một lần để có call site và hằng số kích thước cần relocate khi đổi độ dài"""
+        if self.call_index is not None and method_name == self.method_name:
+            return self.call_index
+        if self.resized:
+            raise ValueError("Hãy lưu thay đổi trước khi đổi method decryptor")
+        with profiling.stage('callsites') as s:
+            entries, size_slots = relocation.scan_file(self.file_path, method_name)
+            s.add(sites=len(entries))
+        self.call_index = relocation.CallSiteIndex(entries)
+        self.call_block = callsites.decryptor_block_index(self.file_path, self.blocks, method_name)
+        self.size_slots = {i: size_slots[block.data_start] for i, block in enumerate(self.blocks)
+                           if block.data_start in size_slots}
+        self.method_name = method_name
+        return self.call_index
+
+    def replace_range(self, start_index, end_index, text, xor_key, block=None, method_name='$'):
+        """Thay range [start_index, end_index) của block bằng chuỗi đã mã hoá, trả về số giá trị mới
+
+        Chuỗi có thể dài/ngắn hơn range cũ: khi đó hằng số kích thước của `new-array` và
+        start/end của các call site bị ảnh hưởng được relocate, ghi vào file khi save().
+        """
+        index = self.block_index(block)
+        target = self.blocks[index]
+        if not 0 <= start_index <= end_index <= len(target):
+            raise ValueError(f"Range {start_index}-{end_index} nằm ngoài array-data "
+                             f"({len(target)} phần tử)")
+        xor_values = engine.encode_string(text, xor_key, target.width)
+        self._write_values(index, start_index, end_index, xor_values, method_name)
+        return len(xor_values)
+
+    def call_sites(self):
+        """Call site của decryptor với start/end hiện tại (đã relocate), None nếu chưa quét"""
+        return None if self.call_index is None else self.call_index.current()
+
+    def replace_values(self, new_values, block=None):
+        """Thay toàn bộ giá trị của block, chỉ đánh dấu những phần tử thực sự khác"""
+        index = self.block_index(block)
+        values = self.blocks[index].values
+        if len(new_values) != len(values):
+            raise ValueError("Số lượng array-data không khớp với file")
+        new_values = array(values.typecode, new_values)
+        changed = np.flatnonzero(np.frombuffer(new_values, dtype=values.typecode)
+                                 != np.frombuffer(values, dtype=values.typecode))
+        if changed.size:
+            # Gộp các chỉ số liên tiếp thành range, cả lần thay là một bước undo
+            breaks = np.flatnonzero(np.diff(changed) != 1) + 1
+            with self.journal.group():
+                for run in np.split(changed, breaks):
+                    start, end = int(run[0]), int(run[-1]) + 1
+                    self._write_values(index, start, end, new_values[start:end])
+
+    def undo(self):
+        """Hoàn tác bước sửa gần nhất, trả về list (block, start, end) đã đổi (None nếu hết)"""
+        entries = self.journal.undo()
+        if entries is None:
+            return None
+        return [self._write_values(entry.block, entry.start, entry.start + len(entry.new),
+                                   entry.old, record=False) for entry in entries]
+
+    def redo(self):
+        """Làm lại bước vừa hoàn tác, trả về list (block, start, end) đã đổi (None nếu hết)"""
+        entries = self.journal.redo()
+        if entries is None:
+            return None
+        return [self._write_values(entry.block, entry.start, entry.start + len(entry.old),
+                                   entry.new, record=False) for entry in entries]
+
+    def _write_values(self, index, start_index, end_index, new_values, method_name=None,
+                      record=True):
+        """Thay range [start_index, end_index) của block bằng new_values, ghi vào journal
+
+        Số giá trị khác range cũ thì relocate kích thước new-array và call site.
+        Trả về (block, start, end) của phần vừa ghi.
+        """
+        target = self.blocks[index]
+        count = len(new_values)
+        resize = count != end_index - start_index
+        if resize:
+            call_index = self.load_relocations(method_name or self.method_name or '$')
+            size_slot = self.size_slots.get(index)
+            if size_slot is None:
+                raise ValueError(f"Không tìm thấy lệnh const kích thước new-array cho block "
+                                 f"{target.label or index}, không thể đổi độ dài")
+        if record:
+            self.journal.record(index, target.width, start_index,
+                                target.values[start_index:end_index], new_values)
+        if not resize:
+            target.values[start_index:end_index] = new_values
+            self.mark_dirty(start_index, end_index, index)
+            return index, start_index, end_index
+
+        with profiling.stage('relocate') as s:
+            target.values[start_index:end_index] = new_values
+            # Block đổi độ dài được ghi lại toàn bộ khi lưu, offset cũ không còn dùng
+            target.offsets[start_index:end_index] = array('q', [-1]) * count
+            target.lengths[start_index:end_index] = array('I', [0]) * count
+            size_slot.value = len(target)
+            self.resized.add(index)
+            if index == self.call_block:
+                s.add(sites=call_index.relocate(start_index, end_index, count))
+        return index, start_index, start_index + count
+
+    def save(self, backup=True, progress=None):
+        """Ghi các range đã sửa (mọi block) vào file, trả về đường dẫn backup (nếu có)"""
+        if self._file_stat() != self._stat:
+            raise ValueError(f"File {self.file_path} đã bị thay đổi từ bên ngoài, hãy extract lại")
+
+        backup_file = None
+        if backup:
+            backup_file = self.file_path + '.backup'
+            with profiling.stage('backup', bytes=self._stat[0]):
+                shutil.copyfile(self.file_path, backup_file)
+        if not self.modified:
+            return backup_file
+
+        # Block nằm theo thứ tự trong file nên patch literal đã được sắp theo offset
+        positions = []
+        patches = []
+        bodies = {}         # chỉ số block -> (offset tương đối, độ dài) literal sau khi ghi lại
+        line_shifts = []    # (dòng `.array-data`, số dòng thêm/bớt)
+        with profiling.stage('format') as s:
+            for index, (block, dirty) in enumerate(zip(self.blocks, self.dirty)):
+                if index in self.resized:
+                    patch, bodies[index], line_delta = self._format_block(block)
+                    positions.append(None)
+                    patches.append(patch)
+                    line_shifts.append((block.line, line_delta))
+                    continue
+                for start, end in dirty:
+                    for i in range(start, end):
+                        positions.append((index, i))
+                        patches.append((block.offsets[i], block.lengths[i],
+                                        smali_parser.format_literal(block.values[i], block.width)))
+            slots = self._relocated_slots()
+            for slot in slots:
+                positions.append(None)
+                patches.append((slot.offset, slot.length, slot.format()))
+            s.add(elements=len(patches))
+        if slots:
+            order = sorted(range(len(patches)), key=lambda p: patches[p][0])
+            positions = [positions[p] for p in order]
+            patches = [patches[p] for p in order]
+        with profiling.stage('write', bytes=self._stat[0], patches=len(patches)):
+            writer.splice_file(self.file_path, patches, progress)
+        self._shift_offsets(positions, patches, bodies, line_shifts)
+        for dirty in self.dirty:
+            dirty.clear()
+        self.resized.clear()
+        self._stat = self._file_stat()
+        if self.journal_path is not None:
+            self.journal.write(self.journal_path, self._stat)
+        return backup_file
+
+    def _relocated_slots(self):
+        """Các lệnh const (kích thước new-array, start/end call site) cần ghi lại"""
+        if not self.resized:
+            return []
+        slots = [self.size_slots[index] for index in sorted(self.resized)]
+        if self.call_index is not None:
+            slots.extend(slot for slot in self.call_index.assign_slots()
+                         if all(slot is not other for other in slots))
+        return [slot for slot in slots if slot.modified]
+
+    def _format_block(self, block):
+        """Patch ghi lại toàn bộ literal của block, mỗi literal một dòng (giữ indent, kiểu xuống dòng)
+
+        Trả về (patch, (offset tương đối, độ dài) từng literal, số dòng thêm/bớt).
+        """
+        with open(self.file_path, 'rb') as f:
+            f.seek(block.data_start)
+            old = f.read(block.data_end - block.data_start)
+        old_lines = old.splitlines(keepends=True)
+        sample = next((line for line in old_lines if line.strip()), b'        0x0\n')
+        indent = sample[:len(sample) - len(sample.lstrip())]
+        newline = b'\r\n' if sample.endswith(b'\r\n') else b'\n'
+
+        literals = [smali_parser.format_literal(value, block.width) for value in block.values]
+        offsets = array('q')
+        lengths = array('I', map(len, literals))
+        position = len(indent)
+        for literal in literals:
+            offsets.append(position)
+            position += len(indent) + len(literal) + len(newline)
+        body = b''.join(indent + literal + newline for literal in literals)
+        return (block.data_start, len(old), body), (offsets, lengths), len(literals) - len(old_lines)
+
+    def _shift_offsets(self, positions, patches, bodies, line_shifts):
+        """Cập nhật offset/độ dài (literal, block, lệnh const) theo các patch vừa ghi"""
+        starts = np.fromiter((patch[0] for patch in patches), dtype=np.int64, count=len(patches))
+        deltas = np.zeros(len(patches) + 1, dtype=np.int64)
+        np.cumsum([len(new_bytes) - length for _, length, new_bytes in patches], out=deltas[1:])
+
+        def shift(offset, side='left'):
+            # Patch tại đúng offset là của chính phần tử đó nên không tính (side='left')
+            return offset + int(deltas[np.searchsorted(starts, offset, side)])
+
+        line_starts = [line for line, _ in line_shifts]
+        line_deltas = [0]
+        for _, delta in line_shifts:
+            line_deltas.append(line_deltas[-1] + delta)
+
+        def shift_line(line):
+            return line + line_deltas[bisect_left(line_starts, line)]
+
+        for position, (_, _, new_bytes) in zip(positions, patches):
+            if position is not None:
+                self.blocks[position[0]].lengths[position[1]] = len(new_bytes)
+        for index, block in enumerate(self.blocks):
+            block.line = shift_line(block.line)
+            if index in bodies:
+                data_start = shift(block.data_start)
+                offsets, block.lengths = bodies[index]
+                local = np.frombuffer(offsets, dtype=np.int64)
+                local += data_start
+                del local
+                block.offsets = offsets
+            elif patches:
+                offsets = np.frombuffer(block.offsets, dtype=np.int64)
+                offsets += deltas[np.searchsorted(starts, offsets, 'left')]
+                del offsets
+            if block.data_end is not None:
+                block.data_end = shift(block.data_end, 'right')
+            block.data_start = shift(block.data_start)
+
+        slots = list(self.size_slots.values())
+        if self.call_index is not None:
+            slots.extend(self.call_index.slots())
+        for slot in {id(slot): slot for slot in slots}.values():
+            if slot.modified:
+                slot.mark_saved()
+            slot.offset = shift(slot.offset)
+        if self.call_index is not None:
+            self.call_index.commit(shift_line if line_shifts else None)
+
+    def _file_stat(self):
+        """(size, mtime) của file để phát hiện thay đổi từ bên ngoài"""
+        st = os.stat(self.file_path)
+        return st.st_size, st.st_mtime_ns
@@ -0,0 +1,556 @@
+# -*- coding: utf-8 -*-
+"""Dịch thân method decryptor (tập lệnh số học int của smali) thành kernel NumPy.
+
+Các bản obfuscator khác nhau thay `xor-int/2addr v2, p2` bằng add/sub, key quay vòng, key
+phụ thuộc chỉ số (`key + i`) hay đọc array byte. Thân vòng lặp được thực thi ký hiệu một
+lần với chỉ số vòng lặp là cả một vector, cho ra biểu thức độ dài chuỗi, giá trị và vị trí
+của từng ký tự; mọi call site được giải mã bằng một lần tính các biểu thức đó trên NumPy.
+"""
+
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from . import callsites, profiling
+
+# Một lệnh đã chuẩn hoá (từ smali hoặc bytecode DEX): tên opcode smali, thanh ghi (vN),
+# hằng số, tham chiếu (field/type/method) và đích nhảy (label hoặc địa chỉ)
+Instruction = namedtuple('Instruction', 'op regs literal ref target')
+
+BINARY_RE = re.compile(r'^(add|sub|mul|div|rem|and|or|xor|shl|shr|ushr|rsub)-int'
+                       r'(?:/(2addr|lit8|lit16))?$')
+UNARY_OPS = frozenset(('neg-int', 'not-int', 'int-to-char', 'int-to-byte', 'int-to-short'))
+CONST_OPS = frozenset(('const', 'const/4', 'const/16', 'const/high16'))
+MOVE_OPS = frozenset(('move', 'move/from16', 'move/16', 'move-object', 'move-object/from16',
+                      'move-object/16'))
+# Kiểu phần tử của aget (hậu tố opcode) được emulator đọc
+AGET_KINDS = {'aget': 'int', 'aget-short': 'short', 'aget-char': 'char', 'aget-byte': 'byte',
+              'aget-boolean': 'boolean'}
+LITERAL_RE = re.compile(r'^-?(?:0x[0-9a-fA-F]+|\d+)[stL]?$')
+# Các chỉ thị smali có khối riêng trong method (bỏ qua tới dòng `.end ...`)
+BLOCK_DIRECTIVES = ('.annotation', '.array-data', '.packed-switch', '.sparse-switch')
+
+# Biểu thức là tuple, phần tử đầu là loại nút
+INDEX = ('index',)                               # chỉ số vòng lặp (0, 1, 2, ...)
+START, END, KEY = ('param', 0), ('param', 1), ('param', 2)
+PARAM_NAMES = ('start', 'end', 'key')
+
+
+class UnsupportedDecryptor(ValueError):
+    """Thân decryptor có lệnh hoặc luồng điều khiển mà emulator chưa dịch được"""
+
+
+def _wrap(value):
+    """Giữ 32 bit thấp, có dấu (tràn số int như Java)"""
+    return np.asarray(value, dtype=np.int64).astype(np.int32).astype(np.int64)
+
+
+def _java_div(a, b):
+    if np.any(b == 0):
+        raise ValueError("Decryptor chia cho 0")
+    # Java chia làm tròn về 0, NumPy làm tròn xuống
+    return np.where((a < 0) != (b < 0), -(np.abs(a) // np.abs(b)), np.abs(a) // np.abs(b))
+
+
+BINARY_FUNCTIONS = {
+    'add': lambda a, b: _wrap(a + b),
+    'sub': lambda a, b: _wrap(a - b),
+    'rsub': lambda a, b: _wrap(b - a),
+    'mul': lambda a, b: _wrap(a * b),
+    'div': lambda a, b: _wrap(_java_div(a, b)),
+    'rem': lambda a, b: _wrap(a - b * _java_div(a, b)),
+    'and': lambda a, b: a & b,
+    'or': lambda a, b: a | b,
+    'xor': lambda a, b: a ^ b,
+    'shl': lambda a, b: _wrap(a << (b & 31)),
+    'shr': lambda a, b: a >> (b & 31),
+    'ushr': lambda a, b: _wrap((a & 0xFFFFFFFF) >> (b & 31)),
+}
+UNARY_FUNCTIONS = {
+    'neg-int': lambda a: _wrap(-a),
+    'not-int': lambda a: ~a,
+    'int-to-char': lambda a: a & 0xFFFF,
+    'int-to-byte': lambda a: ((a + 0x80) & 0xFF) - 0x80,
+    'int-to-short': lambda a: ((a + 0x8000) & 0xFFFF) - 0x8000,
+}
+ELEMENT_FUNCTIONS = {
+    'int': _wrap,
+    'short': UNARY_FUNCTIONS['int-to-short'],
+    'char': UNARY_FUNCTIONS['int-to-char'],
+    'byte': UNARY_FUNCTIONS['int-to-byte'],
+    'boolean': lambda a: (a != 0).astype(np.int64),
+}
+# Phép toán mà toán hạng đổi chỗ được (để nhận ra XOR thuần viết theo thứ tự nào cũng vậy)
+COMMUTATIVE = frozenset(('add', 'mul', 'and', 'or', 'xor'))
+
+
+def _const(value):
+    return ('const', (int(value) + 0x80000000) % 0x100000000 - 0x80000000)
+
+
+def _binary(name, a, b):
+    """Nút phép toán hai ngôi, gộp sẵn hằng số và phần tử trung hoà (x + 0, x * 1, x ^ 0...)"""
+    if a[0] == 'const' and b[0] == 'const':
+        return _const(BINARY_FUNCTIONS[name](np.int64(a[1]), np.int64(b[1])))
+    if b == ('const', 0) and name in ('add', 'sub', 'or', 'xor', 'shl', 'shr', 'ushr'):
+        return a
+    if a == ('const', 0) and name in ('add', 'or', 'xor'):
+        return b
+    if name == 'mul' and ('const', 1) in (a, b):
+        return b if a == ('const', 1) else a
+    return ('binary', name, a, b)
+
+
+def _unary(name, a):
+    if a[0] == 'const':
+        return _const(UNARY_FUNCTIONS[name](np.int64(a[1])))
+    return ('unary', name, a)
+
+
+def _walk(expr):
+    yield expr
+    for child in expr[1:]:
+        if isinstance(child, tuple):
+            yield from _walk(child)
+
+
+def format_expression(expr):
+    """Biểu thức dạng đọc được, ví dụ 'char(a[start + i] ^ key)'"""
+    tag = expr[0]
+    if tag == 'const':
+        return hex(expr[1]) if abs(expr[1]) > 9 else str(expr[1])
+    if tag == 'param':
+        return PARAM_NAMES[expr[1]]
+    if tag == 'index':
+        return 'i'
+    if tag == 'array':
+        return expr[1]
+    if tag == 'length':
+        return f'len({format_expression(expr[1])})'
+    if tag == 'element':
+        kind = '' if expr[1] == 'int' else f'({expr[1]})'
+        return f'{kind}{format_expression(expr[2])}[{format_expression(expr[3])}]'
+    if tag == 'unary':
+        a = format_expression(expr[2])
+        return {'neg-int': f'-({a})', 'not-int': f'~({a})'}.get(expr[1], f'{expr[1][7:]}({a})')
+    if tag == 'binary':
+        symbol = {'add': '+', 'sub': '-', 'rsub': '-', 'mul': '*', 'div': '/', 'rem': '%',
+                  'and': '&', 'or': '|', 'xor': '^', 'shl': '<<', 'shr': '>>',
+                  'ushr': '>>>'}[expr[1]]
+        a, b = format_expression(expr[2]), format_expression(expr[3])
+        if expr[1] == 'rsub':
+            a, b = b, a
+        elif expr[1] == 'add' and expr[3][0] == 'const' and expr[3][1] < 0:
+            symbol, b = '-', format_expression(_const(-expr[3][1]))
+        return f'({a} {symbol} {b})'
+    return f'<{expr[1]}>'
+
+
+def _writes(instruction):
+    """Các thanh ghi lệnh ghi vào (theo tên opcode, như callsites.iter_call_sites)"""
+    op = instruction.op
+    if not instruction.regs or op.startswith(callsites.NON_WRITING_PREFIXES) or \
+            op.startswith(('if-', 'goto', 'check-cast', 'fill-array-data')):
+        return ()
+    dest = instruction.regs[0]
+    wide = '-wide' in op or (not op.startswith('cmp') and
+                             re.search(r'-(long|double)(?:/|$)', op) is not None)
+    return (dest, dest + 1) if wide else (dest,)
+
+
+class Decryptor:
+    """Decryptor đã dịch: chuỗi dài `length`, ký tự thứ `position` là `value` (theo i)
+
+    Các biểu thức chỉ dùng tham số start/end/key của call site, chỉ số vòng lặp i và các
+    array static (field) mà decryptor đọc.
+    """
+
+    def __init__(self, length, value, position):
+        self.length = length
+        self.value = value
+        self.position = position
+        self.fields = sorted({node[1] for expr in (length, value, position)
+                              for node in _walk(expr) if node[0] == 'array'})
+        self.xor_field = self._plain_xor_field()
+
+    def __repr__(self):
+        return (f"Decryptor(length={format_expression(self.length)}, "
+                f"out[{format_expression(self.position)}] = {format_expression(self.value)})")
+
+    def _plain_xor_field(self):
+        """Field nếu decryptor đúng là `char(a[start + i] ^ key)` với độ dài end - start"""
+        if self.position != INDEX or self.length != _binary('sub', END, START):
+            return None
+        value = self.value
+        if value[0] == 'unary' and value[1] == 'int-to-char':
+            value = value[2]
+        if value[0] != 'binary' or value[1] != 'xor':
+            return None
+        for element, key in ((value[2], value[3]), (value[3], value[2])):
+            if key == KEY and element[0] == 'element' and element[1] != 'boolean' and \
+                    element[3] in (('binary', 'add', START, INDEX), ('binary', 'add', INDEX, START)):
+                return element[2][1]
+        return None
+
+    def decode_ranges(self, arrays, ranges):
+        """Giải mã nhiều bộ (start, end, key) trong một lần tính, trả về list str
+
+        arrays là dict field -> array-data (xem field_arrays).
+        """
+        ranges = list(ranges)
+        if not ranges:
+            return []
+        with profiling.stage('emulate', ranges=len(ranges)) as s:
+            data = {}
+            for field in self.fields:
+                if field not in arrays:
+                    raise ValueError(f"Không tìm thấy array-data của field {field}")
+                data[field] = _as_int64(arrays[field])
+            params = tuple(_wrap([r[i] for r in ranges]) for i in range(3))
+            lengths = np.broadcast_to(_evaluate(self.length, params, None, data),
+                                      (len(ranges),))
+            if np.any(lengths < 0):
+                raise ValueError("Decryptor tạo chuỗi có độ dài âm")
+            offsets = np.concatenate(([0], np.cumsum(lengths)))
+            total = int(offsets[-1])
+            s.add(elements=total)
+            segment = np.repeat(np.arange(len(ranges)), lengths)
+            index = np.arange(total, dtype=np.int64) - offsets[:-1][segment]
+            params = tuple(param[segment] for param in params)
+            values = np.broadcast_to(_evaluate(self.value, params, index, data), (total,))
+            positions = np.broadcast_to(_evaluate(self.position, params, index, data), (total,))
+            if np.any((positions < 0) | (positions >= lengths[segment])):
+                raise ValueError("Decryptor ghi ký tự ra ngoài chuỗi")
+            units = np.zeros(total, dtype='<u2')
+            units[offsets[:-1][segment] + positions] = values & 0xFFFF
+            decoded = units.tobytes()
+        return [decoded[2 * offsets[i]:2 * offsets[i + 1]].decode('utf-16-le', 'surrogatepass')
+                for i in range(len(ranges))]
+
+    def decode_call_sites(self, arrays, call_sites):
+        """Giải mã từng call site, trả về list (CallSite, string)"""
+        call_sites = list(call_sites)
+        results = self.decode_ranges(arrays, [(site.start, site.end, site.key)
+                                              for site in call_sites])
+        return list(zip(call_sites, results))
+
+
+def _as_int64(array_data):
+    if isinstance(array_data, memoryview):
+        return np.frombuffer(array_data, dtype=array_data.format).astype(np.int64)
+    if isinstance(array_data, np.ndarray):
+        return array_data.astype(np.int64)
+    typecode = getattr(array_data, 'typecode', None)
+    if typecode is not None:
+        return np.frombuffer(array_data, dtype=typecode).astype(np.int64)
+    return np.asarray(array_data, dtype=np.int64)
+
+
+def _evaluate(expr, params, index, data):
+    """Tính biểu thức trên vector (int64 chứa giá trị int 32 bit như Java)"""
+    tag = expr[0]
+    if tag == 'const':
+        return np.int64(expr[1])
+    if tag == 'param':
+        return params[expr[1]]
+    if tag == 'index':
+        return index
+    if tag == 'length':
+        return np.int64(len(data[expr[1][1]]))
+    if tag == 'element':
+        values = data[expr[2][1]]
+        positions = _evaluate(expr[3], params, index, data)
+        if np.any((positions < 0) | (positions >= len(values))):
+            raise ValueError(f"Chỉ số ngoài array {expr[2][1]}")
+        return ELEMENT_FUNCTIONS[expr[1]](values[positions])
+    if tag == 'unary':
+        return UNARY_FUNCTIONS[expr[1]](_evaluate(expr[2], params, index, data))
+    if tag == 'binary':
+        return BINARY_FUNCTIONS[expr[1]](_evaluate(expr[2], params, index, data),
+                                         _evaluate(expr[3], params, index, data))
+    raise UnsupportedDecryptor(f"Không tính được biểu thức: {format_expression(expr)}")
+
+
+def field_arrays(blocks, values=None):
+    """dict field -> array-data của các block có field sở hữu
+
+    values (list cùng thứ tự blocks) thay cho block.values, ví dụ bản đang sửa trong GUI.
+    """
+    if values is None:
+        values = [block.values for block in blocks]
+    return {block.field: data for block, data in zip(blocks, values) if block.field}
+
+
+class _Machine:
+    """Thực thi ký hiệu: mỗi thanh ghi giữ một biểu thức"""
+
+    def __init__(self, registers):
+        self.registers = registers
+        self.stores = []          # (mảng đích, vị trí, giá trị) của các lệnh aput-char
+        self.guard = None         # hàm kiểm tra trước khi đọc một thanh ghi
+
+    def read(self, reg):
+        if self.guard is not None:
+            self.guard(reg)
+        value = self.registers.get(reg)
+        if value is None:
+            raise UnsupportedDecryptor(f"Thanh ghi v{reg} chưa có giá trị")
+        return value
+
+    def execute(self, ins):
+        op = ins.op
+        regs = ins.regs
+        registers = self.registers
+        if op in CONST_OPS:
+            registers[regs[0]] = _const(ins.literal)
+        elif op in MOVE_OPS:
+            registers[regs[0]] = self.read(regs[1])
+        elif op == 'sget-object':
+            registers[regs[0]] = ('array', ins.ref)
+        elif op == 'new-array':
+            registers[regs[0]] = ('new-array', self.read(regs[1]), ins.ref)
+        elif op == 'array-length':
+            array_ref = self.read(regs[1])
+            # Độ dài của mảng char kết quả là biểu thức kích thước của new-array
+            registers[regs[0]] = array_ref[1] if array_ref[0] == 'new-array' else \
+                ('length', self._array(regs[1]))
+        elif op in AGET_KINDS:
+            registers[regs[0]] = ('element', AGET_KINDS[op], self._array(regs[1]),
+                                  self.read(regs[2]))
+        elif op == 'aput-char':
+            target = self.read(regs[1])
+            if target[0] == 'new-array':
+                self.stores.append((target, self.read(regs[2]), self.read(regs[0])))
+        elif op in UNARY_OPS:
+            registers[regs[0]] = _unary(op, self.read(regs[1]))
+        elif op == 'nop' or op.startswith('check-cast'):
+            pass
+        else:
+            m = BINARY_RE.match(op)
+            if m:
+                name, form = m.groups()
+                if form == '2addr':
+                    a, b = self.read(regs[0]), self.read(regs[1])
+                elif form or name == 'rsub':
+                    a, b = self.read(regs[1]), _const(ins.literal)
+                else:
+                    a, b = self.read(regs[1]), self.read(regs[2])
+                registers[regs[0]] = _binary(name, a, b)
+                return
+            # Lệnh khác: thanh ghi đích không còn là biểu thức tính được
+            for reg in _writes(ins):
+                registers[reg] = ('unknown', op)
+
+    def _array(self, reg):
+        array_ref = self.read(reg)
+        if array_ref[0] != 'array':
+            raise UnsupportedDecryptor("Decryptor đọc array không phải field static")
+        return array_ref
+
+
+def _step_of(ins, reg, registers, written):
+    """Bước tăng nếu lệnh là `reg += hằng số` (biến đếm của vòng lặp), None nếu không"""
+    op, regs = ins.op, ins.regs
+    if op in ('add-int/lit8', 'add-int/lit16') and regs[:2] == (reg, reg):
+        return ins.literal
+    if op in ('add-int/2addr', 'sub-int/2addr') and regs[0] == reg and regs[1] not in written:
+        other = registers.get(regs[1])
+        if other is not None and other[0] == 'const':
+            return other[1] if op == 'add-int/2addr' else -other[1]
+    if op in ('add-int', 'sub-int') and regs[0] == reg and reg in regs[1:]:
+        other_reg = regs[2] if regs[1] == reg else regs[1]
+        other = registers.get(other_reg)
+        if other_reg not in written and other is not None and other[0] == 'const' and \
+                (op == 'add-int' or regs[1] == reg):
+            return other[1] if op == 'add-int' else -other[1]
+    return None
+
+
+def compile_method(instructions, labels, param_base):
+    """Decryptor từ thân method đã chuẩn hoá
+
+    labels là dict đích nhảy -> chỉ số lệnh, param_base là thanh ghi của tham số start
+    (start, end, key là ba thanh ghi liên tiếp). Raise UnsupportedDecryptor nếu thân method
+    có lệnh hoặc luồng điều khiển chưa hỗ trợ (nhiều vòng lặp, rẽ nhánh trong vòng lặp,
+    biến phụ thuộc lần lặp trước ngoài biến đếm...).
+    """
+    if any(ins.op.endswith('-switch') for ins in instructions):
+        raise UnsupportedDecryptor("Decryptor có lệnh switch")
+    back_edges = [(labels[ins.target], i) for i, ins in enumerate(instructions)
+                  if ins.target is not None and ins.target in labels and labels[ins.target] <= i]
+    if not back_edges:
+        raise UnsupportedDecryptor("Decryptor không có vòng lặp")
+    if len(back_edges) > 1:
+        raise UnsupportedDecryptor("Decryptor có nhiều vòng lặp")
+    head, tail = back_edges[0]
+
+    machine = _Machine({param_base: START, param_base + 1: END, param_base + 2: KEY})
+    for ins in instructions[:head]:
+        if ins.target is not None:
+            # goto vào phần kiểm tra điều kiện ở cuối vòng lặp thì không ảnh hưởng giá trị
+            if ins.op.startswith('goto') and head <= labels.get(ins.target, -1) <= tail:
+                continue
+            raise UnsupportedDecryptor("Decryptor rẽ nhánh trước vòng lặp")
+        machine.execute(ins)
+
+    body = instructions[head:tail + 1]
+    for ins in body:
+        # Nhảy ra khỏi vòng lặp là điều kiện dừng (số lần lặp lấy theo độ dài chuỗi)
+        if ins.target is not None and head < labels.get(ins.target, -1) <= tail:
+            raise UnsupportedDecryptor("Decryptor rẽ nhánh trong thân vòng lặp")
+    written = {}
+    for ins in body:
+        if ins.target is None:
+            for reg in _writes(ins):
+                written.setdefault(reg, []).append(ins)
+    # Biến đếm: chỉ được ghi một lần trong vòng lặp, bằng `reg += hằng số`
+    registers = machine.registers
+    for reg, writers in written.items():
+        step = _step_of(writers[0], reg, registers, written) if len(writers) == 1 else None
+        if step is not None and reg in registers:
+            registers[reg] = _binary('add', registers[reg], _binary('mul', _const(step), INDEX))
+            written[reg] = None
+
+    assigned = set()
+
+    def guard(reg):
+        if written.get(reg) is not None and reg not in assigned:
+            raise UnsupportedDecryptor(f"Thanh ghi v{reg} phụ thuộc lần lặp trước")
+
+    machine.guard = guard
+    for ins in body:
+        if ins.target is not None:
+            continue
+        machine.execute(ins)
+        assigned.update(_writes(ins))
+
+    if len(machine.stores) != 1:
+        raise UnsupportedDecryptor("Decryptor phải ghi đúng một aput-char mỗi lần lặp")
+    target, position, value = machine.stores[0]
+    length = target[1]
+    for expr, name in ((length, "độ dài"), (position, "vị trí"), (value, "giá trị")):
+        for node in _walk(expr):
+            if node[0] in ('unknown', 'new-array'):
+                raise UnsupportedDecryptor(f"{name} của ký tự phụ thuộc lệnh chưa hỗ trợ: "
+                                           f"{node[1] if node[0] == 'unknown' else 'new-array'}")
+            if node == INDEX and expr is length:
+                raise UnsupportedDecryptor("Độ dài chuỗi thay đổi theo vòng lặp")
+    return Decryptor(length, value, position)
+
+
+def _parse_instruction(line, locals_count):
+    op, _, operands = line.partition(' ')
+    regs = []
+    literal = ref = target = None
+    if '{' in operands:
+        inside, _, rest = operands.partition('}')
+        regs = callsites.parse_invoke_registers(inside.lstrip('{'), locals_count)
+        ref = rest.lstrip(', ').strip() or None
+    else:
+        for part in operands.split(','):
+            part = part.strip()
+            m = callsites.REGISTER_RE.fullmatch(part)
+            if m:
+                regs.append(callsites._register_index(m.group(1), int(m.group(2)), locals_count))
+            elif part.startswith(':'):
+                target = part
+            elif LITERAL_RE.match(part):
+                literal = int(part.rstrip('stL'), 0)
+            elif part:
+                ref = part
+    return Instruction(op, tuple(regs), literal, ref, target)
+
+
+def read_smali_method(lines, method_name='$', descriptor=None):
+    """(list Instruction, dict label -> chỉ số lệnh, thanh ghi tham số start) của method
+
+    descriptor mặc định là DECRYPTOR_DESCRIPTOR. Trả về None nếu không có method đó.
+    """
+    descriptor = descriptor or callsites.DECRYPTOR_DESCRIPTOR
+    method = None
+    block_end = None
+    for raw in lines:
+        line = raw.strip()
+        if method is None:
+            if line.startswith('.method'):
+                m = callsites.METHOD_RE.match(line)
+                if m and m.group(2) == method_name and \
+                        '(' + m.group(3) + ')' + m.group(4) == descriptor:
+                    is_static = ' static ' in ' ' + m.group(1)
+                    param_regs = callsites.count_param_registers(m.group(3), is_static)
+                    method = ([], {})
+                    locals_count = 0
+            continue
+        if not line or line[0] == '#':
+            continue
+        if block_end is not None:
+            if line.startswith(block_end):
+                block_end = None
+            continue
+        if line[0] == '.':
+            if line.startswith('.end method'):
+                # Ba tham số int là ba thanh ghi cuối cùng
+                return method[0], method[1], locals_count + param_regs - 3
+            if line.startswith(BLOCK_DIRECTIVES):
+                block_end = '.end ' + line[1:].split()[0]
+                continue
+            m = callsites.REGISTERS_RE.match(line)
+            if m:
+                n = int(m.group(2))
+                locals_count = n if m.group(1) == 'locals' else n - param_regs
+            continue
+        if line[0] == ':':
+            method[1][line] = len(method[0])
+            continue
+        method[0].append(_parse_instruction(line, locals_count))
+    return None
+
+
+def find_smali_method(buffer, method_name='$', descriptor=None):
+    """Như read_smali_method nhưng trên bytes/mmap của cả file
+
+    Khai báo method được tìm bằng bytes.find, chỉ các dòng tới `.end method` của nó được
+    decode, nên bộ nhớ không tăng theo kích thước file.
+    """
+    descriptor = descriptor or callsites.DECRYPTOR_DESCRIPTOR
+    needle = f' {method_name}{descriptor}'.encode('utf-8')
+    position = 0
+    while True:
+        found = buffer.find(needle, position)
+        if found < 0:
+            return None
+        start = buffer.rfind(b'\n', 0, found) + 1
+        end = buffer.find(b'.end method', found)
+        end = len(buffer) if end < 0 else end + len(b'.end method')
+        method = read_smali_method(buffer[start:end].decode('utf-8').splitlines(), method_name,
+                                   descriptor)
+        if method is not None:
+            return method
+        # Chuỗi khớp không nằm trên dòng khai báo method (vd. trong comment): tìm tiếp
+        position = found + len(needle)
+
+
+def kernel(method):
+    """Decryptor từ method (kết quả read_smali_method / DexFile.method_instructions) nếu cần kernel
+
+    None nếu không có method hoặc method là XOR thuần (engine XOR giải mã y hệt và nhanh
+    hơn). Raise UnsupportedDecryptor nếu thân method có lệnh chưa dịch được: giải mã XOR
+    khi đó sẽ cho chuỗi sai.
+    """
+    if method is None:
+        return None
+    decryptor = compile_method(*method)
+    return None if decryptor.xor_field is not None else decryptor
+
+
+def compile_smali(lines, method_name='$'):
+    """Decryptor dịch từ method `method_name(III)Ljava/lang/String;` trong các dòng smali
+
+    None nếu không có method đó; raise UnsupportedDecryptor nếu không dịch được.
+    """
+    method = read_smali_method(lines, method_name)
+    if method is None:
+        return None
+    with profiling.stage('emulator.compile', instructions=len(method[0])):
+        return compile_method(*method)
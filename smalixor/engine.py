@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Engine XOR vectorized bằng NumPy: decode cả slice trong một phép toán."""
+
+from array import array
+
+import numpy as np
+
+from . import profiling, smali_parser
+
+# dtype NumPy tương ứng với độ rộng phần tử array-data
+WIDTH_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32, 8: np.int64}
+
+
+def as_units(array_data):
+    """Xem array-data như mảng uint16 (code unit UTF-16), không copy nếu là array('h')"""
+    if isinstance(array_data, memoryview):
+        # Block đọc thẳng từ DEX: view trên ảnh file, cũng không copy
+        array_data = np.frombuffer(array_data, dtype=array_data.format)
+        if array_data.dtype == np.int16:
+            return array_data.view(np.uint16)
+    if isinstance(array_data, np.ndarray):
+        return array_data.astype(np.uint16, copy=False)
+    if isinstance(array_data, array) and array_data.typecode == 'h':
+        return np.frombuffer(array_data, dtype=np.int16).view(np.uint16)
+    return (np.asarray(array_data, dtype=np.int64) & 0xFFFF).astype(np.uint16)
+
+
+def units_to_string(units):
+    """Chuyển mảng code unit UTF-16 thành str bằng một lần decode"""
+    return units.astype('<u2', copy=False).tobytes().decode('utf-16-le', 'surrogatepass')
+
+
+def decode_range(array_data, xor_key, start_index, end_index):
+    """Giải mã XOR một range (ngữ nghĩa slice như list)"""
+    with profiling.stage('decode') as s:
+        units = as_units(array_data)[start_index:end_index]
+        s.add(elements=len(units))
+        return units_to_string(units ^ np.uint16(xor_key & 0xFFFF))
+
+
+def decode_ranges(array_data, ranges):
+    """Giải mã nhiều bộ (start, end, key) trong một lần XOR, trả về list str"""
+    ranges = list(ranges)
+    if not ranges:
+        return []
+
+    with profiling.stage('decode', ranges=len(ranges)) as s:
+        return _decode_ranges(as_units(array_data), ranges, s)
+
+
+def _decode_ranges(units, ranges, s):
+    n = len(units)
+    bounds = np.array([slice(start, end).indices(n)[:2] for start, end, _ in ranges],
+                      dtype=np.int64).reshape(-1, 2)
+    starts = bounds[:, 0]
+    lengths = np.maximum(bounds[:, 1] - starts, 0)
+    keys = np.array([key & 0xFFFF for _, _, key in ranges], dtype=np.uint16)
+
+    # Gom tất cả chỉ số của các range thành một mảng rồi XOR một lần
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    total = int(offsets[-1])
+    s.add(elements=total)
+    index = np.arange(total, dtype=np.int64) - np.repeat(offsets[:-1] - starts, lengths)
+    decoded = (units[index] ^ np.repeat(keys, lengths)).astype('<u2', copy=False).tobytes()
+
+    # Decode từng range riêng để cặp surrogate không bị ghép qua ranh giới range
+    return [decoded[2 * offsets[i]:2 * offsets[i + 1]].decode('utf-16-le', 'surrogatepass')
+            for i in range(len(ranges))]
+
+
+def encode_string(text, xor_key, width=2):
+    """Mã hoá chuỗi thành array với XOR key (mặc định array('h'))
+
+    Với block rộng 4/8 byte, giá trị được mở rộng dấu từ short (int-to-char chỉ lấy
+    16 bit thấp); block byte chỉ chứa được giá trị short nằm trong khoảng của byte.
+    """
+    units = np.frombuffer(text.encode('utf-16-le', 'surrogatepass'), dtype='<u2')
+    encoded = (units ^ np.uint16(xor_key & 0xFFFF)).astype(np.int16)
+    if width == 1 and encoded.size and (encoded.min() < -0x80 or encoded.max() > 0x7F):
+        raise ValueError("Chuỗi không mã hoá được vào block byte với XOR key này")
+    result = array(smali_parser.WIDTH_TYPECODES[width])
+    result.frombytes(encoded.astype(WIDTH_DTYPES[width]).tobytes())
+    return result
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Export toàn bộ chuỗi đã giải mã (theo call site) ra JSONL/CSV, ghi dần từng file smali."""
+
+import csv
+import json
+
+from . import callsites, core
+
+FIELDS = ('file', 'class', 'method', 'line', 'start', 'end', 'key', 'string')
+FORMATS = ('jsonl', 'csv')
+
+
+def iter_string_records(paths, method_name='$', errors=None):
+    """Yield dict cho từng call site của mọi file smali trong paths
+
+    Mỗi lần chỉ giữ array-data của một file nên bộ nhớ không tăng theo số file.
+    errors(path, message) được gọi với file không đọc/giải mã được (mặc định: raise).
+    """
+    for path in core.iter_smali_files(paths):
+        try:
+            results = callsites.resolve_file(path, method_name)
+        except ValueError as e:
+            if errors is None:
+                raise
+            errors(path, str(e))
+            continue
+        yield from iter_site_records(path, results)
+
+
+def iter_site_records(path, results):
+    """Chuyển list (CallSite, string) của một file thành record
+
+    Với DEX/APK, 'file' là 'app.apk!classes2.dex' và 'line' là offset byte của lệnh invoke
+    trong file DEX đó (xem callsites.CallSite).
+    """
+    for site, result in results:
+        yield {
+            'file': callsites.site_location(path, site),
+            'class': site.class_name,
+            'method': site.method,
+            'line': site.line,
+            'start': site.start,
+            'end': site.end,
+            'key': site.key,
+            'string': result,
+        }
+
+
+def format_from_path(output_path):
+    """Đoán định dạng từ đuôi file (.csv => csv, còn lại jsonl)"""
+    return 'csv' if output_path.lower().endswith('.csv') else 'jsonl'
+
+
+def write_records(records, f, fmt='jsonl'):
+    """Ghi từng record ngay khi nhận được, trả về số record đã ghi"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Định dạng không hỗ trợ: {fmt}")
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            count += 1
+    else:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write('\n')
+            count += 1
+    return count
+
+
+def export_strings(paths, output_path, fmt=None, method_name='$', errors=None, progress=None):
+    """Giải mã mọi call site trong paths và ghi ra output_path, trả về số chuỗi
+
+    progress(done, total) được gọi sau mỗi file smali.
+    """
+    fmt = fmt or format_from_path(output_path)
+    files = list(core.iter_smali_files(paths))
+
+    def records():
+        for done, path in enumerate(files, 1):
+            yield from iter_string_records([path], method_name, errors)
+            if progress is not None:
+                progress(done, len(files))
+
+    return write_records_to_file(records(), output_path, fmt)
+
+
+def write_records_to_file(records, output_path, fmt=None):
+    """Ghi records ra output_path (định dạng theo đuôi file nếu fmt là None)"""
+    fmt = fmt or format_from_path(output_path)
+    # Chuỗi giải mã có thể chứa surrogate lẻ: ghi dạng \udxxx (cũng là escape hợp lệ của JSON)
+    with open(output_path, 'w', encoding='utf-8', errors='backslashreplace', newline='') as f:
+        return write_records(records, f, fmt)
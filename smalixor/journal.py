@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""Nhật ký sửa array-data cho undo/redo, chỉ giữ phần thay đổi (chỉ số, giá trị cũ, giá trị mới).
+
+Giá trị được gom vào một buffer `array` theo từng độ rộng phần tử nên bộ nhớ chỉ tăng theo
+số phần tử đã sửa, không theo kích thước array hay số bước undo.
+"""
+
+import json
+import os
+import sys
+from array import array
+from collections import namedtuple
+from contextlib import contextmanager
+
+from . import smali_parser
+
+JOURNAL_MAGIC = b'SXJ1'
+JOURNAL_VERSION = 1
+JOURNAL_SUFFIX = '.journal'
+# Mỗi bản ghi trong `records`: block, độ rộng, start, số giá trị cũ, số giá trị mới, vị trí
+# của giá trị cũ trong buffer (giá trị mới nằm ngay sau)
+RECORD_FIELDS = 6
+
+# Một thay đổi: range [start, start + len(old)) của block được thay bằng new
+JournalEntry = namedtuple('JournalEntry', 'block start old new')
+
+
+class EditJournal:
+    """Lịch sử sửa đổi theo nhóm: mỗi nhóm là một bước undo/redo"""
+
+    def __init__(self):
+        self.records = array('q')
+        self.groups = array('q')    # chỉ số bản ghi kết thúc của từng nhóm
+        self.values = {}            # typecode -> array giá trị cũ/mới nối tiếp nhau
+        self.cursor = 0             # số nhóm đang được áp dụng (phía sau là redo)
+        self._depth = 0
+
+    def __len__(self):
+        return len(self.groups)
+
+    @property
+    def can_undo(self):
+        return self.cursor > 0
+
+    @property
+    def can_redo(self):
+        return self.cursor < len(self.groups)
+
+    @property
+    def nbytes(self):
+        """Bộ nhớ đang dùng cho bản ghi và giá trị"""
+        return (self.records.itemsize * len(self.records) + self.groups.itemsize * len(self.groups)
+                + sum(buffer.itemsize * len(buffer) for buffer in self.values.values()))
+
+    @contextmanager
+    def group(self):
+        """Gom mọi record() bên trong thành một bước undo"""
+        if self._depth == 0:
+            self._discard_redo()
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self._close_group()
+
+    def record(self, block, width, start, old_values, new_values):
+        """Ghi lại việc range [start, start + len(old_values)) được thay bằng new_values"""
+        if self._depth == 0:
+            self._discard_redo()
+        typecode = smali_parser.WIDTH_TYPECODES[width]
+        buffer = self.values.setdefault(typecode, array(typecode))
+        self.records.extend((block, width, start, len(old_values), len(new_values), len(buffer)))
+        buffer.extend(old_values)
+        buffer.extend(new_values)
+        if self._depth == 0:
+            self._close_group()
+
+    def undo(self):
+        """Lùi một bước, trả về list JournalEntry cần hoàn tác (thứ tự ngược), None nếu hết"""
+        if not self.can_undo:
+            return None
+        self.cursor -= 1
+        return list(reversed(self._entries(self.cursor)))
+
+    def redo(self):
+        """Tiến một bước, trả về list JournalEntry cần áp dụng lại, None nếu hết"""
+        if not self.can_redo:
+            return None
+        self.cursor += 1
+        return self._entries(self.cursor - 1)
+
+    def clear(self):
+        self.__init__()
+
+    def _entries(self, group):
+        first = self.groups[group - 1] if group else 0
+        entries = []
+        for r in range(first, self.groups[group]):
+            block, width, start, old_count, new_count, offset = \
+                self.records[r * RECORD_FIELDS:(r + 1) * RECORD_FIELDS]
+            buffer = self.values[smali_parser.WIDTH_TYPECODES[width]]
+            entries.append(JournalEntry(block, start, buffer[offset:offset + old_count],
+                                        buffer[offset + old_count:offset + old_count + new_count]))
+        return entries
+
+    def _close_group(self):
+        count = len(self.records) // RECORD_FIELDS
+        if count > (self.groups[-1] if self.groups else 0):
+            self.groups.append(count)
+            self.cursor = len(self.groups)
+
+    def _discard_redo(self):
+        """Sửa mới sau khi undo thì bỏ các bước redo (cắt buffer, không sao chép)"""
+        if not self.can_redo:
+            return
+        first = self.groups[self.cursor - 1] if self.cursor else 0
+        truncated = set()
+        for r in range(first, len(self.records) // RECORD_FIELDS):
+            typecode = smali_parser.WIDTH_TYPECODES[self.records[r * RECORD_FIELDS + 1]]
+            if typecode not in truncated:
+                # Vị trí trong buffer tăng dần nên bản ghi đầu tiên bị bỏ là điểm cắt
+                del self.values[typecode][self.records[r * RECORD_FIELDS + 5]:]
+                truncated.add(typecode)
+        del self.records[first * RECORD_FIELDS:]
+        del self.groups[self.cursor:]
+
+    def write(self, path, stamp):
+        """Ghi journal ra file (ghi file tạm rồi thay thế), stamp là (size, mtime) file smali"""
+        header = {
+            'version': JOURNAL_VERSION,
+            'stamp': list(stamp),
+            'cursor': self.cursor,
+            'byteorder': sys.byteorder,
+            'records': len(self.records),
+            'groups': len(self.groups),
+            'values': {typecode: len(buffer) for typecode, buffer in sorted(self.values.items())},
+        }
+        header_bytes = json.dumps(header).encode('utf-8')
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(JOURNAL_MAGIC)
+            f.write(len(header_bytes).to_bytes(4, 'little'))
+            f.write(header_bytes)
+            self.records.tofile(f)
+            self.groups.tofile(f)
+            for _, buffer in sorted(self.values.items()):
+                buffer.tofile(f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def read(cls, path, stamp):
+        """Đọc journal đã ghi cho đúng trạng thái file (stamp), None nếu không có hoặc đã cũ"""
+        try:
+            with open(path, 'rb') as f:
+                if f.read(len(JOURNAL_MAGIC)) != JOURNAL_MAGIC:
+                    return None
+                header = json.loads(f.read(int.from_bytes(f.read(4), 'little')))
+                if header.get('version') != JOURNAL_VERSION or header.get('stamp') != list(stamp):
+                    return None
+                journal = cls()
+                journal.records.fromfile(f, header['records'])
+                journal.groups.fromfile(f, header['groups'])
+                for typecode, count in sorted(header['values'].items()):
+                    buffer = array(typecode)
+                    buffer.fromfile(f, count)
+                    journal.values[typecode] = buffer
+        except (OSError, EOFError, ValueError, KeyError):
+            return None
+        if header['byteorder'] != sys.byteorder:
+            for buffer in (journal.records, journal.groups, *journal.values.values()):
+                buffer.byteswap()
+        journal.cursor = header['cursor']
+        return journal
+
+
+def journal_path(smali_file_path):
+    """File journal nằm cạnh file smali"""
+    return smali_file_path + JOURNAL_SUFFIX
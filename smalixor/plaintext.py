@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Định vị chuỗi đã biết (known plaintext) trong array-data mà không cần biết range hay key.
+
+Với XOR một key, `a[i] ^ a[i+1] == p[i] ^ p[i+1]` bất kể key. Tìm chuỗi hiệu của plaintext
+trong chuỗi hiệu của array bằng automaton Aho-Corasick (một lượt tuyến tính cho nhiều
+plaintext), mỗi vị trí khớp cho luôn key: `a[start] ^ p[0]`.
+"""
+
+from collections import deque, namedtuple
+
+import numpy as np
+
+from . import core, engine, profiling
+
+# Một lần khớp: range [start, end) giải mã bằng key (16 bit) ra đúng text
+PlaintextHit = namedtuple('PlaintextHit', 'start end key text')
+# Lần khớp trong một project: file, block (field hoặc label), PlaintextHit và đoạn giải mã quanh nó
+ProjectPlaintextHit = namedtuple('ProjectPlaintextHit', 'file block hit context')
+
+
+def differential(units):
+    """Chuỗi hiệu u[i] ^ u[i+1] (độ dài len(units) - 1)"""
+    units = np.asarray(units, dtype=np.uint16)
+    return units[:-1] ^ units[1:]
+
+
+def _units_of(text):
+    return np.frombuffer(text.encode('utf-16-le', 'surrogatepass'), dtype='<u2').astype(np.uint16)
+
+
+class PlaintextLocator:
+    """Automaton Aho-Corasick trên chuỗi hiệu của một hoặc nhiều plaintext
+
+    Dựng một lần rồi dùng lại cho mọi array (mọi block, mọi file trong project).
+    """
+
+    def __init__(self, texts):
+        self.texts = list(dict.fromkeys(texts))
+        if not self.texts:
+            raise ValueError("Chưa có plaintext nào để tìm")
+        short = [text for text in self.texts if len(_units_of(text)) < 2]
+        if short:
+            raise ValueError(f"Plaintext phải dài ít nhất 2 ký tự: {short[0]!r}")
+        self.first_units = [int(_units_of(text)[0]) for text in self.texts]
+        self.lengths = [len(_units_of(text)) for text in self.texts]
+        patterns = [differential(_units_of(text)).tolist() for text in self.texts]
+        self.min_length = min(len(pattern) for pattern in patterns)
+        self.alphabet = np.unique(np.concatenate([np.asarray(p, dtype=np.uint16)
+                                                  for p in patterns]))
+        self._build(patterns)
+
+    def _build(self, patterns):
+        # Trie: goto[state] = {ký hiệu: state}, outputs[state] = chỉ số plaintext kết thúc ở đó
+        goto = [{}]
+        outputs = [[]]
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for symbol in pattern:
+                if symbol not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][symbol] = len(goto) - 1
+                state = goto[state][symbol]
+            outputs[state].append(index)
+        # Failure link theo BFS, gộp luôn thành DFA đầy đủ để mỗi ký hiệu chỉ một lần tra dict
+        fail = [0] * len(goto)
+        delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            for symbol, child in goto[state].items():
+                fail[child] = delta[fail[state]].get(symbol, 0)
+                outputs[child] = outputs[child] + outputs[fail[child]]
+                queue.append(child)
+        self.delta = delta
+        self.outputs = outputs
+
+    def locate(self, array_data, limit=None):
+        """List PlaintextHit trong array-data, theo vị trí tăng dần"""
+        units = engine.as_units(array_data)
+        hits = []
+        if len(units) < 2:
+            return hits
+        with profiling.stage('plaintext.locate', elements=len(units)) as s:
+            diffs = differential(units)
+            # Ký hiệu ngoài bảng chữ cái của pattern luôn đưa automaton về gốc: chỉ chạy trên
+            # các đoạn liên tiếp nằm trong bảng chữ cái và đủ dài để chứa một pattern
+            inside = np.isin(diffs, self.alphabet)
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], inside.view(np.int8), [0]))))
+            delta, outputs = self.delta, self.outputs
+            scanned = 0
+            for run_start, run_end in zip(edges[::2].tolist(), edges[1::2].tolist()):
+                if run_end - run_start < self.min_length:
+                    continue
+                scanned += run_end - run_start
+                state = 0
+                for position, symbol in enumerate(diffs[run_start:run_end].tolist(), run_start):
+                    state = delta[state].get(symbol, 0)
+                    for index in outputs[state]:
+                        start = position + 2 - self.lengths[index]
+                        key = int(units[start]) ^ self.first_units[index]
+                        hits.append(PlaintextHit(start, start + self.lengths[index], key,
+                                                 self.texts[index]))
+                if limit is not None and len(hits) >= limit:
+                    break
+            hits.sort(key=lambda hit: (hit.start, hit.end))
+            if limit is not None:
+                hits = hits[:limit]
+            s.add(scanned=scanned, hits=len(hits))
+        return hits
+
+    def locate_in_files(self, paths, progress=None, errors=None, limit=None):
+        """Yield ProjectPlaintextHit cho mọi block array-data của các file smali trong paths
+
+        errors(path, message) nhận lỗi từng file (mặc định: bỏ qua file đó). Chỉ tìm theo
+        XOR: block có decryptor không phải XOR thuần bị bỏ qua và báo qua errors.
+        """
+        files = list(core.iter_smali_files(paths))
+        found = 0
+        for done, path in enumerate(files, 1):
+            try:
+                blocks = core.load_array_blocks(path)
+            except (OSError, UnicodeDecodeError, ValueError) as e:
+                if errors is not None:
+                    errors(path, str(e))
+                blocks = []
+            for index, block in enumerate(blocks):
+                try:
+                    core.require_xor_block(path, blocks, index)
+                except (OSError, ValueError) as e:
+                    if errors is not None:
+                        errors(path, str(e))
+                    continue
+                for hit in self.locate(block.values):
+                    yield ProjectPlaintextHit(path, block.field or block.label, hit,
+                                              context(block.values, hit))
+                    found += 1
+                    if limit is not None and found >= limit:
+                        return
+            if progress is not None:
+                progress(done, len(files))
+
+
+def context(array_data, hit, before=8, after=24):
+    """Đoạn giải mã quanh một lần khớp (cùng key), để nhìn ra cả chuỗi chứa plaintext"""
+    start = max(0, hit.start - before)
+    return engine.decode_range(array_data, hit.key, start, hit.end + after)
+
+
+def locate(array_data, texts, limit=None):
+    """List PlaintextHit của các plaintext trong một array-data"""
+    return PlaintextLocator(texts).locate(array_data, limit)
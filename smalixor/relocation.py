@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""Relocate hằng số khi array-data đổi độ dài: size của `new-array` và start/end của call site.
+
+Lệnh const được giữ theo byte offset của dòng nên sau mỗi lần lưu chỉ cần dịch offset,
+không phải quét lại file.
+"""
+
+import re
+from bisect import bisect_left
+
+from . import callsites, smali_parser
+
+# `const vX, 0x...` (cả const/4, const/16, const/high16), nhóm: indent, opcode, thanh ghi, literal
+CONST_LINE_RE = re.compile(rb'^([ \t]*)(const(?:/4|/16|/high16)?)\s+([vp]\d+),\s*(-?0x[0-9a-fA-F]+)\s*$')
+NEW_ARRAY_RE = re.compile(rb'^new-array\s+([vp]\d+),\s*([vp]\d+),')
+# Khoảng giá trị mà từng opcode const nạp được
+CONST_RANGES = {
+    b'const/4': (-0x8, 0x7),
+    b'const/16': (-0x8000, 0x7FFF),
+    b'const': (-0x80000000, 0x7FFFFFFF),
+}
+
+
+class ConstSlot:
+    """Một dòng `const vX, N` trong file có thể được ghi lại với giá trị mới"""
+
+    __slots__ = ('offset', 'length', 'indent', 'opcode', 'register', 'value', 'saved')
+
+    def __init__(self, offset, length, indent, opcode, register, value):
+        self.offset = offset      # offset byte đầu dòng
+        self.length = length      # độ dài dòng (không tính ký tự xuống dòng)
+        self.indent = indent
+        self.opcode = opcode
+        self.register = register
+        self.value = value        # giá trị hiện tại (có thể chưa lưu)
+        self.saved = value        # giá trị đang nằm trong file
+
+    @classmethod
+    def parse(cls, line, offset):
+        """Tạo slot từ một dòng (bytes), None nếu không phải lệnh const đơn giản"""
+        body = line.rstrip(b'\r\n')
+        m = CONST_LINE_RE.match(body)
+        if not m:
+            return None
+        return cls(offset, len(body), m.group(1), m.group(2), m.group(3), int(m.group(4), 16))
+
+    @property
+    def modified(self):
+        return self.value != self.saved
+
+    def mark_saved(self):
+        """Giá trị hiện tại đã được ghi vào file (bằng dòng format())"""
+        if not fits(self.opcode, self.value):
+            self.opcode = b'const'
+        self.length = len(self.format())
+        self.saved = self.value
+
+    def format(self):
+        """Dòng const với giá trị hiện tại, đổi sang `const` nếu opcode cũ không chứa nổi"""
+        opcode = self.opcode if fits(self.opcode, self.value) else b'const'
+        sign = b'-' if self.value < 0 else b''
+        return b'%s%s %s, %s0x%x' % (self.indent, opcode, self.register, sign, abs(self.value))
+
+
+def fits(opcode, value):
+    """Opcode const có nạp được giá trị không"""
+    if opcode == b'const/high16':
+        return value & 0xFFFF == 0 and -0x80000000 <= value <= 0x7FFFFFFF
+    low, high = CONST_RANGES.get(opcode, (0, -1))
+    return low <= value <= high
+
+
+class CallSiteIndex:
+    """Call site sắp theo start, để relocate một lần sửa trong O(log n + số call site bị ảnh hưởng)
+
+    Mỗi call site trỏ tới ConstSlot của start và end; nhiều call site có thể dùng chung slot.
+    """
+
+    def __init__(self, entries):
+        entries = sorted(entries, key=lambda entry: (entry[0].start, entry[0].end))
+        self.sites = [entry[0] for entry in entries]
+        self.starts = [site.start for site in self.sites]
+        self.ends = [site.end for site in self.sites]
+        self.start_slots = [entry[1] for entry in entries]
+        self.end_slots = [entry[2] for entry in entries]
+        # Cận trên độ dài range, để giới hạn đoạn cần xét phía trước điểm sửa
+        self.max_length = max((e - s for s, e in zip(self.starts, self.ends)), default=0)
+
+    def __len__(self):
+        return len(self.sites)
+
+    def relocate(self, start, end, new_length):
+        """Range [start, end) được thay bằng new_length phần tử, trả về số call site đã đổi"""
+        delta = new_length - (end - start)
+        new_end = start + new_length
+        changed = 0
+        first = bisect_left(self.starts, end)
+        # Call site nằm sau range sửa: dịch nguyên khối
+        if delta:
+            for i in range(first, len(self.starts)):
+                self.starts[i] += delta
+                self.ends[i] += delta
+            changed += len(self.starts) - first
+        # Call site bắt đầu trước `end` chỉ có thể chồng lấn nếu start > start - max_length
+        i = first - 1
+        while i >= 0 and self.starts[i] > start - self.max_length - 1:
+            s, e = self.starts[i], self.ends[i]
+            if e >= end and e > start:
+                e += delta            # chứa trọn range sửa: co giãn theo
+            elif e > new_end:
+                e = new_end           # đuôi nằm trong phần bị xoá
+            if s > new_end:
+                s = new_end
+            if (s, e) != (self.starts[i], self.ends[i]):
+                self.starts[i], self.ends[i] = s, e
+                self.max_length = max(self.max_length, e - s)
+                changed += 1
+            i -= 1
+        return changed
+
+    def current(self):
+        """Các call site với start/end hiện tại, theo thứ tự dòng trong file"""
+        sites = [site._replace(start=s, end=e)
+                 for site, s, e in zip(self.sites, self.starts, self.ends)]
+        sites.sort(key=lambda site: site.line)
+        return sites
+
+    def assign_slots(self):
+        """Đưa start/end hiện tại vào các ConstSlot, trả về các slot đã đổi
+
+        Raise ValueError nếu call site cần đổi nhưng không có lệnh const riêng để ghi.
+        """
+        assigned = {}
+        for i, site in enumerate(self.sites):
+            for value, original, slot in ((self.starts[i], site.start, self.start_slots[i]),
+                                          (self.ends[i], site.end, self.end_slots[i])):
+                if slot is None:
+                    if value != original:
+                        raise ValueError(f"Không relocate được call site dòng {site.line}: "
+                                         f"start/end không được nạp bằng lệnh const")
+                    continue
+                if assigned.setdefault(id(slot), value) != value:
+                    raise ValueError(f"Không relocate được call site dòng {site.line}: lệnh const "
+                                     f"dùng chung cho hai giá trị khác nhau")
+                slot.value = value
+        return [slot for slot in self.slots() if slot.modified]
+
+    def slots(self):
+        """Mọi ConstSlot (không trùng lặp) mà các call site dùng"""
+        seen = {}
+        for slot in self.start_slots + self.end_slots:
+            if slot is not None:
+                seen.setdefault(id(slot), slot)
+        return list(seen.values())
+
+    def commit(self, shift_line=None):
+        """Sau khi lưu: giá trị hiện tại trở thành giá trị gốc, shift_line(line) cập nhật số dòng"""
+        shift_line = shift_line or (lambda line: line)
+        self.sites = [site._replace(start=s, end=e, line=shift_line(site.line),
+                                    start_line=site.start_line and shift_line(site.start_line),
+                                    end_line=site.end_line and shift_line(site.end_line))
+                      for site, s, e in zip(self.sites, self.starts, self.ends)]
+
+
+def scan_file(smali_file_path, method_name='$'):
+    """Quét file một lần, trả về (list (CallSite, start_slot, end_slot), {data_start: size_slot})
+
+    size_slot là lệnh const nạp kích thước cho `new-array` được `fill-array-data` bằng block
+    có offset dữ liệu data_start.
+    """
+    with open(smali_file_path, 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+
+    def slot_at(line_no):
+        if line_no is None:
+            return None
+        return ConstSlot.parse(lines[line_no - 1], offsets[line_no - 1])
+
+    slots = {}
+
+    def shared_slot(line_no):
+        # Một dòng const chỉ có một slot dù nhiều call site cùng dùng
+        if line_no not in slots:
+            slots[line_no] = slot_at(line_no)
+        return slots[line_no]
+
+    entries = [(site, shared_slot(site.start_line), shared_slot(site.end_line))
+               for site in callsites.iter_call_sites(
+                   (line.decode('utf-8') for line in lines), method_name)
+               if site.target == site.class_name]
+    return entries, _scan_size_consts(lines, offsets, shared_slot)
+
+
+def _scan_size_consts(lines, offsets, slot_at):
+    """Map data_start của block -> slot const nạp kích thước array tương ứng"""
+    consts = {}     # thanh ghi -> dòng const gần nhất
+    arrays = {}     # thanh ghi -> dòng const của kích thước new-array
+    fills = {}      # label -> dòng const kích thước
+    label = None
+    result = {}
+    in_block = False
+    for line_no, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if in_block:
+            in_block = not stripped.startswith(b'.end array-data')
+            continue
+        if not stripped or stripped.startswith(b'#'):
+            continue
+        if stripped.startswith(b'.array-data'):
+            in_block = True
+            if label in fills and fills[label] is not None:
+                slot = slot_at(fills[label])
+                if slot is not None:
+                    result[offsets[line_no]] = slot
+            continue
+        if stripped.startswith(b':'):
+            label = stripped.decode('utf-8')
+            continue
+        label = None
+        if stripped.startswith(b'.method'):
+            consts, arrays, fills = {}, {}, {}
+        elif stripped.startswith(b'const'):
+            m = CONST_LINE_RE.match(stripped)
+            if m:
+                consts[m.group(3)] = line_no
+        elif stripped.startswith(b'new-array'):
+            m = NEW_ARRAY_RE.match(stripped)
+            if m:
+                arrays[m.group(1)] = consts.get(m.group(2))
+        elif stripped.startswith(b'fill-array-data'):
+            m = smali_parser.FILL_ARRAY_DATA_RE.match(stripped)
+            if m:
+                fills[m.group(2).decode('utf-8')] = arrays.get(m.group(1))
+    return result
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Thay lời gọi decryptor `$(III)` + `move-result-object` bằng `const-string` đã giải mã."""
+
+import os
+import re
+import shutil
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from . import callsites, core, writer
+
+# Kết quả rewrite một file: số call site đã thay, số call site bỏ qua, lỗi (nếu có)
+RewriteResult = namedtuple('RewriteResult', 'path rewritten skipped error')
+
+MOVE_RESULT_RE = re.compile(rb'^(\s*)move-result-object\s+([vp]\d+)\s*$')
+# Từ số file này trở lên mới chia việc cho process pool
+PARALLEL_MIN_FILES = 8
+
+# Escape của smali cho các ký tự đặc biệt trong chuỗi
+SMALI_ESCAPES = {0x22: '\\"', 0x27: "\\'", 0x5C: '\\\\', 0x0A: '\\n', 0x0D: '\\r', 0x09: '\\t',
+                 0x08: '\\b', 0x0C: '\\f'}
+
+
+def escape_smali_string(text):
+    """Chuỗi thành literal smali trong dấu nháy kép, ngoài ASCII in được thì dùng \\uXXXX"""
+    units = text.encode('utf-16-le', 'surrogatepass')
+    parts = []
+    for i in range(0, len(units), 2):
+        unit = units[i] | units[i + 1] << 8
+        if unit in SMALI_ESCAPES:
+            parts.append(SMALI_ESCAPES[unit])
+        elif 0x20 <= unit < 0x7F:
+            parts.append(chr(unit))
+        else:
+            parts.append('\\u%04x' % unit)
+    return '"' + ''.join(parts) + '"'
+
+
+def read_class_name(smali_file_path):
+    """Descriptor của class khai báo trong file (dòng `.class`), None nếu không có"""
+    with open(smali_file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            m = callsites.CLASS_RE.match(line.strip())
+            if m:
+                return m.group(1)
+            if line.startswith('.method'):
+                break
+    return None
+
+
+def build_class_index(paths):
+    """Map descriptor class -> file smali, để giải mã call site gọi decryptor của class khác"""
+    index = {}
+    for path in core.iter_smali_files(paths):
+        class_name = read_class_name(path)
+        if class_name:
+            index.setdefault(class_name, path)
+    return index
+
+
+def plan_rewrites(smali_file_path, class_index=None, method_name='$'):
+    """Tính các patch (offset, length, bytes) cho một file, trả về (patches, rewritten, skipped)
+
+    Chỉ thay khi lệnh kế tiếp (bỏ qua dòng trống) là `move-result-object`, thanh ghi
+    đích của nó được giữ nguyên cho `const-string` nên phân bổ thanh ghi không đổi.
+    """
+    with open(smali_file_path, 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+
+    call_sites = list(callsites.iter_call_sites(
+        (line.decode('utf-8') for line in lines), method_name))
+    if not call_sites:
+        return [], 0, 0
+
+    # Giải mã theo từng class decryptor (một lần cho mọi call site tới class đó)
+    decoded = {}
+    by_target = {}
+    for i, site in enumerate(call_sites):
+        by_target.setdefault(site.target, []).append(i)
+    for target, indices in by_target.items():
+        path = smali_file_path if target == call_sites[0].class_name else \
+            (class_index or {}).get(target)
+        if not path:
+            continue
+        try:
+            blocks = core.load_array_blocks(path)
+            if not any(blocks):
+                continue
+            results = callsites.decode_file_call_sites(
+                path, blocks, [call_sites[i] for i in indices], method_name)
+        except ValueError:
+            continue
+        for i, (_, result) in zip(indices, results):
+            decoded[i] = result
+
+    patches = []
+    skipped = 0
+    for i, site in enumerate(call_sites):
+        invoke = site.line - 1
+        move = invoke + 1
+        while move < len(lines) and not lines[move].strip():
+            move += 1
+        m = MOVE_RESULT_RE.match(lines[move]) if move < len(lines) else None
+        if i not in decoded or m is None:
+            skipped += 1
+            continue
+
+        result = decoded[i]
+        invoke_line = lines[invoke]
+        indent = invoke_line[:len(invoke_line) - len(invoke_line.lstrip())]
+        newline = invoke_line[len(invoke_line.rstrip(b'\r\n')):]
+        const_string = b'%sconst-string %s, %s%s' % (
+            indent, m.group(2), escape_smali_string(result).encode('ascii'), newline)
+        # Thay dòng invoke, xoá luôn các dòng trống và dòng move-result phía sau
+        patches.append((offsets[invoke], offsets[move + 1] - offsets[invoke], const_string))
+    return patches, len(patches), skipped
+
+
+def rewrite_file(smali_file_path, class_index=None, method_name='$', backup=True, dry_run=False):
+    """Rewrite mọi call site giải mã được trong file bằng một lần ghi, trả về RewriteResult"""
+    try:
+        patches, rewritten, skipped = plan_rewrites(smali_file_path, class_index, method_name)
+        if patches and not dry_run:
+            if backup:
+                shutil.copyfile(smali_file_path, smali_file_path + '.backup')
+            writer.splice_file(smali_file_path, patches)
+    except (OSError, ValueError) as e:
+        return RewriteResult(smali_file_path, 0, 0, str(e))
+    return RewriteResult(smali_file_path, rewritten, skipped, None)
+
+
+# Class index dùng chung trong mỗi worker process (gửi một lần qua initializer)
+_worker_class_index = None
+
+
+def _init_worker(class_index):
+    global _worker_class_index
+    _worker_class_index = class_index
+
+
+def _rewrite_task(args):
+    path, method_name, backup, dry_run = args
+    return rewrite_file(path, _worker_class_index, method_name, backup, dry_run)
+
+
+def rewrite_tree(paths, method_name='$', backup=True, dry_run=False, workers=None):
+    """Rewrite mọi file smali trong paths, nhiều file thì chia cho process pool
+
+    Yield RewriteResult theo đúng thứ tự duyệt file.
+    """
+    files = list(core.iter_smali_files(paths))
+    class_index = build_class_index(files)
+    if len(files) < PARALLEL_MIN_FILES or workers == 1:
+        for path in files:
+            yield rewrite_file(path, class_index, method_name, backup, dry_run)
+        return
+    tasks = [(path, method_name, backup, dry_run) for path in files]
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(class_index,)) as executor:
+        yield from executor.map(_rewrite_task, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""Quét cả cây apktool (smali/, smali_classes2/ ... smali_classesN/) bằng process pool.
+
+File được chia thành các lô theo kích thước: file lớn đi trước, lô nhỏ dần về cuối để worker
+rảnh lấy tiếp từ hàng đợi chung của pool (work stealing) thay vì chia cứng mỗi worker một phần.
+Kết quả được ghép lại theo đúng thứ tự duyệt file, không phụ thuộc lô nào xong trước.
+"""
+
+import multiprocessing
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from . import cache, callsites, core, dex, profiling
+
+# Từ số file này trở lên mới chia việc cho process pool
+PARALLEL_MIN_FILES = 64
+# Số lô trung bình cho mỗi worker: nhiều lô hơn thì cân tải tốt hơn nhưng tốn IPC hơn
+BATCHES_PER_WORKER = 8
+# Lô không vượt quá số file này (file nhỏ li ti vẫn phải trả kết quả về đều đặn)
+MAX_BATCH_FILES = 256
+
+SMALI_DIR_RE = re.compile(r'^smali(?:_classes(\d+))?$')
+
+# Kết quả quét một file: stat, hash, list ArrayBlock, chỉ số block decryptor đọc,
+# list (CallSite, string) và lỗi (nếu có)
+ScannedFile = namedtuple('ScannedFile', 'path size mtime_ns digest blocks decryptor strings error')
+
+
+def _natural_key(name):
+    """smali, smali_classes2, ..., smali_classes10 theo thứ tự số (không theo chữ)"""
+    m = SMALI_DIR_RE.match(name)
+    if m:
+        return (0, int(m.group(1) or 1), name)
+    return (1, 0, name)
+
+
+def discover(paths):
+    """Mọi file .smali trong paths, thư mục smali_classesN của apktool xếp theo số dex"""
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs.sort(key=_natural_key)
+            files.extend(os.path.join(root, name) for name in sorted(names)
+                         if name.endswith('.smali'))
+    return files
+
+
+def scan_file(path, method_name='$', known_digest=None):
+    """Đọc block array-data và giải mã call site của một file smali hoặc DEX/APK (ScannedFile)
+
+    Nếu hash trùng known_digest thì không parse lại: blocks và strings là None.
+    Lỗi đọc/parse/giải mã được ghi vào error thay vì raise.
+    """
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        return ScannedFile(path, None, None, None, [], None, [], str(e))
+    try:
+        digest = cache.file_digest(path)
+        if digest == known_digest:
+            return ScannedFile(path, st.st_size, st.st_mtime_ns, digest, None, None, None, None)
+        index = None
+        strings = []
+        if dex.is_dex_input(path):
+            # Mỗi class trong DEX có decryptor riêng: không có một block decryptor chung
+            blocks, strings = dex.scan(path, method_name)
+        else:
+            blocks = core.load_array_blocks(path)
+            if any(blocks):
+                index = callsites.decryptor_block_index(path, blocks, method_name)
+                sites = callsites.find_own_call_sites(path, method_name)
+                strings = callsites.decode_file_call_sites(path, blocks, sites, method_name,
+                                                           index=index)
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        return ScannedFile(path, st.st_size, st.st_mtime_ns, None, [], None, [], str(e))
+    return ScannedFile(path, st.st_size, st.st_mtime_ns, digest, blocks, index, strings, None)
+
+
+def plan_batches(sizes, workers):
+    """Chia chỉ số file thành các lô cân theo tổng kích thước, lô nặng nhất đứng trước
+
+    sizes là list kích thước file; trả về list lô (list chỉ số file).
+    """
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i], i))
+    target = max(1, sum(sizes) // max(1, workers * BATCHES_PER_WORKER))
+    batches = []
+    batch, batch_bytes = [], 0
+    for i in order:
+        batch.append(i)
+        batch_bytes += sizes[i]
+        if batch_bytes >= target or len(batch) >= MAX_BATCH_FILES:
+            batches.append(batch)
+            batch, batch_bytes = [], 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _init_worker(use_cache):
+    if not use_cache:
+        cache.set_default_cache(None)
+
+
+def _scan_batch(args):
+    paths, digests, method_name = args
+    return [scan_file(path, method_name, digest) for path, digest in zip(paths, digests)]
+
+
+def scan_files(files, method_name='$', workers=None, progress=None, mp_context=None,
+               known_digests=None):
+    """Quét list file, trả về list ScannedFile cùng thứ tự với files
+
+    known_digests (cùng độ dài với files, phần tử có thể None) là hash đã biết: file có hash
+    không đổi thì không bị parse lại. Ít file (hoặc workers=1) thì quét tuần tự.
+    progress(done, total) được gọi mỗi khi một lô xong; progress raise thì các lô chưa chạy
+    bị huỷ. mp_context là tên start method ('spawn', 'forkserver'...), None là mặc định.
+    """
+    workers = workers or os.cpu_count() or 1
+    known_digests = known_digests or [None] * len(files)
+    results = [None] * len(files)
+    with profiling.stage('scan', files=len(files)) as s:
+        if len(files) < PARALLEL_MIN_FILES or workers == 1:
+            for done, path in enumerate(files, 1):
+                results[done - 1] = scan_file(path, method_name, known_digests[done - 1])
+                if progress is not None:
+                    progress(done, len(files))
+            s.add(workers=1)
+            return results
+
+        sizes = []
+        for path in files:
+            try:
+                sizes.append(os.path.getsize(path))
+            except OSError:
+                sizes.append(0)
+        batches = plan_batches(sizes, workers)
+        context = multiprocessing.get_context(mp_context) if mp_context else None
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                       initializer=_init_worker,
+                                       initargs=(cache.default_cache() is not None,))
+        try:
+            pending = {executor.submit(_scan_batch, ([files[i] for i in batch],
+                                                     [known_digests[i] for i in batch],
+                                                     method_name)): batch
+                       for batch in batches}
+            done_files = 0
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    batch = pending.pop(future)
+                    for i, scanned in zip(batch, future.result()):
+                        results[i] = scanned
+                    done_files += len(batch)
+                if progress is not None:
+                    progress(done_files, len(files))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        s.add(workers=workers, batches=len(batches), bytes=sum(sizes))
+    return results
+
+
+class ProjectScan:
+    """Model của cả project: ScannedFile của mọi file theo thứ tự duyệt, tra được theo đường dẫn"""
+
+    def __init__(self, files):
+        self.files = files
+        self._by_path = {scanned.path: scanned for scanned in files}
+
+    def __len__(self):
+        return len(self.files)
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def get(self, path):
+        return self._by_path.get(path)
+
+    @property
+    def errors(self):
+        """List (path, message) của các file không đọc/giải mã được"""
+        return [(scanned.path, scanned.error) for scanned in self.files if scanned.error]
+
+    def block_count(self):
+        return sum(len(scanned.blocks) for scanned in self.files)
+
+    def element_count(self):
+        return sum(len(block) for scanned in self.files for block in scanned.blocks)
+
+    def iter_strings(self):
+        """Yield (path, CallSite, string) của mọi file, theo thứ tự file rồi thứ tự dòng"""
+        for scanned in self.files:
+            for site, result in scanned.strings:
+                yield scanned.path, site, result
+
+
+def scan_project(paths, method_name='$', workers=None, progress=None, mp_context=None):
+    """Tìm mọi file smali trong paths, quét song song, trả về ProjectScan"""
+    files = [os.path.abspath(path) for path in discover(paths)]
+    return ProjectScan(scan_files(files, method_name, workers, progress, mp_context))
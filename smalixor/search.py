@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""Chỉ mục tìm kiếm (trigram inverted index, SQLite) trên mọi chuỗi đã giải mã của một project.
+
+Mỗi chuỗi ánh xạ về file, block array-data, range, key và call site. Truy vấn substring/regex
+chỉ đọc posting list của vài trigram rồi kiểm tra lại trên các ứng viên; cập nhật theo
+từng file khi nội dung (hash) đổi.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+from collections import namedtuple
+
+from . import cache, profiling, scanner
+
+try:
+    import re._parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+SCHEMA_VERSION = 2
+# Số trigram tối đa dùng để lọc một truy vấn (giao càng nhiều posting list càng chậm)
+MAX_QUERY_GRAMS = 8
+# Số file cập nhật trong một transaction (mỗi commit là một lần fsync)
+COMMIT_INTERVAL = 512
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    block TEXT
+);
+CREATE TABLE IF NOT EXISTS strings (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    member TEXT,
+    class TEXT NOT NULL,
+    method TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    "end" INTEGER NOT NULL,
+    key INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS strings_path ON strings (path);
+CREATE TABLE IF NOT EXISTS grams (
+    gram INTEGER NOT NULL,
+    string_id INTEGER NOT NULL,
+    PRIMARY KEY (gram, string_id)
+) WITHOUT ROWID;
+"""
+
+# Một chuỗi tìm thấy: vị trí call site, block array-data (field hoặc label), range, key.
+# Với DEX/APK, file là 'app.apk!classes2.dex' và line là offset byte của lệnh invoke
+SearchHit = namedtuple('SearchHit', 'file class_name method line block start end key string')
+
+
+def default_index_path(root):
+    """File chỉ mục của một thư mục project, nằm trong thư mục cache (không ghi vào cây smali)"""
+    name = hashlib.blake2b(os.path.abspath(root).encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(cache.default_cache_dir(), f'index-v{SCHEMA_VERSION}-{name}.sqlite')
+
+
+def trigrams(text):
+    """Tập trigram (đã lower) của chuỗi, mỗi trigram mã hoá thành một int 63 bit"""
+    text = text.lower()
+    return {ord(text[i]) << 42 | ord(text[i + 1]) << 21 | ord(text[i + 2])
+            for i in range(len(text) - 2)}
+
+
+def required_literals(pattern, flags=0):
+    """Các đoạn literal bắt buộc phải có trong mọi match của regex (để lọc bằng trigram)"""
+    literals = []
+    current = []
+    for op, arg in sre_parse.parse(pattern, flags):
+        if op is sre_parse.LITERAL:
+            current.append(chr(arg))
+            continue
+        # Group, lặp, nhánh... không chắc xuất hiện nguyên văn: cắt đoạn literal tại đây
+        if current:
+            literals.append(''.join(current))
+            current = []
+    if current:
+        literals.append(''.join(current))
+    return literals
+
+
+class StringIndex:
+    """Chỉ mục chuỗi đã giải mã của các file smali, lưu trong một file SQLite"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=10)
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            # Chỉ mục tạo bằng schema cũ (vd. --index chỉ rõ file): bỏ đi, quét lại từ đầu
+            self.conn.executescript("DROP TABLE IF EXISTS grams; DROP TABLE IF EXISTS strings; "
+                                    "DROP TABLE IF EXISTS files;")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM strings").fetchone()[0]
+
+    def file_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def update(self, paths, method_name='$', progress=None, errors=None, workers=None,
+               mp_context=None):
+        """Đồng bộ chỉ mục với các file smali trong paths, trả về (số file cập nhật, số file xoá)
+
+        Chỉ file có stat đổi mới bị hash, chỉ file có hash đổi mới bị giải mã lại (nhiều file
+        thì bằng process pool, xem scanner.scan_files).
+        File nằm trong paths nhưng không còn trên đĩa bị xoá khỏi chỉ mục.
+        errors(path, message) nhận lỗi từng file (mặc định: bỏ qua file đó).
+        """
+        roots = [os.path.abspath(path) for path in paths]
+        files = [os.path.abspath(path) for path in scanner.discover(roots)]
+        known = {path: (size, mtime_ns, digest) for path, size, mtime_ns, digest in
+                 self.conn.execute("SELECT path, size, mtime_ns, digest FROM files")}
+        stale = []
+        for path in files:
+            try:
+                st = os.stat(path)
+            except OSError as e:
+                if errors is not None:
+                    errors(path, str(e))
+                continue
+            if path not in known or known[path][:2] != (st.st_size, st.st_mtime_ns):
+                stale.append(path)
+        updated = 0
+        with profiling.stage('index.update') as s:
+            results = scanner.scan_files(stale, method_name, workers, progress, mp_context,
+                                         [known[path][2] if path in known else None
+                                          for path in stale])
+            try:
+                for done, scanned in enumerate(results, 1):
+                    if scanned.error:
+                        if errors is not None:
+                            errors(scanned.path, scanned.error)
+                    elif self._apply(scanned):
+                        updated += 1
+                    if done % COMMIT_INTERVAL == 0:
+                        self.conn.commit()
+                present = set(files)
+                removed = [path for path in known if path not in present and
+                           any(path == root or path.startswith(root + os.sep) for root in roots)]
+                for path in removed:
+                    self._remove_strings(path)
+                    self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            finally:
+                # Bị huỷ giữa chừng vẫn giữ các file đã cập nhật xong
+                self.conn.commit()
+            s.add(files=len(files), stale=len(stale), updated=updated, removed=len(removed))
+        return updated, len(removed)
+
+    def update_file(self, path, results, block=None):
+        """Thay các chuỗi của một file bằng results (list (CallSite, string)) đã giải mã sẵn"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self.conn:
+            self._replace_strings(path, results)
+            self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                              (path, st.st_size, st.st_mtime_ns, cache.file_digest(path), block))
+
+    def remove_file(self, path):
+        path = os.path.abspath(path)
+        with self.conn:
+            self._remove_strings(path)
+            self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def search(self, query, regex=False, ignore_case=False, limit=None):
+        """List SearchHit của các chuỗi chứa query (hoặc khớp regex), theo thứ tự file/dòng"""
+        with profiling.stage('index.search') as s:
+            if regex:
+                compiled = re.compile(query, re.IGNORECASE if ignore_case else 0)
+                literals = required_literals(query, compiled.flags)
+                matches = compiled.search
+            else:
+                literals = [query]
+                needle = query.lower() if ignore_case else query
+                if ignore_case:
+                    def matches(text):
+                        return needle in text.lower()
+                else:
+                    def matches(text):
+                        return needle in text
+            candidates = self._candidates(literals)
+            hits = []
+            for row in self._rows(candidates):
+                if matches(row[-1]):
+                    hits.append(SearchHit(*row))
+                    if limit is not None and len(hits) >= limit:
+                        break
+            s.add(candidates=len(candidates) if candidates is not None else len(self),
+                  hits=len(hits))
+        return hits
+
+    def _candidates(self, literals):
+        """id các chuỗi có đủ mọi trigram của các literal, None nếu phải quét toàn bộ"""
+        grams = set()
+        for literal in literals:
+            grams |= trigrams(literal)
+        if not grams:
+            return None
+        grams = sorted(grams)
+        if len(grams) > MAX_QUERY_GRAMS:
+            step = len(grams) / MAX_QUERY_GRAMS
+            grams = [grams[int(i * step)] for i in range(MAX_QUERY_GRAMS)]
+        sql = " INTERSECT ".join(["SELECT string_id FROM grams WHERE gram = ?"] * len(grams))
+        return [row[0] for row in self.conn.execute(sql, grams)]
+
+    def _rows(self, ids):
+        # Hit trong APK mang tên member DEX để classes.dex và classes2.dex không lẫn vào nhau
+        select = ("SELECT s.path || COALESCE('!' || s.member, ''), s.class, s.method, s.line, "
+                  'f.block, s.start, s."end", s.key, s.text '
+                  'FROM strings s LEFT JOIN files f ON f.path = s.path')
+        if ids is None:
+            yield from self.conn.execute(select + " ORDER BY s.path, s.member, s.line")
+            return
+        # SQLite giới hạn số tham số: truy vấn theo lô
+        rows = []
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows.extend(self.conn.execute(
+                select + f" WHERE s.id IN ({','.join('?' * len(chunk))})", chunk))
+        rows.sort(key=lambda row: (row[0], row[3]))
+        yield from rows
+
+    def _apply(self, scanned):
+        """Ghi kết quả quét một file vào chỉ mục, trả về True nếu chuỗi của file được thay"""
+        if scanned.blocks is None:
+            # Hash không đổi: chỉ cập nhật stat
+            self.conn.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?",
+                              (scanned.size, scanned.mtime_ns, scanned.path))
+            return False
+        block = None
+        if scanned.decryptor is not None:
+            block = scanned.blocks[scanned.decryptor]
+            block = block.field or block.label
+        self._replace_strings(scanned.path, scanned.strings)
+        self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                          (scanned.path, scanned.size, scanned.mtime_ns, scanned.digest, block))
+        return True
+
+    def _replace_strings(self, path, results):
+        self._remove_strings(path)
+        next_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM strings").fetchone()[0]
+        rows = []
+        postings = []
+        for string_id, (site, text) in enumerate(results, next_id):
+            rows.append((string_id, path, site.member, site.class_name, site.method, site.line,
+                         site.start, site.end, site.key, text))
+            postings.extend((gram, string_id) for gram in trigrams(text))
+        # Chèn theo thứ tự khoá của B-tree thì ít phải tách trang hơn
+        postings.sort()
+        self.conn.executemany("INSERT INTO strings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self.conn.executemany("INSERT OR IGNORE INTO grams VALUES (?, ?)", postings)
+
+    def _remove_strings(self, path):
+        rows = self.conn.execute("SELECT id, text FROM strings WHERE path = ?", (path,)).fetchall()
+        if not rows:
+            return
+        self.conn.executemany("DELETE FROM grams WHERE gram = ? AND string_id = ?",
+                              [(gram, string_id) for string_id, text in rows
+                               for gram in trigrams(text)])
+        self.conn.execute("DELETE FROM strings WHERE path = ?", (path,))
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""Parser smali trên bytes (file được mmap), chỉ parse literal bên trong các block `.array-data`."""
+
+import os
+import re
+from array import array
+
+from . import profiling, tokenizer
+
+ARRAY_DATA_DIRECTIVE = b'.array-data'
+END_ARRAY_DATA_DIRECTIVE = b'.end array-data'
+
+# Literal trong array-data: short có hậu tố 's', byte 't', long 'L', int không hậu tố
+LITERAL_PATTERN = re.compile(rb'-?0x[0-9a-fA-F]+[stL]?')
+# Hậu tố literal tương ứng với độ rộng phần tử
+WIDTH_SUFFIXES = {1: b't', 2: b's', 4: b'', 8: b'L'}
+# Typecode của array.array tương ứng với độ rộng phần tử (có dấu như Java)
+WIDTH_TYPECODES = {1: 'b', 2: 'h', 4: 'i', 8: 'q'}
+TYPECODE_WIDTHS = {typecode: width for width, typecode in WIDTH_TYPECODES.items()}
+# `fill-array-data vX, :label` và `sput-object vX, Lcls;->field:[T` (gán array cho field static)
+FILL_ARRAY_DATA_RE = re.compile(rb'^fill-array-data\s+([vp]\d+),\s*(:\S+)')
+SPUT_OBJECT_RE = re.compile(rb'^sput-object\s+([vp]\d+),\s*(L[^;]+;->\S+)')
+# Các dòng parser cần đọc; mọi dòng khác (phần lớn code) được bỏ qua không cần tách dòng
+DIRECTIVE_LINE_RE = re.compile(rb'^[ \t\r\f\v]*(\.array-data|fill-array-data|sput-object|\.method)',
+                               re.MULTILINE)
+# Số dòng giữa hai lần báo tiến độ
+PROGRESS_INTERVAL = 8192
+
+
+class ArrayBlock:
+    """Một block `.array-data` và vị trí (byte offset) của nó trong file"""
+
+    __slots__ = ('label', 'field', 'width', 'line', 'data_start', 'data_end', 'values',
+                 'offsets', 'lengths')
+
+    def __init__(self, label, width, line, data_start, field=None):
+        self.label = label            # ví dụ ':array_0' (None nếu không có)
+        self.field = field            # field static sở hữu block, ví dụ 'Lcls;->$:[S'
+        self.width = width            # độ rộng phần tử: 1, 2, 4 hoặc 8 byte
+        self.line = line              # dòng của chỉ thị `.array-data` (đếm từ 1)
+        self.data_start = data_start  # offset byte đầu tiên sau dòng `.array-data N`
+        self.data_end = None          # offset byte của dòng `.end array-data`
+        self.values = array(WIDTH_TYPECODES.get(width, 'q'))  # giá trị đã parse
+        self.offsets = array('q')     # offset byte của từng literal trong file
+        self.lengths = array('I')     # độ dài (byte) của từng literal
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getstate__(self):
+        state = {name: getattr(self, name) for name in self.__slots__}
+        if isinstance(self.values, memoryview):
+            # View trên ảnh DEX không pickle được (gửi giữa các process): copy thành array
+            state['values'] = array(self.values.format, self.values.tobytes())
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return (f"ArrayBlock(label={self.label!r}, field={self.field!r}, width={self.width}, "
+                f"line={self.line}, count={len(self.values)})")
+
+    def matches(self, key):
+        """So khớp block với label (':array_0' / 'array_0'), field đầy đủ hoặc tên field ('$')"""
+        if self.label is not None and key in (self.label, ':' + key):
+            return True
+        if self.field is not None:
+            return key == self.field or key == self.field.split('->', 1)[1].split(':', 1)[0]
+        return False
+
+
+def iter_array_blocks(f, progress=None, total=0):
+    """Yield từng ArrayBlock của file đã mở ở chế độ nhị phân (đọc hết vào bộ nhớ)"""
+    yield from iter_buffer_blocks(f.read(), progress, total, getattr(f, 'name', None))
+
+
+def iter_buffer_blocks(buffer, progress=None, total=0, name=None):
+    """Yield từng ArrayBlock trong buffer (bytes hoặc mmap)
+
+    Regex chỉ dừng ở các dòng chỉ thị cần thiết (phần code còn lại không bị tách dòng), thân
+    block được tokenizer parse thẳng vào values/offsets/lengths.
+    progress(done, total) được gọi sau mỗi chunk literal với số byte đã xử lý.
+    name (đường dẫn file) chỉ dùng trong thông báo lỗi.
+    """
+    size = len(buffer)
+    position = 0
+    line_no = 1   # số dòng của `position`
+    pending = {}  # thanh ghi -> label vừa được fill-array-data
+    fields = {}   # label -> field static được gán array đó (trong method hiện tại)
+
+    while True:
+        m = DIRECTIVE_LINE_RE.search(buffer, position)
+        if m is None:
+            return
+        line_start = m.start()
+        line_no += tokenizer.count_lines(buffer, position, line_start)
+        newline = buffer.find(b'\n', line_start)
+        next_position = size if newline < 0 else newline + 1
+        stripped = buffer[line_start:next_position].strip()
+        directive = m.group(1)
+
+        if directive == ARRAY_DATA_DIRECTIVE:
+            parts = stripped.split()
+            if len(parts) < 2 or not parts[1].isdigit():
+                raise ValueError(f"Chỉ thị .array-data thiếu độ rộng phần tử hợp lệ: "
+                                 f"{name or 'buffer'}:{line_no}")
+            width = int(parts[1])
+            block = ArrayBlock(_label_before(buffer, line_start), width, line_no, next_position)
+            data_end = _find_end_directive(buffer, next_position)
+            if data_end is None:
+                # Thiếu `.end array-data`: block không hoàn chỉnh, bỏ qua
+                return
+            block.data_end = data_end
+            lines = tokenizer.count_lines(buffer, next_position, data_end)
+            suffix = WIDTH_SUFFIXES.get(width)
+            if suffix is not None:
+                sink = tokenizer.LiteralSink(
+                    block.values.typecode,
+                    tokenizer.literal_capacity(buffer, next_position, data_end))
+                tokenizer.read_literals(buffer, next_position, data_end, sink, suffix,
+                                        progress, total)
+                sink.finish()
+                block.values, block.offsets, block.lengths = sink.values, sink.offsets, sink.lengths
+            block.field = fields.get(block.label)
+            yield block
+            line_no += lines + 1
+            newline = buffer.find(b'\n', data_end)
+            next_position = size if newline < 0 else newline + 1
+        elif directive == b'fill-array-data':
+            m = FILL_ARRAY_DATA_RE.match(stripped)
+            if m:
+                pending[m.group(1)] = m.group(2).decode('utf-8')
+        elif directive == b'sput-object':
+            m = SPUT_OBJECT_RE.match(stripped)
+            if m and m.group(1) in pending:
+                fields[pending.pop(m.group(1))] = m.group(2).decode('utf-8')
+        else:
+            pending = {}
+            fields = {}
+        if next_position >= size:
+            return
+        line_no += 1
+        position = next_position
+
+
+def _label_before(buffer, line_start):
+    """Label (':array_0') ở dòng không trống ngay trước line_start, None nếu không phải label"""
+    end = line_start
+    while end > 0:
+        start = buffer.rfind(b'\n', 0, end - 1) + 1
+        text = buffer[start:end].strip()
+        if text:
+            return text.decode('utf-8') if text.startswith(b':') else None
+        end = start
+    return None
+
+
+def _find_end_directive(buffer, start):
+    """Offset đầu dòng `.end array-data` đầu tiên từ start, None nếu không có"""
+    position = start
+    while True:
+        found = buffer.find(END_ARRAY_DATA_DIRECTIVE, position)
+        if found < 0:
+            return None
+        line_start = buffer.rfind(b'\n', start, found) + 1 or start
+        if not buffer[line_start:found].strip():
+            return line_start
+        position = found + 1
+
+
+def parse_array_blocks(smali_file_path, progress=None):
+    """Parse tất cả block `.array-data` của một file smali (mmap, không decode UTF-8)"""
+    total = os.path.getsize(smali_file_path)
+    with profiling.stage('parse', bytes=total) as s:
+        with tokenizer.mapped(smali_file_path) as buffer:
+            blocks = list(iter_buffer_blocks(buffer, progress, total, smali_file_path))
+        s.add(blocks=len(blocks), elements=sum(map(len, blocks)))
+    if progress is not None:
+        progress(total, total)
+    return blocks
+
+
+def parse_literal(literal, width=2):
+    """Chuyển literal (bytes hoặc str) thành int có dấu theo độ rộng phần tử"""
+    if isinstance(literal, str):
+        literal = literal.encode('ascii')
+    if _literal_suffix(literal):
+        literal = literal[:-1]
+    value = int(literal, 16)
+    # Tràn số (ví dụ 0xd07es) được quy về giá trị có dấu như Java
+    bits = width * 8
+    value &= (1 << bits) - 1
+    return value - (1 << bits) if value >> (bits - 1) else value
+
+
+def format_literal(value, width=2):
+    """Chuyển int thành literal smali (bytes) với hậu tố đúng độ rộng"""
+    suffix = WIDTH_SUFFIXES[width]
+    # Short giữ 4 chữ số như trước, các độ rộng khác viết gọn như baksmali
+    pattern = b'0x%04x%s' if width == 2 else b'0x%x%s'
+    if value < 0:
+        return b'-' + pattern % (-value, suffix)
+    return pattern % (value, suffix)
+
+
+def width_of(array_data):
+    """Độ rộng phần tử (byte) của array.array (hoặc memoryview) theo typecode, mặc định 2"""
+    typecode = getattr(array_data, 'typecode', None) or getattr(array_data, 'format', 'h')
+    return TYPECODE_WIDTHS.get(typecode, 2)
+
+
+def select_block(blocks, key=None):
+    """Chỉ số block theo key (label/field); không có key thì ưu tiên block short có field sở hữu
+
+    Raise ValueError nếu không tìm thấy.
+    """
+    if key is not None:
+        for i, block in enumerate(blocks):
+            if block.matches(key):
+                return i
+        raise ValueError(f"Không tìm thấy block array-data: {key}")
+    for predicate in (lambda b: b.width == 2 and b.field, lambda b: b.width == 2,
+                      lambda b: True):
+        for i, block in enumerate(blocks):
+            if predicate(block):
+                return i
+    raise ValueError("Không có block array-data nào")
+
+
+def _literal_suffix(literal):
+    """Lấy hậu tố của literal (b'' với int)"""
+    last = literal[-1:]
+    return last if last in b'stL' else b''
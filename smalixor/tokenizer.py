@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Tách literal hex trực tiếp trên bytes của file đã mmap, ghi thẳng vào buffer `array` cấp sẵn.
+
+Vùng literal (thân block `.array-data`, file txt) được xử lý theo từng chunk bằng NumPy:
+không decode UTF-8, không tạo str/bytes cho từng literal. Cú pháp giống
+`smali_parser.LITERAL_PATTERN`: `-?0x[0-9a-fA-F]+[stL]?`.
+"""
+
+import mmap
+from array import array
+from contextlib import contextmanager
+
+import numpy as np
+
+# Kích thước một chunk (cắt tại ký tự xuống dòng), giới hạn bộ nhớ tạm của NumPy
+CHUNK_BYTES = 1 << 18
+
+# Giá trị của từng byte nếu là chữ số hex, NOT_HEX nếu không
+NOT_HEX = 0xFF
+HEX_DIGITS = np.full(256, NOT_HEX, dtype=np.uint8)
+for _i, _c in enumerate(b'0123456789abcdef'):
+    HEX_DIGITS[_c] = _i
+    HEX_DIGITS[bytes([_c]).upper()[0]] = _i
+del _i, _c
+SUFFIX_BYTES = np.frombuffer(b'stL', dtype=np.uint8)
+# dtype không dấu theo typecode (cắt bớt bit như Java), sau đó view thành có dấu
+UNSIGNED_DTYPES = {'b': np.uint8, 'h': np.uint16, 'i': np.uint32, 'q': np.uint64}
+
+
+@contextmanager
+def mapped(file_path):
+    """mmap chỉ đọc của file (file rỗng thì trả về b'' vì không mmap được)"""
+    with open(file_path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            yield b''
+            return
+        try:
+            yield mm
+        finally:
+            mm.close()
+
+
+class LiteralSink:
+    """Buffer values/offsets/lengths cấp trước một lần (theo literal_capacity), cắt phần dư khi xong
+
+    positions=False thì không giữ offset/độ dài literal (file txt chỉ đọc, không ghi lại).
+    """
+
+    def __init__(self, typecode, capacity, positions=True):
+        # Nhân array một phần tử: cấp đúng một lần, không qua bytes tạm
+        self.values = array(typecode, [0]) * capacity
+        self.offsets = array('q', [0]) * capacity if positions else None
+        self.lengths = array('I', [0]) * capacity if positions else None
+        self.count = 0
+
+    def _buffers(self):
+        return [buffer for buffer in (self.values, self.offsets, self.lengths)
+                if buffer is not None]
+
+    def write(self, values, offsets, lengths):
+        n = len(values)
+        missing = self.count + n - len(self.values)
+        if missing > 0:
+            for buffer in self._buffers():
+                buffer.extend(array(buffer.typecode, [0]) * missing)
+        for buffer, data in ((self.values, values), (self.offsets, offsets),
+                             (self.lengths, lengths)):
+            if buffer is None:
+                continue
+            view = np.frombuffer(buffer, dtype=data.dtype)
+            view[self.count:self.count + n] = data
+            # Bỏ view ngay để array còn đổi kích thước được (buffer đang export thì không)
+            del view
+        self.count += n
+
+    def finish(self):
+        """Cắt phần cấp dư"""
+        for buffer in self._buffers():
+            del buffer[self.count:]
+
+
+def count_lines(buffer, start, end):
+    """Số ký tự xuống dòng trong buffer[start:end]"""
+    return _count_byte(buffer, start, end, 0x0A)
+
+
+def literal_capacity(buffer, start, end):
+    """Cận trên số literal trong buffer[start:end]: mỗi literal có đúng một ký tự 'x'"""
+    return _count_byte(buffer, start, end, 0x78)
+
+
+def _count_byte(buffer, start, end, byte):
+    total = 0
+    for chunk_start in range(start, end, CHUNK_BYTES):
+        count = min(CHUNK_BYTES, end - chunk_start)
+        total += int(np.count_nonzero(
+            np.frombuffer(buffer, dtype=np.uint8, count=count, offset=chunk_start) == byte))
+    return total
+
+
+def read_literals(buffer, start, end, sink, suffix, progress=None, total=0):
+    """Parse mọi literal có hậu tố suffix (b'' là int) trong buffer[start:end] vào sink
+
+    Vùng được cắt thành chunk tại ký tự xuống dòng nên literal không bị chia đôi.
+    progress(done, total) được gọi sau mỗi chunk với offset byte đã xử lý.
+    """
+    suffix_byte = suffix[0] if suffix else 0
+    unsigned = UNSIGNED_DTYPES[sink.values.typecode]
+    signed = np.dtype(sink.values.typecode)
+    position = start
+    while position < end:
+        chunk_end = end
+        if end - position > CHUNK_BYTES:
+            newline = buffer.rfind(b'\n', position, position + CHUNK_BYTES)
+            chunk_end = newline + 1 if newline >= 0 else end
+        values, offsets, lengths = _tokenize(buffer, position, chunk_end, suffix_byte, unsigned)
+        sink.write(values.view(signed), offsets, lengths)
+        position = chunk_end
+        if progress is not None:
+            progress(position, total)
+
+
+def _tokenize(buffer, start, end, suffix_byte, unsigned):
+    """(values, offsets, lengths) của các literal trong một chunk"""
+    data = np.frombuffer(buffer, dtype=np.uint8, count=end - start, offset=start)
+    n = len(data)
+    # Vị trí '0' ngay trước 'x'
+    prefix = np.flatnonzero((data[:-1] == 0x30) & (data[1:] == 0x78))
+    digit_start = prefix + 2
+    digit_end = digit_start.copy()
+    # Giá trị tính bằng uint64 (tràn thì quay vòng, giống việc chỉ giữ bit thấp như Java).
+    # Mỗi vòng đọc thêm một chữ số cho các literal chưa hết chữ số: số vòng bằng độ dài
+    # literal dài nhất, mỗi vòng chỉ xử lý mảng cỡ số literal chứ không cỡ cả chunk
+    values = np.zeros(len(prefix), dtype=np.uint64)
+    active = np.flatnonzero(digit_end < n)
+    while len(active):
+        digits = HEX_DIGITS[data[digit_end[active]]]
+        is_digit = digits != NOT_HEX
+        active, digits = active[is_digit], digits[is_digit]
+        values[active] = values[active] * np.uint64(16) + digits
+        digit_end[active] += 1
+        active = active[digit_end[active] < n]
+
+    # '0x' nằm trong dãy chữ số của literal trước (vd. '0x10x5') không phải literal mới
+    previous_end = np.maximum.accumulate(np.concatenate(([0], digit_end[:-1])))
+    keep = (digit_end > digit_start) & (prefix >= previous_end)
+    following = np.where(digit_end < n, data[np.minimum(digit_end, n - 1)], 0)
+    has_suffix = np.isin(following, SUFFIX_BYTES)
+    if suffix_byte:
+        keep &= following == suffix_byte
+    else:
+        keep &= ~has_suffix
+
+    prefix, digit_end, values = prefix[keep], digit_end[keep], values[keep]
+    negative = (prefix > 0) & (data[np.maximum(prefix - 1, 0)] == 0x2D)
+    values[negative] = np.uint64(0) - values[negative]
+    literal_start = prefix - negative
+    lengths = (digit_end - literal_start + has_suffix[keep]).astype(np.uint32)
+    return (values.astype(unsigned), (literal_start + start).astype(np.int64), lengths)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Theo dõi cả cây smali: chỉ parse và decode lại những file có nội dung (hash) thay đổi.
+
+Không phụ thuộc Qt: GUI gọi scan() khi QFileSystemWatcher báo thay đổi, CLI gọi poll()
+(kiểm tra stat định kỳ, rẻ hơn nhiều so với hash lại cả cây).
+"""
+
+import os
+import time
+from collections import namedtuple
+
+from . import profiling, scanner
+
+# Các file (đường dẫn tuyệt đối) đã thêm/sửa nội dung/xoá sau một lần scan
+WatchChanges = namedtuple('WatchChanges', 'added modified removed')
+
+
+class WatchedFile:
+    """Trạng thái đã biết của một file smali: stat, hash, block array-data và chuỗi đã giải mã"""
+
+    __slots__ = ('path', 'size', 'mtime_ns', 'digest', 'blocks', 'strings', 'error')
+
+    def __init__(self, path):
+        self.path = path
+        self.size = None
+        self.mtime_ns = None
+        self.digest = None
+        self.blocks = []      # list ArrayBlock
+        self.strings = []     # list (CallSite, string) của các call site tới decryptor của class
+        self.error = None     # thông báo lỗi nếu parse/decode thất bại
+
+
+class ProjectWatcher:
+    """Giữ array-data và bảng chuỗi đã giải mã của mọi file trong paths luôn khớp với đĩa"""
+
+    def __init__(self, paths, method_name='$', workers=None, mp_context=None):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.method_name = method_name
+        # Nhiều file đổi cùng lúc (lần scan đầu, apktool build lại) thì quét bằng process pool
+        self.workers = workers
+        self.mp_context = mp_context
+        self.files = {}       # đường dẫn tuyệt đối -> WatchedFile
+        # Thay đổi chưa báo (dict giữ thứ tự), scan bị huỷ giữa chừng thì lần sau vẫn báo
+        self._added = {}
+        self._modified = {}
+        self._removed = {}
+
+    def __len__(self):
+        return len(self.files)
+
+    def __contains__(self, path):
+        return os.path.abspath(path) in self.files
+
+    def get(self, path):
+        return self.files.get(os.path.abspath(path))
+
+    def directories(self):
+        """Các thư mục trong cây (để đăng ký với QFileSystemWatcher/inotify)"""
+        result = []
+        for path in self.paths:
+            if os.path.isdir(path):
+                for root, dirs, _ in os.walk(path):
+                    dirs.sort()
+                    result.append(root)
+        return result
+
+    def scan(self, progress=None):
+        """Duyệt lại cây, cập nhật các file đổi nội dung, trả về WatchChanges
+
+        File chỉ đổi mtime (touch, apktool ghi lại y hệt) thì không bị coi là thay đổi.
+        progress(done, total) được gọi theo số file cần đọc lại (stat đã đổi).
+        """
+        with profiling.stage('watch.scan') as s:
+            paths = [os.path.abspath(path) for path in scanner.discover(self.paths)]
+            seen = set(paths)
+            for path in [path for path in self.files if path not in seen]:
+                del self.files[path]
+                self._removed[path] = None
+            stale = []
+            for path in paths:
+                state = self.files.get(path)
+                if state is None:
+                    state = self.files[path] = WatchedFile(path)
+                    self._added[path] = None
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    # File biến mất giữa lúc duyệt và lúc đọc: lần scan sau sẽ xoá
+                    continue
+                if (st.st_size, st.st_mtime_ns) != (state.size, state.mtime_ns):
+                    stale.append(state)
+            results = scanner.scan_files([state.path for state in stale], self.method_name,
+                                         self.workers, progress, self.mp_context,
+                                         [state.digest for state in stale])
+            for state, scanned in zip(stale, results):
+                if self._apply(state, scanned) and state.path not in self._added:
+                    self._modified[state.path] = None
+            changes = WatchChanges(list(self._added), list(self._modified), list(self._removed))
+            self._added, self._modified, self._removed = {}, {}, {}
+            s.add(files=len(paths), stale=len(stale), changed=sum(map(len, changes)))
+        return changes
+
+    def poll(self, on_change, interval=1.0, stop=None):
+        """Vòng lặp headless: scan mỗi interval giây, gọi on_change(changes) khi có thay đổi
+
+        stop là threading.Event (hoặc None để chạy tới khi bị ngắt).
+        """
+        while stop is None or not stop.is_set():
+            changes = self.scan()
+            if any(changes):
+                on_change(changes)
+            if stop is not None:
+                stop.wait(interval)
+            else:
+                time.sleep(interval)
+
+    def _apply(self, state, scanned):
+        """Cập nhật state từ ScannedFile, trả về True nếu nội dung file đã đổi"""
+        if scanned.size is None:
+            return False
+        state.size, state.mtime_ns = scanned.size, scanned.mtime_ns
+        if scanned.blocks is None:
+            # Hash không đổi (touch, apktool ghi lại y hệt)
+            return False
+        state.digest = scanned.digest
+        state.blocks = scanned.blocks
+        state.strings = scanned.strings
+        state.error = scanned.error
+        return True
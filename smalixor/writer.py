@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Ghi file theo kiểu splice: chỉ thay các đoạn byte đã đổi, ghi atomic qua file tạm."""
+
+import os
+import shutil
+import tempfile
+
+COPY_CHUNK_SIZE = 1 << 20
+
+
+def _copy_bytes(src, dst, count, progress=None, total=0):
+    """Copy đúng count byte từ src sang dst theo từng chunk lớn"""
+    while count > 0:
+        chunk = src.read(min(count, COPY_CHUNK_SIZE))
+        if not chunk:
+            raise ValueError("File kết thúc sớm hơn offset đã ghi nhận")
+        dst.write(chunk)
+        count -= len(chunk)
+        if progress is not None:
+            progress(src.tell(), total)
+
+
+def splice_file(file_path, patches, progress=None):
+    """Thay các đoạn (offset, length, new_bytes) đã sắp xếp theo offset và ghi atomic
+
+    Phần không đổi được copy nguyên khối, nên công việc ở mức Python tỉ lệ
+    với số patch chứ không phải số phần tử của file.
+    """
+    total = os.path.getsize(file_path)
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_file = tempfile.mkstemp(prefix='.' + os.path.basename(file_path) + '.',
+                                    suffix='.tmp', dir=directory)
+    try:
+        with open(file_path, 'rb') as src, os.fdopen(fd, 'wb') as dst:
+            position = 0
+            for offset, length, new_bytes in patches:
+                if offset < position:
+                    raise ValueError("Các patch phải theo thứ tự và không chồng lấn")
+                _copy_bytes(src, dst, offset - position, progress, total)
+                dst.write(new_bytes)
+                src.seek(length, os.SEEK_CUR)
+                position = offset + length
+            _copy_bytes(src, dst, total - position, progress, total)
+            dst.flush()
+            os.fsync(dst.fileno())
+        shutil.copymode(file_path, tmp_file)
+        os.replace(tmp_file, file_path)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.unlink(tmp_file)
+        raise